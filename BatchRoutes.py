@@ -0,0 +1,238 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from functools import partial
+from itertools import islice
+from typing import Iterator, List
+
+from GoogleClients import DEFAULT_QUERIES_PER_SECOND, set_queries_per_second
+
+DEFAULT_EV_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'evdata.json')
+TRIP_FIELDS = ('starting_location', 'destination_location', 'ev_battery_capacity', 'ev_total_range', 'method')
+
+# Seconds from handing a trip to the pool until its result is given up on, e.g. because its worker was
+# killed; the pool replaces dead workers but never reports the trips they were planning
+DEFAULT_TRIP_TIMEOUT = 600
+
+
+def load_ev_models(path: str = DEFAULT_EV_DATA_PATH) -> List[dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def resolve_trip(trip: dict, ev_models: List[dict]) -> dict:
+    """
+    Fills in battery capacity and range from data/evdata.json when the trip names an EV model with 'ev_name'.
+    """
+    trip = dict(trip)
+    if 'ev_name' in trip:
+        model = next((model for model in ev_models if model['Name'] == trip['ev_name']), None)
+        if model is None:
+            raise ValueError(f"Unknown EV model: {trip['ev_name']}")
+        trip.setdefault('ev_battery_capacity', model['Battery Capacity (kWh)'])
+        trip.setdefault('ev_total_range', model['Total Range (miles)'])
+    trip.setdefault('method', 'default')
+    missing = [field for field in TRIP_FIELDS if trip.get(field) is None]
+    if missing:
+        raise ValueError(f"Trip is missing {', '.join(missing)}")
+    return trip
+
+
+def expand_trips(trips: List[dict], ev_models: List[dict]) -> List[dict]:
+    """
+    Plans every trip once per EV model.
+    """
+    return [dict(trip, ev_name=model['Name'], ev_battery_capacity=model['Battery Capacity (kWh)'],
+                 ev_total_range=model['Total Range (miles)']) for trip in trips for model in ev_models]
+
+
+def plan_trip(trip: dict) -> dict:
+    """
+    Plans one trip with the server's planner settings and returns the /evroute response data.
+    """
+    from EVNav import calculateOptimalEVRoute
+
+    ev_waypoints, ev_emissions = calculateOptimalEVRoute(None, *(trip[field] for field in TRIP_FIELDS))
+    return {
+        'emissions':        ev_emissions,
+        'ev_waypoints':     ev_waypoints,
+        'start_location':   trip['starting_location'],
+        'end_location':     trip['destination_location'],
+    }
+
+
+def _init_worker(warm_up, queries_per_second):
+    # Stray prints go to stderr so a worker never writes into streamed results on stdout
+    sys.stdout = sys.stderr
+    set_queries_per_second(queries_per_second)
+    if warm_up is not None:
+        warm_up()
+
+
+def _run_trip(plan, ev_models, indexed_trip) -> dict:
+    index, trip = indexed_trip
+    began = time.perf_counter()
+    try:
+        result = {'index': index, 'status': 'success', 'data': plan(resolve_trip(trip, ev_models))}
+    except Exception as e:
+        result = {'index': index, 'status': 'error', 'message': str(e)}
+    result['seconds'] = round(time.perf_counter() - began, 3)
+    return result
+
+
+def _default_warm_up():
+    from EVNav import warmUp
+    warmUp()
+
+
+def default_start_method() -> str:
+    # Forking a multithreaded server can hand the child a lock another thread held, e.g. a metrics or
+    # job queue lock, which then never gets released; workers start from a clean process instead
+    methods = multiprocessing.get_all_start_methods()
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+class BatchPool:
+    def __init__(self, workers: int = None, warm_up=_default_warm_up,
+                 queries_per_second: float = DEFAULT_QUERIES_PER_SECOND, start_method: str = None,
+                 trip_timeout: float = DEFAULT_TRIP_TIMEOUT):
+        """
+        Long-lived pool of planner processes shared by every batch. Trips of concurrent batches queue for
+        the same workers, so the number of processes and the Google request rate stay bounded however many
+        batches run. The processes start on first use.
+
+        :param workers: Worker processes; defaults to the CPU count.
+        :param warm_up: Optional picklable callable run in every worker before planning.
+        :param queries_per_second: Google API requests per second for the whole pool, split evenly between the workers.
+        :param start_method: multiprocessing start method; defaults to forkserver, or spawn where it is unavailable.
+        :param trip_timeout: Seconds a trip may take, including its wait for a worker, before it is reported
+                             as an error.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.trip_timeout = trip_timeout
+        self.warm_up = warm_up
+        self.queries_per_second = queries_per_second
+        self.start_method = start_method or default_start_method()
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._pool = context.Pool(self.workers, initializer=_init_worker,
+                                          initargs=(self.warm_up, self.queries_per_second / self.workers))
+            return self._pool
+
+    def imap(self, trips: List[dict], plan=plan_trip, ev_models: List[dict] = None,
+             max_in_flight: int = None) -> Iterator[dict]:
+        """
+        Plans trips and yields each result as soon as it finishes, tagged with the trip's index in trips.
+        Trips are handed to the pool as earlier ones finish, so a batch whose reader goes away stops
+        taking workers from the others.
+
+        :param trips: Dicts with the /evroute body fields, or 'ev_name' naming a model in data/evdata.json
+                      instead of the battery and range.
+        :param plan: Picklable callable planning one resolved trip.
+        :param max_in_flight: Trips of this batch planned at the same time; defaults to the pool size.
+        """
+        if ev_models is None:
+            ev_models = load_ev_models()
+        pool = self._get_pool()
+        run = partial(_run_trip, plan, ev_models)
+        limit = max(1, min(max_in_flight or self.workers, self.workers))
+        finished = queue.Queue()
+        indexed_trips = enumerate(trips)
+        # Deadline of every trip handed to the pool whose result has not been yielded yet
+        deadlines = {}
+        while True:
+            for index, trip in islice(indexed_trips, limit - len(deadlines)):
+                pool.apply_async(run, ((index, trip),), callback=finished.put,
+                                 error_callback=partial(_put_error, finished, index))
+                deadlines[index] = time.monotonic() + self.trip_timeout
+            if not deadlines:
+                return
+            try:
+                result = finished.get(timeout=max(min(deadlines.values()) - time.monotonic(), 0))
+            except queue.Empty:
+                now = time.monotonic()
+                for index in [index for index, deadline in deadlines.items() if deadline <= now]:
+                    del deadlines[index]
+                    yield {'index': index, 'status': 'error', 'seconds': self.trip_timeout,
+                           'message': f'No result within {self.trip_timeout} s, the worker may have died'}
+                continue
+            # A result arriving after its trip timed out was already reported
+            if deadlines.pop(result['index'], None) is not None:
+                yield result
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+    def terminate(self):
+        """
+        Stops the workers without waiting for trips still running, e.g. ones that timed out.
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+
+def _put_error(finished, index, error):
+    # A trip whose arguments or result could not be sent between processes
+    finished.put({'index': index, 'status': 'error', 'message': str(error), 'seconds': 0.0})
+
+
+def run_batch(trips: List[dict], workers: int = None, plan=plan_trip, warm_up=_default_warm_up,
+              ev_models: List[dict] = None, start_method: str = None,
+              trip_timeout: float = DEFAULT_TRIP_TIMEOUT) -> Iterator[dict]:
+    """
+    Plans trips on a BatchPool of its own, stopped once every trip has finished or timed out.
+
+    The memory-mapped datasets each worker loads share one copy in the page cache, and the SQLite
+    response cache is shared through its file.
+
+    :param workers: Worker processes; defaults to the CPU count.
+    :param warm_up: Optional picklable callable run in every worker before planning.
+    :param trip_timeout: Seconds a trip may take before it is reported as an error.
+    """
+    pool = BatchPool(workers, warm_up, start_method=start_method, trip_timeout=trip_timeout)
+    try:
+        yield from pool.imap(trips, plan, ev_models)
+    finally:
+        pool.terminate()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plan many EV routes across a process pool, one JSON result per line.')
+    parser.add_argument('trips', help='JSON list of trips with the /evroute body fields, or ev_name instead of battery and range')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes, defaults to the CPU count')
+    parser.add_argument('--all-models', action='store_true', help='Plan every trip once per EV model in data/evdata.json')
+    parser.add_argument('--output', help='Write results to this file instead of stdout')
+    args = parser.parse_args()
+
+    with open(args.trips) as f:
+        trips = json.load(f)
+    ev_models = load_ev_models()
+    if args.all_models:
+        trips = expand_trips(trips, ev_models)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    began = time.perf_counter()
+    for result in run_batch(trips, args.workers, ev_models=ev_models):
+        output.write(json.dumps(result) + '\n')
+        output.flush()
+    if args.output:
+        output.close()
+    elapsed = time.perf_counter() - began
+    print(f"Planned {len(trips)} trips in {elapsed:.1f} s ({len(trips) / elapsed:.2f} trips/s)", file=sys.stderr)
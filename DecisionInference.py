@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+
+DEFAULT_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'models', 'ev_decision_network.npz')
+LAYERS = ('fc1', 'fc2', 'fc3')
+NO_STATION_DISTANCE = 7777777  # Station distance feature for nodes without one, as in EVRouteGymEnv
+
+
+class DecisionMLP:
+    def __init__(self, weights: dict):
+        """
+        NumPy forward pass of EVDecisionNetwork, so serving needs no torch import.
+
+        :param weights: '<layer>.weight' (out x in) and '<layer>.bias' arrays for fc1, fc2 and fc3,
+                        the same names and shapes as the torch state_dict.
+        """
+        self.layers = [(np.asarray(weights[f'{layer}.weight'], dtype=np.float32).T,
+                        np.asarray(weights[f'{layer}.bias'], dtype=np.float32)) for layer in LAYERS]
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_WEIGHTS_PATH) -> 'DecisionMLP':
+        with np.load(path) as weights:
+            return cls(dict(weights))
+
+    @classmethod
+    def from_module(cls, model) -> 'DecisionMLP':
+        """
+        Copies the weights of a trained EVDecisionNetwork.
+        """
+        return cls({name: tensor.detach().cpu().numpy() for name, tensor in model.state_dict().items()})
+
+    def scores(self, features) -> np.ndarray:
+        """
+        Raw class scores for a batch of (remaining range, nearest station distance) rows.
+
+        :param features: Array-like of shape (n, 2).
+        :return: Array of shape (n, 2); column 1 is the score for charging.
+        """
+        x = np.asarray(features, dtype=np.float32).reshape(-1, 2)
+        for k, (weight, bias) in enumerate(self.layers):
+            x = x @ weight + bias
+            if k < len(self.layers) - 1:
+                np.maximum(x, 0, out=x)
+        return x
+
+    def decide(self, features) -> np.ndarray:
+        """
+        Returns a boolean array, True where the model chooses to charge.
+        """
+        scores = self.scores(features)
+        return scores[:, 1] > scores[:, 0]
+
+
+def station_features(vehicle_range: float, station_distance) -> np.ndarray:
+    """
+    Builds the model input rows for a leg's nodes from their station distances (NaN where there is none).
+    """
+    station_distance = np.asarray(station_distance, dtype=float)
+    # A missing or zero distance both become the sentinel, as the per-node 'in node and ... or' expression did
+    station_distance = np.where(np.isnan(station_distance) | (station_distance == 0), NO_STATION_DISTANCE, station_distance)
+    return np.column_stack((np.full(len(station_distance), vehicle_range, dtype=float), station_distance))
+
+
+_loaded_models = {}
+
+def load_decision_mlp(path: str = DEFAULT_WEIGHTS_PATH):
+    """
+    Returns the process-wide DecisionMLP for path, or None when no weights have been exported.
+    """
+    if path not in _loaded_models:
+        _loaded_models[path] = DecisionMLP.load(path) if os.path.exists(path) else None
+    return _loaded_models[path]
@@ -0,0 +1,222 @@
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, TensorDataset
+
+from DecisionInference import DEFAULT_WEIGHTS_PATH, _loaded_models as _loaded_mlps
+from EVRouteVecEnv import EVRouteVecEnv, random_rollouts
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'models', 'ev_decision_network.pt')
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+class EVDecisionNetwork(nn.Module):
+    def __init__(self):
+        super(EVDecisionNetwork, self).__init__()
+        self.fc1 = nn.Linear(2, 64)  # 2 input features: remaining range and nearest station range
+        self.fc2 = nn.Linear(64, 32)
+        self.fc3 = nn.Linear(32, 2)  # 2 output classes: 0 = don't branch, 1 = branch
+
+    def forward(self, x):
+        x = torch.relu(self.fc1(x))
+        x = torch.relu(self.fc2(x))
+        x = self.fc3(x)  # Output raw scores for each class
+        return x
+
+
+def traindata(env, episodes: int = 5, steps: int = 10, batch_size: int = 2):
+    training_data = []
+    for episode in range(episodes):
+        state = env.reset()
+        for step in range(steps):
+            action = random.choice([0, 1])  # Randomly choose to continue or charge
+            next_state, reward, done, branched = env.step(action)
+
+            # Record the state, action, and whether the action resulted in branching
+            training_data.append((state, action, int(branched)))
+
+            state = next_state
+            if done:
+                break
+    # Extract inputs and labels
+    inputs = torch.tensor([data[0] for data in training_data]).float()  # Convert to float for NN processing
+    labels = torch.tensor([data[1] for data in training_data]).long()  # Convert to long because these are categorical labels
+
+    # Create a TensorDataset and DataLoader
+    train_dataset = TensorDataset(inputs, labels)
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
+
+    return training_data,train_loader
+
+
+def traindata_vectorized(env: EVRouteVecEnv, steps: int = 10, batch_size: int = 2, seed=None):
+    """
+    Same experience as traindata, collected from env.num_envs episodes per step of an EVRouteVecEnv.
+    """
+    states, actions, branched = random_rollouts(env, steps, seed)
+    training_data = list(zip(states.tolist(), actions.tolist(), branched.astype(int).tolist()))
+    train_dataset = TensorDataset(torch.from_numpy(states).float(), torch.from_numpy(actions).long())
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
+    return training_data, train_loader
+
+
+def train(model, train_loader, num_epochs: int = 1000):
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+    # Step 3: Training Loop
+    for epoch in range(num_epochs):
+        for inputs, labels in train_loader:
+            # Zero the parameter gradients
+            optimizer.zero_grad()
+
+            # Forward pass
+            outputs = model(inputs)
+
+            # Compute loss
+            loss = criterion(outputs, labels)
+
+            # Backward pass and optimize
+            loss.backward()
+            optimizer.step()
+
+        # Optionally print the loss every x epochs
+        if epoch % 1 == 0:
+            print(f'Epoch [{epoch+1}/{num_epochs}], Loss: {loss.item():.4f}')
+
+    print("Training complete.")
+
+
+def export_weights(model: EVDecisionNetwork, path: str = DEFAULT_WEIGHTS_PATH):
+    """
+    Writes the weights as NumPy arrays for DecisionInference.DecisionMLP.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **{name: tensor.detach().cpu().numpy() for name, tensor in model.state_dict().items()})
+    os.replace(tmp_path, path)
+    _loaded_mlps.pop(path, None)
+
+
+def save_checkpoint(model: EVDecisionNetwork, path: str = DEFAULT_CHECKPOINT_PATH, weights_path: str = DEFAULT_WEIGHTS_PATH,
+                    **metadata) -> dict:
+    """
+    Writes the model weights with a format version and a model version stamped from the training time,
+    and exports them for torch-free inference to weights_path unless it is None.
+
+    :param metadata: Extra fields stored alongside the weights, e.g. how the model was trained.
+    :return: The checkpoint metadata.
+    """
+    metadata = dict(metadata, format_version=CHECKPOINT_FORMAT_VERSION,
+                    model_version=time.strftime('%Y%m%d%H%M%S', time.gmtime()))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write next to the target and swap it in so a serving process never loads a partial file
+    tmp_path = path + '.tmp'
+    torch.save({'metadata': metadata, 'state_dict': model.state_dict()}, tmp_path)
+    os.replace(tmp_path, path)
+    _loaded_models.pop(path, None)
+    if weights_path is not None:
+        export_weights(model, weights_path)
+    return metadata
+
+
+def load_checkpoint(path: str = DEFAULT_CHECKPOINT_PATH) -> EVDecisionNetwork:
+    """
+    Loads a checkpoint written by save_checkpoint into a model ready for inference.
+    """
+    checkpoint = torch.load(path, map_location='cpu')
+    version = checkpoint.get('metadata', {}).get('format_version')
+    if version != CHECKPOINT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported checkpoint format version {version} in {path}")
+    model = EVDecisionNetwork()
+    model.load_state_dict(checkpoint['state_dict'])
+    model.eval()
+    model.metadata = checkpoint['metadata']
+    return model
+
+
+_loaded_models = {}
+
+def load_decision_model(path: str = DEFAULT_CHECKPOINT_PATH):
+    """
+    Returns the process-wide EVDecisionNetwork for path, or None when no checkpoint has been trained.
+    """
+    if path not in _loaded_models:
+        _loaded_models[path] = load_checkpoint(path) if os.path.exists(path) else None
+    return _loaded_models[path]
+
+
+def train_checkpoint(env, path: str = DEFAULT_CHECKPOINT_PATH, episodes: int = 5, steps: int = 10,
+                     num_epochs: int = 1000, weights_path: str = DEFAULT_WEIGHTS_PATH, batch_size: int = 2) -> dict:
+    """
+    Collects experience from env, trains a fresh EVDecisionNetwork on it and saves the checkpoint.
+
+    :param env: An EVRouteGymEnv-compatible environment, or an EVRouteVecEnv, which ignores episodes and
+                runs steps batched steps.
+    :return: The checkpoint metadata.
+    """
+    if isinstance(env, EVRouteVecEnv):
+        training_data, train_loader = traindata_vectorized(env, steps, batch_size)
+        episodes = env.num_envs
+    else:
+        training_data, train_loader = traindata(env, episodes, steps, batch_size)
+    model = EVDecisionNetwork()
+    train(model, train_loader, num_epochs)
+    return save_checkpoint(model, path, weights_path, samples=len(training_data), episodes=episodes, steps=steps, epochs=num_epochs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the EVDecisionNetwork offline and write a checkpoint.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    training = subparsers.add_parser('train', help='Train on a sample trip and write the checkpoint and NumPy weights')
+    training.add_argument('--start', type=float, nargs=2, metavar=('LAT', 'LNG'))
+    training.add_argument('--end', type=float, nargs=2, metavar=('LAT', 'LNG'))
+    training.add_argument('--corpus', help='Sample routes from this RouteCorpus directory instead of planning --start to --end')
+    training.add_argument('--range-km', type=float, required=True)
+    training.add_argument('--efficiency', type=float, help='Wh per km, needed with --start and --end')
+    training.add_argument('--episodes', type=int, default=5)
+    training.add_argument('--steps', type=int, default=10)
+    training.add_argument('--epochs', type=int, default=1000)
+    training.add_argument('--batch-size', type=int, default=2)
+    training.add_argument('--num-envs', type=int, default=0,
+                          help='Collect experience from this many vectorized episodes instead of --episodes single ones')
+    training.add_argument('--output', default=DEFAULT_CHECKPOINT_PATH)
+    training.add_argument('--weights', default=DEFAULT_WEIGHTS_PATH)
+    export = subparsers.add_parser('export', help='Export an existing checkpoint to NumPy weights')
+    export.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH)
+    export.add_argument('--weights', default=DEFAULT_WEIGHTS_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_weights(load_checkpoint(args.checkpoint), args.weights)
+        print(f"Wrote {args.weights}")
+    elif args.corpus:
+        from EVRouteGymEnv import EVRouteGymEnv
+        from RouteCorpus import RouteCorpus
+
+        corpus = RouteCorpus.load(args.corpus)
+        vehicle_range = args.range_km * 1E3
+        if args.num_envs:
+            env = EVRouteVecEnv.from_corpus(corpus, vehicle_range, args.num_envs)
+        else:
+            env = EVRouteGymEnv(corpus=corpus, vehicle_range=vehicle_range)
+    else:
+        if args.start is None or args.end is None or args.efficiency is None:
+            parser.error('--start, --end and --efficiency are required without --corpus')
+        from EVRoutePlanner import EVRoutePlanner
+        from GoogleClients import default_response_cache
+        from StationIndex import load_station_index
+        from utils import getAPIKey
+
+        planner = EVRoutePlanner(getAPIKey('APIKey.txt'), tuple(args.start), tuple(args.end), args.range_km, args.efficiency,
+                                 response_cache=default_response_cache(), station_index=load_station_index())
+        env = EVRouteVecEnv.from_planner(planner, args.num_envs) if args.num_envs else planner.gym_env
+
+    if args.command == 'train':
+        metadata = train_checkpoint(env, args.output, args.episodes, args.steps, args.epochs, args.weights, args.batch_size)
+        print(f"Wrote model version {metadata['model_version']} trained on {metadata['samples']} samples to {args.output}")
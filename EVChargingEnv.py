@@ -2,18 +2,34 @@ import gym
 from gym import spaces
 from typing import Tuple, List, Dict
 import numpy as np
+import random
 
 from EVRoutePlanner import EVRoutePlanner
 
 class EVChargingEnv(gym.Env):
-    def __init__(self, api_key: str, start: Tuple[float, float], end: Tuple[float, float], vehicle_range: int):
+    def __init__(self, api_key: str, start: Tuple[float, float], end: Tuple[float, float], vehicle_range: int,
+                 corpus=None, seed=None):
+        """
+        :param corpus: Optional RouteCorpus; when given, every reset samples a recorded route instead of
+                       planning start to end, so no API calls are made.
+        :param seed: Seed for sampling routes from the corpus.
+        """
         super(EVChargingEnv, self).__init__()
-        
-        # Initialize the EVRoutePlanner
-        self.route_planner = EVRoutePlanner(api_key, start, end, vehicle_range)
-        self.route_planner.calculate_route()
+        self.corpus = corpus
+        self.rng = random.Random(seed)
+
+        if corpus is not None:
+            self.route_planner = None
+            self.vehicle_range = vehicle_range * 1E3  # km, as EVRoutePlanner takes it
+            self.route = corpus.sample_route(self.rng)
+        else:
+            # Initialize the EVRoutePlanner
+            self.route_planner = EVRoutePlanner(api_key, start, end, vehicle_range)
+            self.route_planner.calculate_route()
+            self.vehicle_range = self.route_planner.vehicle_range
+            self.route = self.route_planner.route
         self.current_node_index = 0
-        self.current_node = self.route_planner.route[self.current_node_index]
+        self.current_node = self.route[self.current_node_index]
         self.remaining_range = vehicle_range
 
         # Define action and observation space
@@ -21,9 +37,11 @@ class EVChargingEnv(gym.Env):
         self.observation_space = spaces.Box(low=np.array([0, 0]), high=np.array([float('inf'), float('inf')]), dtype=np.float32)
 
     def reset(self):
+        if self.corpus is not None:
+            self.route = self.corpus.sample_route(self.rng)
         self.current_node_index = 0
-        self.current_node = self.route_planner.route[self.current_node_index]
-        self.remaining_range = self.route_planner.vehicle_range
+        self.current_node = self.route[self.current_node_index]
+        self.remaining_range = self.vehicle_range
         return self._get_obs()
 
     def step(self, action):
@@ -32,16 +50,16 @@ class EVChargingEnv(gym.Env):
 
         if action == 1:  # Charge
             # Simulate charging
-            self.remaining_range = self.route_planner.vehicle_range
+            self.remaining_range = self.vehicle_range
             if 'nearest_ev_actual' in self.current_node:
                 reward -= self.current_node['nearest_ev_actual'] / 1000
 
         # Move to the next node
         self.current_node_index += 1
-        if self.current_node_index >= len(self.route_planner.route):
+        if self.current_node_index >= len(self.route):
             done = True
         else:
-            self.current_node = self.route_planner.route[self.current_node_index]
+            self.current_node = self.route[self.current_node_index]
             self.remaining_range -= self.current_node['dist']
 
         if self.remaining_range < 0:
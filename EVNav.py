@@ -1,20 +1,80 @@
-from EVRoutePlanner import EVRoutePlanner
+from GoogleClients import default_response_cache
+from StationIndex import load_station_index
+from DecisionInference import load_decision_mlp
 
-with open("./APIKey.txt") as f:
-    api_key = f.readline()
+API_KEY_PATH = "./APIKey.txt"
 
+# Concurrent Places/Directions lookups per route while enriching nodes
+ENRICHMENT_WORKERS = 8
+
+# Splice a short detour back into the remaining route after each charging stop instead of re-routing to the end.
+# Off by default: the detour rejoins the nearest downstream node in a straight line, which can differ from a
+# full re-route (e.g. doubling back along the route), and has not been shown to match the routes served so far
+INCREMENTAL_REPLANNING = False
+
+_api_key = None
+
+def getApiKey():
+    """
+    Reads the API key on first use rather than when the module is imported.
+    """
+    global _api_key
+    if _api_key is None:
+        with open(API_KEY_PATH) as f:
+            _api_key = f.readline()
+    return _api_key
+
+
+def warmUp():
+    """
+    Loads the modules and datasets route planning reads, so the first request, or workers forked afterwards,
+    find them loaded.
+    """
+    import EVRoutePlanner
+    from EmissionGrid import load_emission_grid
+    from PowerPlants import get_power_plants
+
+    get_power_plants()
+    load_emission_grid()
+    load_station_index()
+    # Trained offline with DecisionModel.py; loaded once per process so 'ai' requests only run inference
+    load_decision_mlp()
+
+
+def buildEVRoutePlanner(start, end, battery, totalRange, enrichment_workers=ENRICHMENT_WORKERS):
+    from EVRoutePlanner import EVRoutePlanner
 
-def calculateOptimalEVRoute(client, start, end, battery, totalRange, method):
     range_km = int(totalRange) * 1.60934
     efficiency = int(battery)*1000/range_km
-    ev_route_planner = EVRoutePlanner(api_key, start, end, range_km, efficiency) 
+    return EVRoutePlanner(getApiKey(), start, end, range_km, efficiency, enrichment_workers=enrichment_workers,
+                          response_cache=default_response_cache(), station_index=load_station_index(),
+                          incremental_replanning=INCREMENTAL_REPLANNING, decision_model=load_decision_mlp())
+
 
+def routeType(method):
     if method == 'default':
-        route = ev_route_planner.calculate_route(method)
+        return method
+    elif method == 'graph':
+        return 'graph'
     else:
-        route = ev_route_planner.calculate_route('ai')
+        return 'ai'
+
+
+def calculateOptimalEVRoute(client, start, end, battery, totalRange, method, enrichment_workers=ENRICHMENT_WORKERS):
+    ev_route_planner = buildEVRoutePlanner(start, end, battery, totalRange, enrichment_workers)
+
+    route = ev_route_planner.calculate_route(routeType(method))
     
     waypoints = ev_route_planner.charging_stations
 
     return waypoints, round(ev_route_planner.emissions_kg_co2, 3)
 
+
+def streamOptimalEVRoute(client, start, end, battery, totalRange, method):
+    """
+    Yields the planner's events as charging stops are decided, ending with a 'done' event.
+    """
+    ev_route_planner = buildEVRoutePlanner(start, end, battery, totalRange)
+
+    for event in ev_route_planner.iter_route(routeType(method)):
+        yield event
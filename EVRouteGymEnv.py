@@ -0,0 +1,107 @@
+import logging
+import random
+
+import gym
+from gym import spaces
+
+logger = logging.getLogger(__name__)
+
+
+class EVRouteGymEnv(gym.Env):
+    def __init__(self, ev_route_planner=None, corpus=None, vehicle_range=None, seed=None):
+        """
+        :param ev_route_planner: Planner whose 'regular' route every episode runs on.
+        :param corpus: Optional RouteCorpus to sample each episode's route from instead, without API calls.
+        :param vehicle_range: Range on a full charge in meters; defaults to the planner's.
+        :param seed: Seed for sampling routes from the corpus.
+        """
+        super(EVRouteGymEnv, self).__init__()
+        self.ev_route_planner = ev_route_planner
+        self.corpus = corpus
+        self.vehicle_range = vehicle_range if vehicle_range is not None else ev_route_planner.vehicle_range
+        self.rng = random.Random(seed)
+        self.action_space = spaces.Discrete(2)  # 0 = continue, 1 = charge
+        self.observation_space = spaces.Box(low=0, high=float('inf'), shape=(2,), dtype=float)
+        self.current_node_index = 0
+        self.remaining_range = self.vehicle_range
+
+    def reset(self):
+        if self.corpus is not None:
+            self.nodes = self.corpus.sample_route(self.rng)
+        else:
+            self.nodes = self.ev_route_planner.calculate_route('regular')
+            logger.debug("Episode route: %s", self.nodes)
+        self.current_node_index = 0
+        self.remaining_range = self.vehicle_range
+        return self._get_obs()
+
+    def step(self, action):
+        done = False
+        reward = 0
+
+        if self.current_node_index >= len(self.nodes): # Check if the episode is over
+            done = True
+            return self._get_obs(), reward, done, 'branched' in self.nodes[self.current_node_index-1]
+        
+
+
+        if action == 1:  # Charge
+            if 'nearest_ev_station_distance' in self.nodes[self.current_node_index] and \
+               self.remaining_range >= self.nodes[self.current_node_index]['nearest_ev_station_distance']:
+                # Assuming charging restores the EV's range to its maximum capacity
+                self.remaining_range = self.vehicle_range
+                # Move to charging station if not at the current node's location
+                self.remaining_range -= self.nodes[self.current_node_index].get('nearest_ev_station_distance', 0)
+            else:
+                # If charging is not possible due to range issues, heavily penalize the action
+                reward = self._calculate_reward(action, False)
+        elif action == 0:  # Continue
+            if self.current_node_index < len(self.nodes) - 1:
+                self.remaining_range -= self.nodes[self.current_node_index + 1]['dist']
+                # self.current_node_index += 1
+                reward = self._calculate_reward(action, True)
+            else:
+                done = True
+                reward = self._calculate_reward(action, True)
+
+        # Check if the EV can no longer move due to insufficient range, ending the episode
+        if self.remaining_range < 0:
+            done = True
+            reward = self._calculate_reward(action, False)
+
+        if not done:
+            self.current_node_index += 1
+
+        return self._get_obs(), reward, done, 'branched' in self.nodes[self.current_node_index-1]
+
+
+    def _get_obs(self):
+        # branched = 'branched' in self.nodes[self.current_node_index]
+        if self.current_node_index < len(self.nodes):
+            node = self.nodes[self.current_node_index]
+
+            return [self.remaining_range, 'nearest_ev_station_distance' in node and node['nearest_ev_station_distance'] or 7777777]
+        else:
+            return [0, 0]
+
+    def _can_charge(self):
+        # Implement logic to check if the current node has a charging station and is within range
+        current_node = self.nodes[self.current_node_index]
+        return 'nearest_ev_station' in current_node and self.remaining_range >= current_node['nearest_ev_station_distance']
+
+    def _calculate_reward(self, action, successful):
+        # Reward logic considering the action's success and its implications
+        if action == 1:  # Charge
+            if successful:
+                # Negative reward for charging to reflect time spent, but less penalty if it was necessary
+                return -5  # Example penalty value, adjust based on needs
+            else:
+                # Heavy penalty if charging was attempted but is not possible
+                return -100  # Example penalty value, adjust based on needs
+        elif action == 0:  # Continue
+            if successful:
+                # Positive reward for successfully moving to the next node without unnecessary charging
+                return 10  # Example reward value, adjust based on needs
+            else:
+                # Penalize running out of range
+                return -100  # Example penalty value, adjust based on needs
@@ -1,176 +1,50 @@
-from typing import List, Dict, Any, Tuple
-from geopy.distance import geodesic
-
-from GoogleClients import GoogleMapsClient, GooglePlacesClient
-from PathInterpolator import PathInterpolator
+from typing import List, Dict, Any, Tuple, Iterator
+from concurrent.futures import ThreadPoolExecutor
+import bisect
+import heapq
+import logging
+import time
+
+from GoogleClients import GoogleMapsClient, GooglePlacesClient, ResponseCache
+from PathInterpolator import PathInterpolator, segment_lengths
 from EmissionsCalculator import EmissionsCalculator
+from StationIndex import StationIndex, LocalStationClient
+from RouteNodes import NodeStore, RouteLookahead
 
-import torch
-import torch.nn as nn
-
-import random
-
-from torch.utils.data import DataLoader, TensorDataset
-from gym import spaces
-import gym
-
-import torch.optim as optim
-class EVRouteGymEnv(gym.Env):
-    def __init__(self, ev_route_planner):
-        super(EVRouteGymEnv, self).__init__()
-        self.ev_route_planner = ev_route_planner
-        self.action_space = spaces.Discrete(2)  # 0 = continue, 1 = charge
-        self.observation_space = spaces.Box(low=0, high=float('inf'), shape=(2,), dtype=float)
-        self.current_node_index = 0
-        self.remaining_range = ev_route_planner.vehicle_range
-
-    def reset(self):
-        self.nodes = self.ev_route_planner.calculate_route('regular')
-        print(self.nodes)
-        self.current_node_index = 0
-        self.remaining_range = self.ev_route_planner.vehicle_range
-        return self._get_obs()
-
-    def step(self, action):
-        done = False
-        reward = 0
-
-        if self.current_node_index >= len(self.nodes): # Check if the episode is over
-            done = True
-            return self._get_obs(), reward, done, 'branched' in self.nodes[self.current_node_index-1]
-        
+import numpy as np
 
+from DecisionInference import DecisionMLP, load_decision_mlp, station_features
+from PlannerMetrics import PHASE_SECONDS, ROUTES_TOTAL, phase
 
-        if action == 1:  # Charge
-            if 'nearest_ev_station_distance' in self.nodes[self.current_node_index] and \
-               self.remaining_range >= self.nodes[self.current_node_index]['nearest_ev_station_distance']:
-                # Assuming charging restores the EV's range to its maximum capacity
-                self.remaining_range = self.ev_route_planner.vehicle_range
-                # Move to charging station if not at the current node's location
-                self.remaining_range -= self.nodes[self.current_node_index].get('nearest_ev_station_distance', 0)
-            else:
-                # If charging is not possible due to range issues, heavily penalize the action
-                reward = self._calculate_reward(action, False)
-        elif action == 0:  # Continue
-            if self.current_node_index < len(self.nodes) - 1:
-                self.remaining_range -= self.nodes[self.current_node_index + 1]['dist']
-                # self.current_node_index += 1
-                reward = self._calculate_reward(action, True)
-            else:
-                done = True
-                reward = self._calculate_reward(action, True)
+logger = logging.getLogger(__name__)
 
-        # Check if the EV can no longer move due to insufficient range, ending the episode
-        if self.remaining_range < 0:
-            done = True
-            reward = self._calculate_reward(action, False)
 
-        if not done:
-            self.current_node_index += 1
+def __getattr__(name):
+    # The torch model and training code live in DecisionModel and the gym environment in EVRouteGymEnv;
+    # serving imports neither torch nor gym
+    if name in ('EVDecisionNetwork', 'traindata', 'train'):
+        import DecisionModel
+        return getattr(DecisionModel, name)
+    if name == 'EVRouteGymEnv':
+        import EVRouteGymEnv
+        return EVRouteGymEnv.EVRouteGymEnv
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-        return self._get_obs(), reward, done, 'branched' in self.nodes[self.current_node_index-1]
 
+GRAPH_OBJECTIVES = ('distance', 'stops', 'emissions')
 
-    def _get_obs(self):
-        # branched = 'branched' in self.nodes[self.current_node_index]
-        if self.current_node_index < len(self.nodes):
-            node = self.nodes[self.current_node_index]
+# kg CO2 a charging stop must save for the 'emissions' objective to make it
+EMISSIONS_STOP_PENALTY_KG = 1.0
 
-            return [self.remaining_range, 'nearest_ev_station_distance' in node and node['nearest_ev_station_distance'] or 7777777]
-        else:
-            return [0, 0]
-
-    def _can_charge(self):
-        # Implement logic to check if the current node has a charging station and is within range
-        current_node = self.nodes[self.current_node_index]
-        return 'nearest_ev_station' in current_node and self.remaining_range >= current_node['nearest_ev_station_distance']
-
-    def _calculate_reward(self, action, successful):
-        # Reward logic considering the action's success and its implications
-        if action == 1:  # Charge
-            if successful:
-                # Negative reward for charging to reflect time spent, but less penalty if it was necessary
-                return -5  # Example penalty value, adjust based on needs
-            else:
-                # Heavy penalty if charging was attempted but is not possible
-                return -100  # Example penalty value, adjust based on needs
-        elif action == 0:  # Continue
-            if successful:
-                # Positive reward for successfully moving to the next node without unnecessary charging
-                return 10  # Example reward value, adjust based on needs
-            else:
-                # Penalize running out of range
-                return -100  # Example penalty value, adjust based on needs
-
-
-    
-class EVDecisionNetwork(nn.Module):
-    def __init__(self):
-        super(EVDecisionNetwork, self).__init__()
-        self.fc1 = nn.Linear(2, 64)  # 2 input features: remaining range and nearest station range
-        self.fc2 = nn.Linear(64, 32)
-        self.fc3 = nn.Linear(32, 2)  # 2 output classes: 0 = don't branch, 1 = branch
-
-    def forward(self, x):
-        x = torch.relu(self.fc1(x))
-        x = torch.relu(self.fc2(x))
-        x = self.fc3(x)  # Output raw scores for each class
-        return x
-    
-def traindata(env):
-    training_data = []
-    for episode in range(5):
-        state = env.reset()
-        for step in range(10):
-            action = random.choice([0, 1])  # Randomly choose to continue or charge
-            next_state, reward, done, branched = env.step(action)
-
-            # Record the state, action, and whether the action resulted in branching
-            training_data.append((state, action, int(branched)))
-
-            state = next_state
-            if done:
-                break
-    # Extract inputs and labels
-    inputs = torch.tensor([data[0] for data in training_data]).float()  # Convert to float for NN processing
-    labels = torch.tensor([data[1] for data in training_data]).long()  # Convert to long because these are categorical labels
-
-    # Create a TensorDataset and DataLoader
-    train_dataset = TensorDataset(inputs, labels)
-    train_loader = DataLoader(train_dataset, batch_size=2, shuffle=True)
-
-    return training_data,train_loader
-
-def train(model,train_loader):
-    criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=0.001)
-    # Step 3: Training Loop
-    num_epochs = 1000  # Number of epochs to train for
-
-    for epoch in range(num_epochs):
-        for inputs, labels in train_loader:
-            # Zero the parameter gradients
-            optimizer.zero_grad()
-        
-            # Forward pass
-            outputs = model(inputs)
-        
-            # Compute loss
-            loss = criterion(outputs, labels)
-        
-            # Backward pass and optimize
-            loss.backward()
-            optimizer.step()
-    
-        # Optionally print the loss every x epochs
-        if epoch % 1 == 0:
-            print(f'Epoch [{epoch+1}/{num_epochs}], Loss: {loss.item():.4f}')
-
-    print("Training complete.")
+# Nodes the greedy planners enrich per batch ahead of the walk, per enrichment worker
+ENRICHMENT_BATCH_PER_WORKER = 4
 
 
 class EVRoutePlanner:
-    def __init__(self, api_key: str, start: Tuple[float, float], end: Tuple[float, float], vehicle_range, vehicle_efficiency):
+    def __init__(self, api_key: str, start: Tuple[float, float], end: Tuple[float, float], vehicle_range, vehicle_efficiency,
+                 enrichment_workers: int = 1, maps_client=None, places_client=None, paths_interpolator=None,
+                 response_cache: ResponseCache = None, station_index: StationIndex = None, places_fallback: bool = True,
+                 incremental_replanning: bool = False, decision_model: DecisionMLP = None):
         """
         Initializes the EVRoutePlanner with start, end locations, and the EV's range.
 
@@ -178,162 +52,391 @@ class EVRoutePlanner:
         :param start: Start location as a tuple (latitude, longitude).
         :param end: End location as a tuple (latitude, longitude).
         :param vehicle_range: The EV's range on a full charge in meters.
+        :param enrichment_workers: Maximum concurrent station lookups per route; 1 enriches nodes sequentially.
+        :param maps_client: Optional GoogleMapsClient-compatible object, e.g. a fake for testing.
+        :param places_client: Optional GooglePlacesClient-compatible object.
+        :param paths_interpolator: Optional PathInterpolator-compatible object.
+        :param response_cache: Optional ResponseCache shared by the Google clients created here.
+        :param station_index: Optional local StationIndex used instead of Places API lookups.
+        :param places_fallback: Whether to query the Places API when the station index has nothing in range.
+        :param incremental_replanning: After a charging stop, fetch only the detour from the station back to the
+                                       remaining route instead of a new route to the destination.
+        :param decision_model: DecisionMLP or trained EVDecisionNetwork for 'ai' mode; defaults to the
+                               process-wide exported weights.
         """
         self.vehicle_efficiency = vehicle_efficiency
         self.vehicle_range = vehicle_range*1E3
-
-        self.maps_client = GoogleMapsClient(api_key)
-        self.places_client = GooglePlacesClient(api_key)
-        self.paths_interpolator = PathInterpolator(api_key,30000)
+        self.enrichment_workers = enrichment_workers
+        self.incremental_replanning = incremental_replanning
+
+        self.maps_client = maps_client or GoogleMapsClient(api_key, cache=response_cache)
+        self.places_client = places_client or GooglePlacesClient(api_key, cache=response_cache)
+        if station_index is not None:
+            self.places_client = LocalStationClient(station_index, fallback=self.places_client if places_fallback else None)
+        self.paths_interpolator = paths_interpolator or PathInterpolator(api_key,30000, cache=response_cache)
         self.emissions_calculator = EmissionsCalculator(vehicle_efficiency)
         self.start = start
         self.end = end
-        self.route = []
+        self.route = NodeStore()
         self.total_distance = 0
 
-        self.gym_env = EVRouteGymEnv(self)
-        self.model = EVDecisionNetwork()
+        self._gym_env = None
+        if decision_model is not None and not isinstance(decision_model, DecisionMLP):
+            decision_model = DecisionMLP.from_module(decision_model)
+        self.model = decision_model if decision_model is not None else load_decision_mlp()
 
         self.emissions_kg_co2 = 0
+        # (lat, lng, meters) of every leg: where its energy is priced and how far it is driven
+        self.legs = []
 
         self.charging_stations = []
 
         self.all_stations = []
 
-    def calculate_route(self,type='regular') -> List[dict]:
+        # (nodes, decisions) for the node list the decision model is scoring, decisions covering a prefix of it
+        self._model_decisions = None
+        # Nodes of the node list being walked whose station lookups are final
+        self._enriched = 0
+
+    @property
+    def gym_env(self):
+        """
+        EVRouteGymEnv over this planner's route, created on first use so planning never imports gym.
+        """
+        if self._gym_env is None:
+            from EVRouteGymEnv import EVRouteGymEnv
+            self._gym_env = EVRouteGymEnv(self)
+        return self._gym_env
+
+    def calculate_route(self,type='regular', objective='distance') -> List[dict]:
         """
         Calculates the route, including necessary charging stops based on the EV's range.
 
+        :param type: 'regular' for the greedy planner, 'ai' for the trained charge decision model, or 'graph'
+                     to choose all stops in one search over the stations along the corridor.
+        :param objective: What the 'graph' planner minimizes: 'distance', 'stops' or 'emissions'.
         :return: A list of route segments, including charging stops.
         """
+        ROUTES_TOTAL.inc(type=type)
+        with phase('route'):
+            if type == "graph":
+                return self._plan_graph(objective)
+            return self._plan_route(self._charge_decision(type))
+
+    def iter_route(self, type='regular', objective='distance') -> Iterator[dict]:
+        """
+        Plans like calculate_route, yielding each charging stop as soon as it is decided.
 
+        Stop events carry the station location, the leg driven to reach it and the cumulative kg CO2 so
+        far. The last event is 'done' with the waypoints and total emissions. The 'graph' planner picks all
+        stops in one search, so its stops are yielded together once it finishes.
+        """
+        ROUTES_TOTAL.inc(type=type)
+        # Time spent waiting on the consumer between events is counted too, as it is for the caller
+        began = time.perf_counter()
+        if type == "graph":
+            self._plan_graph(objective)
+            with phase('emissions'):
+                per_leg, _ = self.emissions_calculator.calculate_emissions_batch(*zip(*self.legs))
+            cumulative = np.cumsum(per_leg)
+            for k, station in enumerate(self.charging_stations):
+                yield self._stop_event(k, station, self.legs[k][2], per_leg[k], cumulative[k])
+        else:
+            for lat, lng, meters, station in self._walk_route(self._charge_decision(type)):
+                self.legs.append((lat, lng, meters))
+                with phase('emissions'):
+                    leg_emissions = self.emissions_calculator.calculate_emissions(meters, {'lat': lat, 'lng': lng})
+                self.emissions_kg_co2 += leg_emissions
+                if station is not None:
+                    yield self._stop_event(len(self.legs) - 1, station, meters, leg_emissions, self.emissions_kg_co2)
+        PHASE_SECONDS.observe(time.perf_counter() - began, phase='route')
+        yield {'event': 'done', 'ev_waypoints': self.charging_stations, 'emissions': round(float(self.emissions_kg_co2), 3)}
+
+    @staticmethod
+    def _stop_event(k, station, meters, leg_emissions, cumulative_emissions) -> dict:
+        return {
+            'event': 'stop',
+            'stop': k + 1,
+            'location': station,
+            'leg_km': round(float(meters) / 1000, 1),
+            'leg_emissions': round(float(leg_emissions), 3),
+            'emissions': round(float(cumulative_emissions), 3),
+        }
+
+    def _charge_decision(self, type):
+        """
+        Returns the (node, nodes, i) -> bool charge decision for a greedy planner type.
+        """
+        if type == "ai" and self.model is None:
+            # Training per request took minutes; without a checkpoint fall back to the range rule
+            logger.warning("No decision model checkpoint found, using the regular charge decision")
+            return self._requires_charge
         if type == "ai":
-            training_data,train_loader = traindata(self.gym_env)
-
-            train(self.model,train_loader)
-
-            current_location = self.start
-            keepGoing = True
-            while keepGoing:
-                # try:
-                # route_segment = self.maps_client.get_route(current_location, self.end)
-                path = self.paths_interpolator.get_points_at_intervals(current_location, self.end)
-
-                nodes = self.path_to_nodes(path)
-
-                # self.end = (nodes[-1]['lat'], nodes[-1]['lng'])
-                for i, node in enumerate(nodes):
-                    if self.model(torch.tensor([self.vehicle_range, 'nearest_ev_station_distance' in node and node['nearest_ev_station_distance'] or 7777777]).float()).argmax().item() == 1:
-                        charging_station_route = node['nearest_ev_route_segment']
-
-                        # We must add the route nodes to the route list
-                        newNodes = []
-                        for step in charging_station_route['steps']:
-                            newNodes.append({
-                                'lat': step['start_location']['lat'],
-                                'lng': step['start_location']['lng'],
-                                'dist': step['distance']['value']
-                            })
-                            # self.total_distance += step['distance']['value']
-                        #make the last node a 'branched'
-                        newNodes[0]['branched'] = True
-                        print("setting to branch")
-                        self.route.extend(newNodes)
-
-                        # Calculate the amount of CO2 emissions 
-                        self.emissions_kg_co2 += self.emissions_calculator.calculate_emissions(self.total_distance, node)   
-                        print("Total Distance: ", self.total_distance)
-                        print("Added emissions: ", self.emissions_kg_co2)
-
-                        # Reset the distance 
-                        self.total_distance = 0
-
-                        # Add the charging station to the charging stations list
-                        self.charging_stations.append({
-                            'lat': charging_station_route['end_location']['lat'],
-                            'lng': charging_station_route['end_location']['lng']
-                        })
-
-                        # Recalculate route from charging station to end
-                        current_location = (charging_station_route['steps'][-1]['end_location']['lat'], charging_station_route['steps'][-1]['end_location']['lng'])
-                        break
+            return self._model_requires_charge
+        return self._requires_charge
+
+    def _plan_route(self, requires_charge) -> List[dict]:
+        """
+        Walks the route from the start, branching to a charging station wherever requires_charge says so.
+
+        :param requires_charge: Callable (node, nodes, i) -> bool deciding whether to charge at nodes[i].
+        :return: A list of route segments, including charging stops.
+        """
+        # Charging location and distance driven on each charge, priced in one batch at the end
+        legs = [leg[:3] for leg in self._walk_route(requires_charge)]
+        self.legs.extend(legs)
+
+        if legs:
+            lats, lngs, meters = zip(*legs)
+            with phase('emissions'):
+                _, leg_emissions = self.emissions_calculator.calculate_emissions_batch(lats, lngs, meters)
+            self.emissions_kg_co2 += leg_emissions
+            logger.debug("Added emissions: %s", self.emissions_kg_co2)
+        return self.route
+
+    def _walk_route(self, requires_charge) -> Iterator[Tuple[float, float, float, dict]]:
+        """
+        Generator behind _plan_route and iter_route. Nodes are enriched in batches just ahead of the walk,
+        so each stop is decided without waiting for the rest of the path, and nodes past a stop on a path
+        that gets re-planned are never looked up.
+
+        :param requires_charge: Callable (node, nodes, i) -> bool deciding whether to charge at nodes[i].
+        :return: For every leg, the location its energy is priced at, the meters driven and the charging
+                 station it ends at, None for the final leg.
+        """
+        current_location = self.start
+        path = self.paths_interpolator.get_points_at_intervals(current_location, self.end)
+        nodes = self.build_path_nodes(path)
+        # Nodes before this index are enriched, or detour nodes deliberately left bare
+        enriched = 0
+        keepGoing = True
+        while keepGoing:
+            # try:
+            # route_segment = self.maps_client.get_route(current_location, self.end)
+
+            # self.end = (nodes[-1]['lat'], nodes[-1]['lng'])
+            for i, node in enumerate(nodes):
+                if i >= enriched:
+                    enriched = self._enrich_ahead(nodes, enriched)
+                self._enriched = enriched
+                logger.debug("Processing node %d of %d", i + 1, len(nodes))
+                with phase('charge_decision'):
+                    needs_charge = requires_charge(node, nodes, i)
+                if needs_charge:
+                    logger.debug("needs charge")
+                    charging_station_route = node['nearest_ev_route_segment']
+
+                    # We must add the route nodes to the route list
+                    self.route.extend(self._branch_nodes(charging_station_route))
+
+                    # Record the leg so its CO2 emissions are priced where we charge
+                    leg = (node['lat'], node['lng'], self.total_distance)
+                    logger.debug("Total Distance: %s", self.total_distance)
+
+                    # Reset the distance 
+                    self.total_distance = 0
+
+                    # Add the charging station to the charging stations list
+                    self._add_charging_station(charging_station_route)
+                    yield leg + (self.charging_stations[-1],)
+
+                    # Recalculate route from charging station to end
+                    current_location = (charging_station_route['steps'][-1]['end_location']['lat'], charging_station_route['steps'][-1]['end_location']['lng'])
+                    if self.incremental_replanning and i < len(nodes) - 1:
+                        nodes, enriched = self._rejoin_route(current_location, nodes[i + 1:], enriched - (i + 1))
                     else:
-                        self.route.append(node)
-                        self.total_distance += node['dist']
-                        if i == len(nodes) - 1:
-                            # Add emissions for the last segment
-                            self.emissions_kg_co2 += self.emissions_calculator.calculate_emissions(self.total_distance, node)
-                            # current_location = self.end
-                            keepGoing = False
-                # except Exception as e:
-                #     print(f"Error calculating route: {e}")
-                #     break
-            return self.route
+                        path = self.paths_interpolator.get_points_at_intervals(current_location, self.end)
+                        nodes, enriched = self.build_path_nodes(path), 0
+                    break
+                else:
+                    self.route.append(node)
+                    self.total_distance += node['dist']
+                    if i == len(nodes) - 1:
+                        # Add emissions for the last segment
+                        yield (node['lat'], node['lng'], self.total_distance, None)
+                        # current_location = self.end
+                        keepGoing = False
+            # except Exception as e:
+            #     print(f"Error calculating route: {e}")
+            #     break
+
+    def _enrich_ahead(self, nodes, enriched) -> int:
+        """
+        Enriches the next batch of nodes from index enriched and returns the new enriched count.
+        """
+        end = min(len(nodes), enriched + max(self.enrichment_workers, 1) * ENRICHMENT_BATCH_PER_WORKER)
+        self.enrich_nodes(nodes[enriched:end])
+        return end
 
+    def _plan_graph(self, objective='distance') -> List[dict]:
+        """
+        Fetches and enriches the corridor once, then picks every charging stop in a single Dijkstra search.
 
+        Vertices are the start, each node with a nearby station, and the destination. An edge joins two
+        vertices when the EV can drive between them on one charge, counting the detour from the corridor
+        to a station and back. Charging restores the full range as in the greedy planner, so the state of
+        charge on leaving a station is always full and the station alone identifies the search state.
 
+        :param objective: 'distance' (meters driven), 'stops' (fewest stops, then distance) or
+                          'emissions' (kg CO2 of the energy drawn along each leg plus
+                          EMISSIONS_STOP_PENALTY_KG per stop, then distance).
+        :return: A list of route segments, including charging stops.
+        """
+        if objective not in GRAPH_OBJECTIVES:
+            raise ValueError(f"Unknown objective: {objective}")
 
-        else:
-            current_location = self.start
-            keepGoing = True
-            while keepGoing:
-                # try:
-                # route_segment = self.maps_client.get_route(current_location, self.end)
-                path = self.paths_interpolator.get_points_at_intervals(current_location, self.end)
-
-                nodes = self.path_to_nodes(path)
-
-                # self.end = (nodes[-1]['lat'], nodes[-1]['lng'])
-                for i, node in enumerate(nodes):
-                    print(f"Processing node {i + 1} of {len(nodes)}")
-                    if self._requires_charge(node, nodes, i):
-                        print("needs charge")
-                        charging_station_route = node['nearest_ev_route_segment']
-
-                        # We must add the route nodes to the route list
-                        newNodes = []
-                        for step in charging_station_route['steps']:
-                            newNodes.append({
-                                'lat': step['start_location']['lat'],
-                                'lng': step['start_location']['lng'],
-                                'dist': step['distance']['value']
-                            })
-                            # self.total_distance += step['distance']['value']
-                        #make the last node a 'branched'
-                        newNodes[0]['branched'] = True
-                        print("setting to branch")
-                        self.route.extend(newNodes)
-
-                        # Calculate the amount of CO2 emissions 
-                        self.emissions_kg_co2 += self.emissions_calculator.calculate_emissions(self.total_distance, node)   
-                        print("Total Distance: ", self.total_distance)
-                        print("Added emissions: ", self.emissions_kg_co2)
-
-                        # Reset the distance 
-                        self.total_distance = 0
-
-                        # Add the charging station to the charging stations list
-                        self.charging_stations.append({
-                            'lat': charging_station_route['end_location']['lat'],
-                            'lng': charging_station_route['end_location']['lng']
-                        })
-
-                        # Recalculate route from charging station to end
-                        current_location = (charging_station_route['steps'][-1]['end_location']['lat'], charging_station_route['steps'][-1]['end_location']['lng'])
-                        break
-                    else:
-                        self.route.append(node)
-                        self.total_distance += node['dist']
-                        if i == len(nodes) - 1:
-                            # Add emissions for the last segment
-                            self.emissions_kg_co2 += self.emissions_calculator.calculate_emissions(self.total_distance, node)
-                            # current_location = self.end
-                            keepGoing = False
-                # except Exception as e:
-                #     print(f"Error calculating route: {e}")
-                #     break
+        path = self.paths_interpolator.get_points_at_intervals(self.start, self.end)
+        nodes = self.path_to_nodes(path)
+        if not nodes:
             return self.route
-        
+
+        # Distance along the corridor from the first node to each node
+        cumulative = RouteLookahead(nodes).cumulative
+        last = len(nodes) - 1
+        start_vertex, end_vertex = -1, len(nodes)
+        stations = [i for i, node in enumerate(nodes) if 'nearest_ev_station_distance' in node]
+        detour = {i: nodes[i]['nearest_ev_station_distance'] for i in stations}
+
+        def position(vertex):
+            return 0 if vertex == start_vertex else last if vertex == end_vertex else vertex
+
+        def leg_meters(u, v):
+            return detour.get(u, 0) + cumulative[position(v)] - cumulative[position(u)] + detour.get(v, 0)
+
+        if objective == 'emissions':
+            # Energy is priced where it is drawn, as in segment_emissions, with a detour priced at its node. The
+            # corridor then costs the same for every plan, so only the detours to and from stations are compared
+            # and a stop can only pay for itself through a cleaner detour; summing the corridor too would only
+            # add rounding noise.
+            with phase('emissions'):
+                factors = dict(zip(stations, self.emissions_calculator.emission_factors(
+                    [nodes[i]['lat'] for i in stations], [nodes[i]['lng'] for i in stations])))
+
+            def leg_emissions(u, v):
+                return factors.get(u, 0) * detour.get(u, 0) + factors.get(v, 0) * detour.get(v, 0)
+
+        def edge_cost(u, v, meters):
+            if objective == 'stops':
+                return (0 if v == end_vertex else 1, meters)
+            if objective == 'emissions':
+                return (leg_emissions(u, v) + (0 if v == end_vertex else EMISSIONS_STOP_PENALTY_KG), meters)
+            return (meters, 0)
+
+        search_began = time.perf_counter()
+        best = {start_vertex: (0, 0)}
+        previous = {}
+        heap = [(best[start_vertex], start_vertex)]
+        while heap:
+            cost, u = heapq.heappop(heap)
+            if u == end_vertex:
+                break
+            if cost > best[u]:
+                continue
+            # A station at the first node can be the first stop; otherwise stops move forward along the corridor
+            first = 0 if u == start_vertex else u + 1
+            for v in stations[bisect.bisect_left(stations, first):] + [end_vertex]:
+                # Stations are in corridor order, so once the corridor alone is out of range so is the rest
+                if cumulative[position(v)] - cumulative[position(u)] > self.vehicle_range:
+                    break
+                meters = leg_meters(u, v)
+                if meters > self.vehicle_range:
+                    continue
+                new_cost = tuple(a + b for a, b in zip(cost, edge_cost(u, v, meters)))
+                if v not in best or new_cost < best[v]:
+                    best[v] = new_cost
+                    previous[v] = u
+                    heapq.heappush(heap, (new_cost, v))
+        PHASE_SECONDS.observe(time.perf_counter() - search_began, phase='graph_search')
+
+        if end_vertex not in previous:
+            raise ValueError("No charging plan reaches the destination within the vehicle range")
+
+        stops = []
+        vertex = previous[end_vertex]
+        while vertex != start_vertex:
+            stops.append(vertex)
+            vertex = previous[vertex]
+        stops.reverse()
+
+        # Lay out the corridor with a branch to the station at every stop
+        legs = []
+        from_vertex, next_node = start_vertex, 0
+        for stop in stops:
+            self.route.extend(nodes[next_node:stop])
+            self.route.extend(self._branch_nodes(nodes[stop]['nearest_ev_route_segment']))
+            self._add_charging_station(nodes[stop]['nearest_ev_route_segment'])
+            legs.append((nodes[stop]['lat'], nodes[stop]['lng'], leg_meters(from_vertex, stop)))
+            from_vertex, next_node = stop, stop
+        self.route.extend(nodes[next_node:])
+        legs.append((nodes[last]['lat'], nodes[last]['lng'], leg_meters(from_vertex, end_vertex)))
+        self.total_distance = legs[-1][2]
+        self.legs.extend(legs)
+
+        lats, lngs, meters = zip(*legs)
+        with phase('emissions'):
+            _, leg_emissions = self.emissions_calculator.calculate_emissions_batch(lats, lngs, meters)
+        self.emissions_kg_co2 += leg_emissions
+        return self.route
+
+    def _rejoin_route(self, station_location, remaining_nodes, enriched: int) -> Tuple[List[dict], int]:
+        """
+        Routes from a charging station back to the nearest of the remaining nodes and splices the detour in
+        front of them, so the rest of the route and its station lookups are reused instead of re-fetched.
+        The detour nodes are not enriched; the EV has just charged when it drives them.
+
+        :param station_location: The charging station as a tuple (latitude, longitude).
+        :param remaining_nodes: The nodes after the one the EV branched off at.
+        :param enriched: How many of remaining_nodes are already enriched.
+        :return: The detour nodes followed by the remaining nodes from the rejoin point on, and how many
+                 of those need no enrichment.
+        """
+        lats = np.radians([node['lat'] for node in remaining_nodes])
+        lngs = np.radians([node['lng'] for node in remaining_nodes])
+        lat, lng = np.radians(station_location[0]), np.radians(station_location[1])
+        # Haversine without the constant factors, which do not change the argmin
+        a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+        rejoin = int(np.argmin(a))
+
+        target = remaining_nodes[rejoin]
+        with phase('directions'):
+            detour = self.maps_client.get_route(station_location, (target['lat'], target['lng']))['legs'][0]
+        detour_nodes = [{
+            'lat': step['start_location']['lat'],
+            'lng': step['start_location']['lng'],
+            'dist': step['distance']['value']
+        } for step in detour['steps']]
+        return detour_nodes + remaining_nodes[rejoin:], len(detour_nodes) + max(enriched - rejoin, 0)
+
+    def _branch_nodes(self, charging_station_route) -> List[dict]:
+        """
+        Converts the route to a charging station into nodes, the first one flagged as 'branched'.
+        """
+        newNodes = []
+        for step in charging_station_route['steps']:
+            newNodes.append({
+                'lat': step['start_location']['lat'],
+                'lng': step['start_location']['lng'],
+                'dist': step['distance']['value']
+            })
+            # self.total_distance += step['distance']['value']
+        #make the last node a 'branched'
+        newNodes[0]['branched'] = True
+        logger.debug("setting to branch")
+        return newNodes
+
+    def _add_charging_station(self, charging_station_route):
+        self.charging_stations.append({
+            'lat': charging_station_route['end_location']['lat'],
+            'lng': charging_station_route['end_location']['lng']
+        })
+
+    def segment_emissions(self):
+        """
+        Attributes the route's CO2 emissions to each segment, priced where the segment starts.
+
+        :return: A tuple of the per-node kg CO2 array for self.route and its total.
+        """
+        return self.emissions_calculator.route_emissions(self.route)
         
     
     def _requires_charge(self, current_node, nodes, current_node_i) -> bool:
@@ -350,16 +453,27 @@ class EVRoutePlanner:
         if not nodes:
             return False
         if 'nearest_ev_station_distance' in current_node:
-            currentDist = self.total_distance
-            while current_node_i < len(nodes):
-                currentDist += nodes[current_node_i]['dist']
-                if 'nearest_ev_station_distance' in nodes[current_node_i]:
-                    currentDist += nodes[current_node_i]['nearest_ev_station_distance']
-                    # print(f"Nearest station distance: {nodes[current_node_i]['nearest_ev_station_distance']}")
-                    print(f"Current distance: {currentDist}")
-                    return currentDist > self.vehicle_range
-                current_node_i += 1
-            return False
+            # The distance since the last charge, this node's segment and the detour to its station
+            currentDist = self.total_distance + current_node['dist'] + current_node['nearest_ev_station_distance']
+            return currentDist > self.vehicle_range
+        return False
+
+    def _model_requires_charge(self, current_node, nodes, current_node_i) -> bool:
+        """
+        The decision model's choice for nodes[current_node_i]. Nodes are scored in batches as they are
+        enriched: asking past the last scored node scores every node enriched since, so each node of a leg
+        is scored once.
+        """
+        if self._model_decisions is None or self._model_decisions[0] is not nodes:
+            self._model_decisions = (nodes, np.zeros(0, dtype=bool))
+        decisions = self._model_decisions[1]
+        if current_node_i >= len(decisions):
+            batch = nodes[len(decisions):max(self._enriched, current_node_i + 1)]
+            features = station_features(self.vehicle_range, [node.get('nearest_ev_station_distance', np.nan) for node in batch])
+            with phase('inference'):
+                decisions = np.concatenate((decisions, self.model.decide(features)))
+            self._model_decisions = (nodes, decisions)
+        return bool(decisions[current_node_i])
 
     def path_to_nodes(self, path) -> List[dict]:
         """
@@ -369,33 +483,50 @@ class EVRoutePlanner:
         :param route_segment: Segment of the route as returned by the Google Maps API.
         :return: A list of nodes, each containing latitude, longitude, and distance.
         """
-        nodes = []
-        # Iterate through each step in the route segment
-        for step in path:
-            dist = 0
-            if not (step == path[-1]):
-                # Calculate the distance between the current and next step
-                dist = geodesic(step, path[path.index(step) + 1]).meters
-                # print(dist)
-
-            node = {
-                'lat': step[0],
-                'lng': step[1],
-                'dist': dist
-            }
-            # Calculate the distance to the nearest EV charging station
-            nearest_station = self.places_client.find_nearby_charging_stations((node['lat'], node['lng']))[0]#['geometry']['location']
-
-            if nearest_station:
-                nearest_station_route = self.maps_client.get_route((node['lat'], node['lng']), (nearest_station['geometry']['location']['lat'], nearest_station['geometry']['location']['lng']))['legs'][0]
-                nearest_station_distance = nearest_station_route['distance']['value']
-
-                node['nearest_ev_station'] = nearest_station
-                node['nearest_ev_station_distance'] = nearest_station_distance
-                node['nearest_ev_route_segment'] = nearest_station_route
-
-
-            nodes.append(node)
+        return self.enrich_nodes(self.build_path_nodes(path))
+
+    def build_path_nodes(self, path) -> List[dict]:
+        """
+        Builds the route geometry in one pass: a node per point with the distance to the next point.
+
+        :param path: List of (latitude, longitude) points.
+        :return: A list of nodes, each containing latitude, longitude, and distance.
+        """
+        if len(path) == 0:
+            return []
+        with phase('node_building'):
+            # Distance between each point and the next, computed for the whole path at once
+            dists = segment_lengths(path).tolist() + [0]
+            return [{'lat': lat, 'lng': lng, 'dist': dist} for (lat, lng), dist in zip(path, dists)]
+
+    def enrich_nodes(self, nodes) -> List[dict]:
+        """
+        Adds the nearest EV charging station and the route to it to every node.
+
+        :param nodes: Nodes as returned by build_path_nodes.
+        :return: The same nodes, enriched in place.
+        """
+        with phase('enrichment'):
+            if self.enrichment_workers > 1 and len(nodes) > 1:
+                # Each node's Places and Directions calls are independent; the nodes keep their order
+                with ThreadPoolExecutor(max_workers=min(self.enrichment_workers, len(nodes))) as pool:
+                    list(pool.map(self._enrich_node, nodes))
+            else:
+                for node in nodes:
+                    self._enrich_node(node)
         return nodes
-    
-    
\ No newline at end of file
+
+    def _enrich_node(self, node) -> dict:
+        # Calculate the distance to the nearest EV charging station
+        stations = self.places_client.find_nearby_charging_stations((node['lat'], node['lng']))
+        nearest_station = stations[0] if stations else None
+
+        if nearest_station:
+            nearest_station_route = self.maps_client.get_route((node['lat'], node['lng']), (nearest_station['geometry']['location']['lat'], nearest_station['geometry']['location']['lng']))['legs'][0]
+            nearest_station_distance = nearest_station_route['distance']['value']
+
+            node['nearest_ev_station'] = nearest_station
+            node['nearest_ev_station_distance'] = nearest_station_distance
+            node['nearest_ev_route_segment'] = nearest_station_route
+
+        return node
@@ -1,4 +1,6 @@
 from typing import List, Dict, Any, Tuple
+import logging
+
 from geopy.distance import geodesic
 
 from GoogleClients import GoogleMapsClient, GooglePlacesClient
@@ -7,6 +9,8 @@ from EmissionsCalculator import EmissionsCalculator
 
 import math
 
+logger = logging.getLogger(__name__)
+
 class EVRoutePlanner:
     def __init__(self, api_key: str, start: Tuple[float, float], end: Tuple[float, float], vehicle_range: int):
         """
@@ -67,7 +71,7 @@ class EVRoutePlanner:
     def populate_data(self, nodes=None, parentTable=None, total_distance=0,i=0):
         i+=1
         if i > 3:
-            print("RETURNING")
+            logger.debug("RETURNING")
             return
 
         if not nodes:
@@ -136,11 +140,16 @@ class EVRoutePlanner:
         for i, node in enumerate(nodes):
             distanceToDestination += node['dist']
 
-        # emissions info
-        emissions_0 = node and self.emissions_calculator.calculate_emissions(distance_0, node) or 0
-        emissions_1 = node_1 and self.emissions_calculator.calculate_emissions(distance_1, node_1) or 0
-        emissions_2 = node_2 and self.emissions_calculator.calculate_emissions(distance_2, node_2) or 0
-        emissions_3 = node_3 and self.emissions_calculator.calculate_emissions(distance_3, node_3) or 0
+        # emissions info, priced for all candidate stops in one batch
+        stops = [node, node_1, node_2, node_3]
+        stop_distances = [distance_0, distance_1, distance_2, distance_3]
+        present = [j for j, stop in enumerate(stops) if stop]
+        stop_emissions, _ = self.emissions_calculator.calculate_emissions_batch(
+            [stops[j]['lat'] for j in present], [stops[j]['lng'] for j in present], [stop_distances[j] for j in present])
+        emissions = [0, 0, 0, 0]
+        for j, value in zip(present, stop_emissions):
+            emissions[j] = value or 0
+        emissions_0, emissions_1, emissions_2, emissions_3 = emissions
 
         # populate the table
         state = {
@@ -178,7 +187,7 @@ class EVRoutePlanner:
         new_nodes_1 = self.path_to_nodes(self.paths_interpolator.get_points_at_intervals(current_location_1, self.end))
         self.populate_data(new_nodes_1, None, 0, i)
         self.data.append(table_1)
-        print("done with that")
+        logger.debug("done with that")
 
         # Continue
         self.populate_data(nodes, table_0, total_distance + distance_0, 0)
@@ -190,6 +199,8 @@ class EVRoutePlanner:
 
         :return: A list of route segments, including charging stops.
         """
+        # Charging location and distance driven on each charge, priced in one batch at the end
+        legs = []
         current_location = self.start
         keepGoing = True
         while keepGoing:
@@ -201,9 +212,9 @@ class EVRoutePlanner:
 
             # self.end = (nodes[-1]['lat'], nodes[-1]['lng'])
             for i, node in enumerate(nodes):
-                print(f"Processing node {i + 1} of {len(nodes)}")
+                logger.debug("Processing node %d of %d", i + 1, len(nodes))
                 if self._requires_charge(node, nodes, i):
-                    print("needs charge")
+                    logger.debug("needs charge")
                     charging_station_route = node['nearest_ev_route_segment']
 
                     # We must add the route nodes to the route list
@@ -215,10 +226,9 @@ class EVRoutePlanner:
                         })
                         # self.total_distance += step['distance']['value']
 
-                    # Calculate the amount of CO2 emissions 
-                    self.emissions_kg_co2 += self.emissions_calculator.calculate_emissions(self.total_distance, node)   
-                    print("Total Distance: ", self.total_distance)
-                    print("Added emissions: ", self.emissions_kg_co2)
+                    # Record the leg so its CO2 emissions are priced where we charge
+                    legs.append((node['lat'], node['lng'], self.total_distance))
+                    logger.debug("Total Distance: %s", self.total_distance)
 
                     # Reset the distance 
                     self.total_distance = 0
@@ -237,12 +247,18 @@ class EVRoutePlanner:
                     self.total_distance += node['dist']
                     if i == len(nodes) - 1:
                         # Add emissions for the last segment
-                        self.emissions_kg_co2 += self.emissions_calculator.calculate_emissions(self.total_distance, node)
+                        legs.append((node['lat'], node['lng'], self.total_distance))
                         # current_location = self.end
                         keepGoing = False
             # except Exception as e:
             #     print(f"Error calculating route: {e}")
             #     break
+
+        if legs:
+            lats, lngs, meters = zip(*legs)
+            _, leg_emissions = self.emissions_calculator.calculate_emissions_batch(lats, lngs, meters)
+            self.emissions_kg_co2 += leg_emissions
+            logger.debug("Added emissions: %s", self.emissions_kg_co2)
         return self.route
     
     def _requires_charge(self, current_node, nodes, current_node_i, total_distance) -> bool:
@@ -265,7 +281,7 @@ class EVRoutePlanner:
                 if 'nearest_ev_station_distance' in nodes[current_node_i]:
                     currentDist += nodes[current_node_i]['nearest_ev_station_distance']
                     # print(f"Nearest station distance: {nodes[current_node_i]['nearest_ev_station_distance']}")
-                    print(f"Current distance: {currentDist}")
+                    logger.debug("Current distance: %s", currentDist)
                     current_node['nearest_ev_actual'] = currentDist
                     return currentDist > self.vehicle_range
                 current_node_i += 1
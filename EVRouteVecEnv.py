@@ -0,0 +1,169 @@
+from typing import List
+
+import numpy as np
+from gym import spaces
+
+from DecisionInference import NO_STATION_DISTANCE
+from RouteNodes import node_columns
+
+# Rewards, as EVRouteGymEnv._calculate_reward hands them out
+CONTINUE_REWARD = 10
+FAILURE_REWARD = -100
+
+
+def _as_array(values, kind, dtype):
+    values = np.asarray(values)
+    return values if np.issubdtype(values.dtype, kind) else values.astype(dtype)
+
+
+class EVRouteVecEnv:
+    def __init__(self, dist, station_distance, branched, route_starts, vehicle_range: float, num_envs: int, seed=None):
+        """
+        Runs num_envs independent EVRouteGymEnv episodes at once on NumPy state arrays.
+
+        The routes are stored back to back: route r covers positions route_starts[r] to route_starts[r + 1]
+        of the node arrays. Every reset samples a route for each episode.
+
+        :param dist: Distance from each node to the next one.
+        :param station_distance: Distance from each node to its nearest charging station, NaN when it has none.
+        :param branched: Whether each node starts a branch to a charging station.
+        :param route_starts: Offset of every route in the node arrays, followed by the total node count.
+        :param vehicle_range: The EV's range on a full charge in meters.
+        :param num_envs: Number of episodes advanced by every step.
+        :param seed: Seed for route sampling.
+        """
+        # Float and bool arrays are kept as given, so memory-mapped corpus columns are not copied
+        self.dist = _as_array(dist, np.floating, float)
+        self.station_distance = _as_array(station_distance, np.floating, float)
+        self.branched = _as_array(branched, np.bool_, bool)
+        self.route_starts = np.asarray(route_starts, dtype=np.int64)
+        self.route_lengths = np.diff(self.route_starts)
+        if len(self.route_lengths) == 0 or (self.route_lengths < 1).any():
+            raise ValueError("Every route needs at least one node")
+        self.vehicle_range = vehicle_range
+        self.num_envs = num_envs
+        self.rng = np.random.default_rng(seed)
+
+        self.action_space = spaces.Discrete(2)  # 0 = continue, 1 = charge
+        self.observation_space = spaces.Box(low=0, high=float('inf'), shape=(2,), dtype=float)
+
+        self.route = np.zeros(num_envs, dtype=np.int64)
+        self.current_node_index = np.zeros(num_envs, dtype=np.int64)
+        self.remaining_range = np.full(num_envs, float(vehicle_range))
+
+    @classmethod
+    def from_routes(cls, routes: List[List[dict]], vehicle_range: float, num_envs: int, seed=None) -> 'EVRouteVecEnv':
+        """
+        Builds the environment from node lists or NodeStores as returned by EVRoutePlanner.calculate_route.
+        """
+        columns = [node_columns(route) for route in routes]
+        return cls(
+            np.concatenate([route['dist'] for route in columns]),
+            np.concatenate([route['station_distance'] for route in columns]),
+            np.concatenate([route['branched'] for route in columns]),
+            np.concatenate(([0], np.cumsum([len(route) for route in routes]))),
+            vehicle_range, num_envs, seed,
+        )
+
+    @classmethod
+    def from_corpus(cls, corpus, vehicle_range: float, num_envs: int, seed=None) -> 'EVRouteVecEnv':
+        """
+        Samples episodes from a RouteCorpus, reading its columns in place.
+        """
+        return cls(corpus.dist, corpus.station_distance, corpus.branched, corpus.route_starts, vehicle_range, num_envs, seed)
+
+    @classmethod
+    def from_planner(cls, ev_route_planner, num_envs: int, seed=None) -> 'EVRouteVecEnv':
+        """
+        Plans the route once and runs every episode on it, as EVRouteGymEnv does on each reset.
+        """
+        route = ev_route_planner.calculate_route('regular')
+        return cls.from_routes([route], ev_route_planner.vehicle_range, num_envs, seed)
+
+    def _reset_envs(self, mask):
+        count = int(mask.sum())
+        self.route[mask] = self.rng.integers(len(self.route_lengths), size=count)
+        self.current_node_index[mask] = 0
+        self.remaining_range[mask] = self.vehicle_range
+
+    def reset(self) -> np.ndarray:
+        """
+        Starts a new episode in every environment.
+
+        :return: Observations of shape (num_envs, 2).
+        """
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self._get_obs()
+
+    def step(self, actions):
+        """
+        Applies one action per environment with the same rules as EVRouteGymEnv.step. Environments whose
+        episode ends are reset, so their returned observation is the first one of the next episode.
+
+        :param actions: Array of num_envs actions, 0 = continue, 1 = charge.
+        :return: Observations (num_envs, 2), rewards, done flags and, per environment, whether the node the
+                 step ended on starts a branch to a charging station.
+        """
+        actions = np.asarray(actions)
+        lengths = self.route_lengths[self.route]
+        starts = self.route_starts[self.route]
+        index = self.current_node_index
+        rewards = np.zeros(self.num_envs)
+
+        over = index >= lengths
+        done = over.copy()
+        active = ~over
+        position = starts + np.minimum(index, lengths - 1)
+
+        charge = active & (actions == 1)
+        station_distance = self.station_distance[position]
+        can_charge = charge & ~np.isnan(station_distance) & (self.remaining_range >= station_distance)
+        self.remaining_range[can_charge] = self.vehicle_range - station_distance[can_charge]
+        rewards[charge & ~can_charge] = FAILURE_REWARD
+
+        advance = active & (actions == 0)
+        has_next = index < lengths - 1
+        moving = advance & has_next
+        self.remaining_range[moving] -= self.dist[position[moving] + 1]
+        rewards[advance] = CONTINUE_REWARD
+        done |= advance & ~has_next
+
+        out_of_range = active & (self.remaining_range < 0)
+        done |= out_of_range
+        rewards[out_of_range] = FAILURE_REWARD
+
+        index[active & ~done] += 1
+        # The node the step ended on; index - 1 wraps to the last node like the list index in EVRouteGymEnv
+        branched = self.branched[starts + (index - 1) % lengths]
+
+        self._reset_envs(done)
+        return self._get_obs(), rewards, done, branched
+
+    def _get_obs(self) -> np.ndarray:
+        lengths = self.route_lengths[self.route]
+        on_route = self.current_node_index < lengths
+        position = self.route_starts[self.route] + np.minimum(self.current_node_index, lengths - 1)
+        station_distance = self.station_distance[position]
+        station_distance = np.where(np.isnan(station_distance) | (station_distance == 0), NO_STATION_DISTANCE, station_distance)
+        obs = np.column_stack((self.remaining_range, station_distance))
+        obs[~on_route] = 0
+        return obs
+
+
+def random_rollouts(env: EVRouteVecEnv, steps: int, seed=None):
+    """
+    Collects experience with uniformly random actions, as traindata does, for steps batched steps.
+
+    :return: States (steps * num_envs, 2), the actions taken and whether each step ended on a branched node.
+    """
+    rng = np.random.default_rng(seed)
+    states, actions, branched = [], [], []
+    state = env.reset()
+    for _ in range(steps):
+        action = rng.integers(2, size=env.num_envs)
+        next_state, _, _, step_branched = env.step(action)
+        states.append(state)
+        actions.append(action)
+        branched.append(step_branched)
+        state = next_state
+    return np.concatenate(states), np.concatenate(actions), np.concatenate(branched)
@@ -0,0 +1,199 @@
+import json
+import os
+import argparse
+import numpy as np
+
+from SpatialIndex import EARTH_RADIUS_M
+
+DEFAULT_GRID_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'emission_factor_grid.npy')
+PLANT_RADIUS_M = 20000  # Same radius get_power_plant_emission uses
+
+
+def _metadata_path(grid_path: str) -> str:
+    return os.path.splitext(grid_path)[0] + '.json'
+
+
+def _haversine_np(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class EmissionGrid:
+    def __init__(self, values: np.ndarray, lat_min: float, lng_min: float, resolution: float):
+        """
+        Capacity-weighted grid-mix CO2 intensity (kg CO2 per MWh) sampled at cell centers.
+
+        :param values: 2D array indexed by [lat cell, lng cell]; may be a read-only memory map.
+        :param lat_min: Latitude of the southern edge of the grid.
+        :param lng_min: Longitude of the western edge of the grid.
+        :param resolution: Cell size in degrees.
+        """
+        self.values = values
+        self.lat_min = lat_min
+        self.lng_min = lng_min
+        self.resolution = resolution
+
+    @classmethod
+    def load(cls, grid_path: str = DEFAULT_GRID_PATH) -> 'EmissionGrid':
+        """
+        Memory-maps a grid written by build_emission_grid.
+        """
+        with open(_metadata_path(grid_path)) as f:
+            meta = json.load(f)
+        values = np.load(grid_path, mmap_mode='r')
+        return cls(values, meta['lat_min'], meta['lng_min'], meta['resolution'])
+
+    def cell_indices(self, lat, lng):
+        """
+        Returns the (row, col) cell indices for the given points and a mask of the points inside the grid.
+        """
+        rows = np.floor((np.asarray(lat, dtype=float) - self.lat_min) / self.resolution).astype(np.int64)
+        cols = np.floor((np.asarray(lng, dtype=float) - self.lng_min) / self.resolution).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.values.shape[0]) & (cols >= 0) & (cols < self.values.shape[1])
+        return rows, cols, inside
+
+    def lookup(self, lat: float, lng: float):
+        """
+        Returns the kg CO2 per MWh of the cell containing (lat, lng), or None outside the grid.
+        """
+        row, col, inside = self.cell_indices(lat, lng)
+        if not inside:
+            return None
+        return float(self.values[row, col])
+
+
+_loaded_grids = {}
+
+def load_emission_grid(grid_path: str = DEFAULT_GRID_PATH):
+    """
+    Returns the process-wide EmissionGrid for grid_path, or None when it has not been built.
+    """
+    if grid_path not in _loaded_grids:
+        _loaded_grids[grid_path] = EmissionGrid.load(grid_path) if os.path.exists(grid_path) else None
+    return _loaded_grids[grid_path]
+
+
+def build_emission_grid(power_plants, co2_emissions, resolution: float = 0.05,
+                        bounds=(-90.0, 90.0, -180.0, 180.0), grid_path: str = DEFAULT_GRID_PATH) -> EmissionGrid:
+    """
+    Computes the capacity-weighted grid-mix intensity at every cell center and saves it as a float32 .npy
+    with a JSON sidecar describing the grid.
+
+    Each plant adds its capacity to every cell center within PLANT_RADIUS_M, which is the same set of plants
+    get_power_plant_emission would select at that center.
+
+    :param power_plants: Power plant table with latitude, longitude, primary_fuel and capacity_mw columns.
+    :param co2_emissions: Mapping of primary_fuel to kg CO2 per MWh.
+    :param resolution: Cell size in degrees.
+    :param bounds: (lat_min, lat_max, lng_min, lng_max) covered by the grid.
+    :param grid_path: Where to write the .npy raster.
+    :return: The built EmissionGrid.
+    """
+    lat_min, lat_max, lng_min, lng_max = bounds
+    n_rows = int(round((lat_max - lat_min) / resolution))
+    n_cols = int(round((lng_max - lng_min) / resolution))
+
+    lats = np.asarray(power_plants['latitude'], dtype=float)
+    lngs = np.asarray(power_plants['longitude'], dtype=float)
+    capacity = np.nan_to_num(np.asarray(power_plants['capacity_mw'], dtype=float))
+    intensity = np.array([co2_emissions.get(fuel, 0) for fuel in power_plants['primary_fuel']], dtype=float)
+
+    angular = PLANT_RADIUS_M / EARTH_RADIUS_M
+    dlat = np.degrees(angular)
+    cells, weighted, weights = [], [], []
+    for lat, lng, cap, co2 in zip(lats, lngs, capacity, intensity):
+        if np.isnan(lat) or np.isnan(lng):
+            continue
+        row_lo = max(int(np.floor((lat - dlat - lat_min) / resolution)), 0)
+        row_hi = min(int(np.floor((lat + dlat - lat_min) / resolution)), n_rows - 1)
+        if row_lo > row_hi:
+            continue
+        if abs(lat) + dlat >= 90:
+            col_range = np.arange(n_cols)
+        else:
+            dlng = np.degrees(np.arcsin(min(np.sin(angular) / np.cos(np.radians(lat)), 1.0)))
+            col_range = np.arange(int(np.floor((lng - dlng - lng_min) / resolution)),
+                                  int(np.floor((lng + dlng - lng_min) / resolution)) + 1)
+            # Wrap across the antimeridian when the grid spans the whole globe
+            if n_cols * resolution >= 360:
+                col_range = np.unique(col_range % n_cols)
+            col_range = col_range[(col_range >= 0) & (col_range < n_cols)]
+        rows = np.arange(row_lo, row_hi + 1)
+        center_lat = lat_min + (rows[:, None] + 0.5) * resolution
+        center_lng = lng_min + (col_range[None, :] + 0.5) * resolution
+        within = _haversine_np(center_lat, center_lng, lat, lng) <= PLANT_RADIUS_M
+        flat = (rows[:, None] * n_cols + col_range[None, :])[within]
+        cells.append(flat)
+        weighted.append(np.full(len(flat), cap * co2))
+        weights.append(np.full(len(flat), cap))
+
+    values = np.zeros((n_rows, n_cols), dtype=np.float32)
+    if cells:
+        cells = np.concatenate(cells)
+        unique_cells, inverse = np.unique(cells, return_inverse=True)
+        total_weighted = np.bincount(inverse, weights=np.concatenate(weighted))
+        total_capacity = np.bincount(inverse, weights=np.concatenate(weights))
+        # Cells whose plants have no capacity stay at 0, as the pandas path sums to 0 there
+        factor = np.divide(total_weighted, total_capacity, out=np.zeros_like(total_weighted), where=total_capacity > 0)
+        values.ravel()[unique_cells] = factor
+
+    os.makedirs(os.path.dirname(os.path.abspath(grid_path)), exist_ok=True)
+    np.save(grid_path, values)
+    with open(_metadata_path(grid_path), 'w') as f:
+        json.dump({
+            'lat_min': lat_min,
+            'lng_min': lng_min,
+            'resolution': resolution,
+            'shape': [n_rows, n_cols],
+            'radius_m': PLANT_RADIUS_M,
+            'units': 'kg CO2 per MWh',
+        }, f, indent=2)
+    _loaded_grids.pop(grid_path, None)
+    return EmissionGrid(values, lat_min, lng_min, resolution)
+
+
+def accuracy_report(grid: EmissionGrid, calculator, power_plants, co2_emissions, samples: int = 500, seed: int = 0) -> dict:
+    """
+    Compares grid lookups with the exact per-location computation at random points near power plants.
+
+    :return: Mean, 95th percentile and max absolute error in kg CO2 per MWh, plus the sample count.
+    """
+    rng = np.random.default_rng(seed)
+    plants = np.flatnonzero(~(np.isnan(np.asarray(power_plants['latitude'], dtype=float)) |
+                              np.isnan(np.asarray(power_plants['longitude'], dtype=float))))
+    picks = rng.choice(plants, size=min(samples, len(plants)), replace=False)
+    lats = np.asarray(power_plants['latitude'], dtype=float)[picks] + rng.uniform(-0.25, 0.25, len(picks))
+    lngs = np.asarray(power_plants['longitude'], dtype=float)[picks] + rng.uniform(-0.25, 0.25, len(picks))
+
+    errors = []
+    for lat, lng in zip(lats, lngs):
+        approx = grid.lookup(lat, lng)
+        if approx is None:
+            continue
+        exact = calculator.grid_mix_intensity(lat, lng, power_plants, co2_emissions)
+        errors.append(abs(approx - exact))
+    errors = np.asarray(errors)
+    return {
+        'samples': int(len(errors)),
+        'mean_abs_error': float(errors.mean()) if len(errors) else 0.0,
+        'p95_abs_error': float(np.percentile(errors, 95)) if len(errors) else 0.0,
+        'max_abs_error': float(errors.max()) if len(errors) else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the grid-mix emission factor raster used by EmissionsCalculator.')
+    parser.add_argument('--resolution', type=float, default=0.05, help='Cell size in degrees')
+    parser.add_argument('--bounds', type=float, nargs=4, default=[-90.0, 90.0, -180.0, 180.0],
+                        metavar=('LAT_MIN', 'LAT_MAX', 'LNG_MIN', 'LNG_MAX'))
+    parser.add_argument('--output', default=DEFAULT_GRID_PATH)
+    parser.add_argument('--samples', type=int, default=500, help='Points used for the accuracy report')
+    args = parser.parse_args()
+
+    from EmissionsCalculator import EmissionsCalculator, power_plants, co2_emissions
+
+    grid = build_emission_grid(power_plants, co2_emissions, args.resolution, tuple(args.bounds), args.output)
+    print(f"Wrote {grid.values.shape[0]}x{grid.values.shape[1]} grid to {args.output}")
+    report = accuracy_report(grid, EmissionsCalculator(0, use_grid=False), power_plants, co2_emissions, args.samples)
+    print(json.dumps(report, indent=2))
@@ -1,7 +1,11 @@
-import pandas as pd
+import numpy as np
 from math import sin, cos, sqrt, atan2, radians
 
-power_plants = pd.read_csv("global_power_plant_database.csv", header=0)
+from SpatialIndex import GeoGridIndex
+from EmissionGrid import load_emission_grid
+from PowerPlants import get_power_plants
+from RouteNodes import node_columns
+
 co2_emissions = {
     'Hydro': 4,
     'Solar': 45,
@@ -20,14 +24,35 @@ co2_emissions = {
     'Cogeneration': 0  # This is a placeholder, as emissions depend on the fuel used
 } # kg CO2 per MWh
 
+def __getattr__(name):
+    # The power plant table is only loaded when something first asks for it
+    if name == 'power_plants':
+        return get_power_plants()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_power_plant_indexes = {}
+
+def get_power_plant_index(power_plants) -> GeoGridIndex:
+    """
+    Returns the spatial index over the latitude/longitude columns of power_plants,
+    building it on first use and reusing it for every later lookup.
+    """
+    cached = _power_plant_indexes.get(id(power_plants))
+    if cached is None or cached[0] is not power_plants:
+        cached = (power_plants, GeoGridIndex(power_plants['latitude'], power_plants['longitude']))
+        _power_plant_indexes[id(power_plants)] = cached
+    return cached[1]
+
 class EmissionsCalculator:
-    def __init__(self, vehicle_efficiency):
+    def __init__(self, vehicle_efficiency, use_grid=True):
         # Define the energy consumption in Wh/km for different vehicle types
         # self.energy_consumption = {
         #     'Model 3': 139,  # Tesla Model 3: 139 Wh/km
         #     # Add other vehicle types here if needed
         # }
         self.vehicle_efficiency = vehicle_efficiency
+        # Precomputed grid-mix raster (see EmissionGrid.py); None falls back to the exact computation
+        self.emission_grid = load_emission_grid() if use_grid else None
 
     def haversine(self, lat1, lon1, lat2, lon2):
         """
@@ -52,23 +77,100 @@ class EmissionsCalculator:
         distance = self.haversine(lat1, lon1, lat2, lon2)
         return distance <= dist
 
+    def grid_mix_intensity(self, lat, lon, power_plants, co2_emissions):
+        """
+        Returns the capacity-weighted kg CO2 / MWh of the power plants near the location
+        """
+        return self.grid_mix_intensities([lat], [lon], power_plants, co2_emissions)[0]
+
+    def grid_mix_intensities(self, lats, lons, power_plants, co2_emissions) -> np.ndarray:
+        """
+        Returns the capacity-weighted kg CO2 / MWh of the power plants near every location, testing the
+        candidate plants of all locations in one array pass
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        # Get power plants in a 20km radius, testing only the rows in nearby grid cells
+        points, candidates = get_power_plant_index(power_plants).query_radius_many(lats, lons, 20000)
+        lat1, lon1 = np.radians(lats[points]), np.radians(lons[points])
+        lat2, lon2 = np.radians(power_plants.latitude[candidates]), np.radians(power_plants.longitude[candidates])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        within = 6371000 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)) <= 20000
+        points, near = points[within], candidates[within]
+
+        # Get the fraction of each type of power plant based on primary_fuel and capacity_mw, per location
+        n_fuels = len(power_plants.fuel_names)
+        capacity = np.nan_to_num(power_plants.capacity_mw[near])
+        fuel_capacity = np.bincount(points * n_fuels + power_plants.fuel_codes[near].astype(np.int64), weights=capacity,
+                                    minlength=len(lats) * n_fuels).reshape(len(lats), n_fuels)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            power_plant_type_fraction = fuel_capacity / fuel_capacity.sum(axis=1, keepdims=True)
+        fuel_emissions = np.array([co2_emissions.get(fuel, np.nan) for fuel in power_plants.fuel_names])
+        return np.nansum(power_plant_type_fraction * fuel_emissions, axis=1)  # kg CO2 per MWh
+
     def get_power_plant_emission(self, lat, lon, power_plants, co2_emissions):
         """
         Returns kgCO2 / m based on the location and nearby power plants
         """
-        # Get power plants in a 20km radius
-        power_plants_near = power_plants[power_plants.apply(lambda row: self.is_within_distance(lat, lon, row['latitude'], row['longitude'], 20000), axis=1)]
-
-        # Get the fraction of each type of power plant based on primary_fuel and capacity_mw
-        power_plant_type_fraction = power_plants_near.groupby('primary_fuel').sum()['capacity_mw'] / power_plants_near['capacity_mw'].sum()
-        power_plant_type_emissions = (power_plant_type_fraction * pd.Series(co2_emissions)).sum()  # kg CO2 per MWh
+        power_plant_type_emissions = self.grid_mix_intensity(lat, lon, power_plants, co2_emissions)  # kg CO2 per MWh
 
         # Convert energy consumption to Wh/m and calculate emissions
         energy_consumption_wh_per_m = self.vehicle_efficiency / 1000
         return power_plant_type_emissions * energy_consumption_wh_per_m * 1e-6  # kg CO2 / m
+
+    def emission_factor(self, lat, lon):
+        """
+        Returns kgCO2 / m at the location, read from the precomputed grid when one covers it
+        """
+        if self.emission_grid is not None:
+            power_plant_type_emissions = self.emission_grid.lookup(lat, lon)
+            if power_plant_type_emissions is not None:
+                return power_plant_type_emissions * (self.vehicle_efficiency / 1000) * 1e-6
+        return self.get_power_plant_emission(lat, lon, get_power_plants(), co2_emissions)
+
+    def emission_factors(self, lats, lons) -> np.ndarray:
+        """
+        Returns kgCO2 / m for every location, reading all grid-covered points in one array gather and
+        computing the rest exactly in one pass over their nearby power plants
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        factors = np.empty(len(lats))
+        missing = np.ones(len(lats), dtype=bool)
+        if self.emission_grid is not None:
+            rows, cols, inside = self.emission_grid.cell_indices(lats, lons)
+            factors[inside] = self.emission_grid.values[rows[inside], cols[inside]].astype(float) * (self.vehicle_efficiency / 1000) * 1e-6
+            missing = ~inside
+        # Points the grid does not cover take the exact path
+        if missing.any():
+            intensities = self.grid_mix_intensities(lats[missing], lons[missing], get_power_plants(), co2_emissions)
+            factors[missing] = intensities * (self.vehicle_efficiency / 1000) * 1e-6
+        return factors
     
     def calculate_emissions(self, total_charge, loc):
         """
         Calculate the CO2 emissions for a given location
         """
-        return self.get_power_plant_emission(loc['lat'], loc['lng'], power_plants, co2_emissions) * total_charge
+        return self.emission_factor(loc['lat'], loc['lng']) * total_charge
+
+    def calculate_emissions_batch(self, lats, lons, meters):
+        """
+        Calculate the CO2 emissions of many segments, each driven on energy drawn at (lat, lon)
+
+        :param lats: Latitude of each segment's charging location.
+        :param lons: Longitude of each segment's charging location.
+        :param meters: Distance driven on each segment in meters.
+        :return: A tuple of the per-segment kg CO2 array and the total kg CO2.
+        """
+        per_segment = self.emission_factors(lats, lons) * np.asarray(meters, dtype=float)
+        return per_segment, float(per_segment.sum())
+
+    def route_emissions(self, nodes):
+        """
+        Attribute CO2 emissions to every segment of a route, priced where the segment starts
+
+        :param nodes: Route nodes with 'lat', 'lng' and 'dist' keys, or a NodeStore.
+        :return: A tuple of the per-node kg CO2 array and the total kg CO2.
+        """
+        columns = node_columns(nodes)
+        return self.calculate_emissions_batch(columns['lat'], columns['lng'], columns['dist'])
\ No newline at end of file
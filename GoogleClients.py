@@ -1,17 +1,504 @@
-import googlemaps
-import polyline
-from geopy.distance import geodesic
+import atexit
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
 from typing import List, Tuple
 from math import sin, cos, sqrt, atan2, radians
 
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'google_responses.sqlite')
+
+# Seconds a cached response stays valid, per googlemaps.Client method
+DEFAULT_CACHE_TTLS = {
+    'directions': 24 * 3600,
+    'places_nearby': 7 * 24 * 3600,
+}
+
+# Geohash length coordinates are quantized to in cache keys (7 ~ 150 m, 6 ~ 1 km)
+DEFAULT_CACHE_PRECISIONS = {
+    'directions': 7,
+    'places_nearby': 6,
+}
+
+# Buffered cache writes that trigger a flush to the SQLite file, and the longest one waits for it
+DISK_FLUSH_ENTRIES = 64
+DISK_FLUSH_SECONDS = 5.0
+
+# Responses written to the SQLite file between evictions of expired and least recently used rows
+DISK_EVICT_EVERY = 1000
+
+# Seconds a write waits for another process to release the SQLite file before giving up
+DISK_BUSY_TIMEOUT = 30
+
+# Google API requests per second allowed per API key and process, matched to the project's quota
+DEFAULT_QUERIES_PER_SECOND = 50
+
+# Keep-alive connections the shared HTTP session holds, enough for the enrichment workers of concurrent routes
+DEFAULT_POOL_CONNECTIONS = 32
+
+# Retries after an OVER_QUERY_LIMIT answer, waiting about OVER_QUERY_LIMIT_DELAY * 2 ** attempt seconds
+OVER_QUERY_LIMIT_RETRIES = 5
+OVER_QUERY_LIMIT_DELAY = 0.5
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(lat: float, lng: float, precision: int) -> str:
+    """
+    Encodes a location as a geohash string of the given length.
+    """
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def _normalize(value, precision: int):
+    # Coordinates become geohashes so nearby requests share an entry; addresses ignore case and spacing
+    if isinstance(value, dict) and set(value) == {'lat', 'lng'}:
+        return 'gh:' + geohash(value['lat'], value['lng'], precision)
+    if isinstance(value, (tuple, list)) and len(value) == 2 and all(isinstance(v, (int, float)) for v in value):
+        return 'gh:' + geohash(value[0], value[1], precision)
+    if isinstance(value, str):
+        return ' '.join(value.lower().split())
+    if isinstance(value, dict):
+        return {k: _normalize(v, precision) for k, v in sorted(value.items())}
+    if isinstance(value, (tuple, list)):
+        return [_normalize(v, precision) for v in value]
+    return value
+
+
+class ResponseCache:
+    def __init__(self, path: str = None, max_memory_entries: int = 1024, max_disk_entries: int = 100000,
+                 ttls: dict = None, precisions: dict = None, flush_entries: int = DISK_FLUSH_ENTRIES,
+                 flush_seconds: float = DISK_FLUSH_SECONDS, evict_every: int = DISK_EVICT_EVERY):
+        """
+        Two-tier cache of Google API responses: an in-memory LRU in front of an optional SQLite file.
+
+        Writes to the file are batched: new responses and the access times of disk hits are buffered and
+        written in one transaction once flush_entries are waiting or flush_seconds have passed, and
+        expired and least recently used rows are evicted every evict_every written responses. The file
+        is opened in WAL mode with a busy timeout so several processes can share it; a disk error is
+        counted and treated as a miss rather than failing the request.
+
+        :param path: SQLite file for the on-disk tier; None keeps the cache in memory only.
+        :param max_memory_entries: Entries kept in the LRU tier before the least recently used is evicted.
+        :param max_disk_entries: Rows kept in SQLite before the least recently used are evicted.
+        :param ttls: Seconds each endpoint's responses stay valid; endpoints not listed are not cached.
+        :param precisions: Geohash length used to quantize each endpoint's coordinates.
+        :param flush_entries: Buffered writes that trigger a flush to the file.
+        :param flush_seconds: Longest a buffered write waits for the next flush.
+        :param evict_every: Responses written to the file between evictions.
+        """
+        self.ttls = dict(DEFAULT_CACHE_TTLS if ttls is None else ttls)
+        self.precisions = dict(DEFAULT_CACHE_PRECISIONS if precisions is None else precisions)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.flush_entries = flush_entries
+        self.flush_seconds = flush_seconds
+        self.evict_every = evict_every
+        self.counters = Counter()
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        # Connection use is serialized separately so memory hits never wait for the disk
+        self._db_lock = threading.Lock()
+        self._pending_rows = {}
+        self._pending_accesses = {}
+        self._flushed_at = time.monotonic()
+        self._written_since_evict = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=DISK_BUSY_TIMEOUT, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS responses '
+                             '(key TEXT PRIMARY KEY, endpoint TEXT, value TEXT, expires_at REAL, accessed_at REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+            self._db.commit()
+            with self._db_lock:
+                self._evict_disk(time.time())
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def key(self, endpoint: str, args: tuple, kwargs: dict) -> str:
+        precision = self.precisions.get(endpoint, 7)
+        return endpoint + ':' + json.dumps(_normalize({'args': list(args), 'kwargs': kwargs}, precision), sort_keys=True)
+
+    def get(self, endpoint: str, key: str):
+        """
+        Returns the cached response for key, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.counters[(endpoint, 'memory_hits')] += 1
+                return json.loads(entry[1])
+            self._memory.pop(key, None)
+            pending = self._pending_rows.get(key)
+
+        row = None
+        if pending is not None:
+            row = (pending[1], pending[2])
+        elif self._db is not None:
+            try:
+                with self._db_lock:
+                    row = self._db.execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error:
+                self._count_disk_error()
+        with self._lock:
+            if row is not None and row[1] > now:
+                self._pending_accesses[key] = now
+                self._remember(key, row[1], row[0])
+                self.counters[(endpoint, 'disk_hits')] += 1
+                flush = self._flush_due()
+            else:
+                self.counters[(endpoint, 'misses')] += 1
+                return None
+        if flush:
+            self.flush()
+        return json.loads(row[0])
+
+    def put(self, endpoint: str, key: str, value):
+        now = time.time()
+        expires_at = now + self.ttls[endpoint]
+        text = json.dumps(value)
+        with self._lock:
+            self._remember(key, expires_at, text)
+            if self._db is None:
+                return
+            self._pending_rows[key] = (endpoint, text, expires_at, now)
+            self._pending_accesses.pop(key, None)
+            flush = self._flush_due()
+        if flush:
+            self.flush()
+
+    def _flush_due(self) -> bool:
+        # Called with the lock held
+        waiting = len(self._pending_rows) + len(self._pending_accesses)
+        return waiting >= self.flush_entries or (waiting and time.monotonic() - self._flushed_at >= self.flush_seconds)
+
+    def flush(self):
+        """
+        Writes the buffered responses and access times to the file in one transaction.
+        """
+        if self._db is None:
+            return
+        with self._db_lock:
+            with self._lock:
+                rows, self._pending_rows = self._pending_rows, {}
+                accesses, self._pending_accesses = self._pending_accesses, {}
+                self._flushed_at = time.monotonic()
+            if not rows and not accesses:
+                return
+            now = time.time()
+            try:
+                with self._db:
+                    self._db.executemany('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                                         [(key,) + row for key, row in rows.items()])
+                    self._db.executemany('UPDATE responses SET accessed_at = ? WHERE key = ?',
+                                         [(accessed_at, key) for key, accessed_at in accesses.items()])
+                self._written_since_evict += len(rows)
+                if self._written_since_evict >= self.evict_every:
+                    self._evict_disk(now)
+            except sqlite3.Error:
+                # Another process held the file past the busy timeout; the responses stay in memory
+                self._count_disk_error()
+
+    def _evict_disk(self, now):
+        # Called with the connection lock held. Drops expired rows, then the least recently used beyond
+        # max_disk_entries, walking the access-time index from the oldest end only as far as needed
+        self._written_since_evict = 0
+        with self._db:
+            self._db.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+            excess = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_disk_entries
+            if excess > 0:
+                self._db.execute('DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at '
+                                 'LIMIT ?)', (excess,))
+                with self._lock:
+                    self.counters[('disk', 'evictions')] += excess
+
+    def _count_disk_error(self):
+        with self._lock:
+            self.counters[('disk', 'errors')] += 1
+
+    def _remember(self, key, expires_at, text):
+        self._memory[key] = (expires_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.counters[('memory', 'evictions')] += 1
+
+    def call(self, endpoint: str, fetch, *args, **kwargs):
+        """
+        Returns the cached response for fetch(*args, **kwargs), calling fetch only on a miss.
+        """
+        key = self.key(endpoint, args, kwargs)
+        value = self.get(endpoint, key)
+        if value is None:
+            value = fetch(*args, **kwargs)
+            self.put(endpoint, key, value)
+        return value
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counters per endpoint, the current size of each tier and the writes waiting for a flush.
+        """
+        with self._lock:
+            stats = {}
+            for (endpoint, name), count in self.counters.items():
+                stats.setdefault(endpoint, {})[name] = count
+            stats['memory_entries'] = len(self._memory)
+            stats['pending_writes'] = len(self._pending_rows) + len(self._pending_accesses)
+        if self._db is not None:
+            with self._db_lock:
+                stats['disk_entries'] = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return stats
+
+
+def _flush_at_exit(cache_ref):
+    cache = cache_ref()
+    if cache is not None:
+        cache.flush()
+
+
+class CachedGoogleMaps:
+    def __init__(self, client, cache: ResponseCache):
+        """
+        Wraps a googlemaps.Client so every endpoint listed in the cache's TTLs is answered from the cache.
+        Other attributes pass through to the wrapped client.
+        """
+        self.client = client
+        self.cache = cache
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        if name not in self.cache.ttls:
+            return method
+        return lambda *args, **kwargs: self.cache.call(name, method, *args, **kwargs)
+
+
+_default_cache = None
+
+def default_response_cache() -> ResponseCache:
+    """
+    Returns the process-wide cache backed by cache/google_responses.sqlite.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache(DEFAULT_CACHE_PATH)
+    return _default_cache
+
+
+def _forget_default_cache():
+    global _default_cache
+    _default_cache = None
+
+# A SQLite connection must not be used from a forked child; children open their own on first use
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_default_cache)
+
+
+def new_google_client(api_key: str, **kwargs):
+    """
+    Creates a googlemaps.Client, importing googlemaps on first use rather than when this module loads.
+
+    :param kwargs: Passed on to googlemaps.Client.
+    """
+    import googlemaps
+    return googlemaps.Client(key=api_key, **kwargs)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Thread-safe token bucket refilled at rate tokens per second.
+
+        :param capacity: Largest burst allowed after an idle period; defaults to one second of tokens.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Takes a token, sleeping until the bucket has refilled enough to cover it.
+
+        :return: Seconds spent waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative, so waiting callers are served in the order they arrived
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class PooledGoogleClient:
+    def __init__(self, api_key: str, queries_per_second: float = DEFAULT_QUERIES_PER_SECOND,
+                 pool_connections: int = DEFAULT_POOL_CONNECTIONS, max_retries: int = OVER_QUERY_LIMIT_RETRIES,
+                 base_url: str = None, client=None):
+        """
+        Wraps one googlemaps.Client for every planner in a process. Requests share a keep-alive HTTP
+        session, wait for a token bucket matched to the QPS quota, are retried with jittered backoff on
+        OVER_QUERY_LIMIT and are counted per endpoint. Other attributes pass through to the wrapped client.
+
+        :param api_key: Google Maps API key.
+        :param queries_per_second: Requests per second this process may send with the key.
+        :param pool_connections: Keep-alive connections held by the HTTP session.
+        :param max_retries: Retries after OVER_QUERY_LIMIT before the error is raised.
+        :param base_url: Overrides the Google Maps API host, e.g. for a local stub server.
+        :param client: Optional googlemaps.Client (or compatible fake) to wrap instead of creating one.
+        """
+        if client is None:
+            import requests
+
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_connections)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            kwargs = {'base_url': base_url} if base_url else {}
+            # The token bucket does the throttling; the client's own window is kept looser so it never adds a wait
+            client = new_google_client(api_key, requests_session=session, retry_over_query_limit=False,
+                                       queries_per_second=max(int(2 * queries_per_second), 1),
+                                       queries_per_minute=max(int(120 * queries_per_second), 1), **kwargs)
+        self.client = client
+        self.bucket = TokenBucket(queries_per_second)
+        self.max_retries = max_retries
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        if name.startswith('_') or not callable(method):
+            return method
+        return lambda *args, **kwargs: self.call(name, method, *args, **kwargs)
+
+    def call(self, endpoint: str, method, *args, **kwargs):
+        """
+        Sends method(*args, **kwargs) once the rate limit allows, retrying while the API answers OVER_QUERY_LIMIT.
+        """
+        for attempt in range(self.max_retries + 1):
+            waited = self.bucket.acquire()
+            began = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                over_limit = getattr(e, 'status', None) == 'OVER_QUERY_LIMIT'
+                self._count(endpoint, waited, time.perf_counter() - began,
+                            'over_query_limit' if over_limit else 'errors')
+                if not over_limit or attempt == self.max_retries:
+                    raise
+            else:
+                self._count(endpoint, waited, time.perf_counter() - began)
+                return result
+            time.sleep(OVER_QUERY_LIMIT_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def _count(self, endpoint, waited, seconds, outcome=None):
+        with self._lock:
+            self.counters[(endpoint, 'requests')] += 1
+            self.counters[(endpoint, 'throttled_seconds')] += waited
+            self.counters[(endpoint, 'request_seconds')] += seconds
+            if outcome is not None:
+                self.counters[(endpoint, outcome)] += 1
+
+    def stats(self) -> dict:
+        """
+        Requests sent, OVER_QUERY_LIMIT answers, other errors and seconds spent throttled and in flight, per endpoint.
+        """
+        with self._lock:
+            stats = {}
+            for (endpoint, name), count in self.counters.items():
+                stats.setdefault(endpoint, {})[name] = count
+            return stats
+
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+_queries_per_second = DEFAULT_QUERIES_PER_SECOND
+
+def shared_google_client(api_key: str) -> PooledGoogleClient:
+    """
+    Returns the process-wide PooledGoogleClient for api_key.
+    """
+    with _shared_clients_lock:
+        if api_key not in _shared_clients:
+            _shared_clients[api_key] = PooledGoogleClient(api_key, queries_per_second=_queries_per_second)
+        return _shared_clients[api_key]
+
+
+def set_queries_per_second(queries_per_second: float):
+    """
+    Sets the rate of the process-wide clients created from now on, e.g. a worker's share of the quota.
+    """
+    global _queries_per_second
+    _queries_per_second = queries_per_second
+
+
+def google_client_stats() -> dict:
+    """
+    Per-endpoint counters summed over the process-wide clients.
+    """
+    totals = {}
+    for client in list(_shared_clients.values()):
+        for endpoint, counters in client.stats().items():
+            for name, count in counters.items():
+                totals.setdefault(endpoint, {}).setdefault(name, 0)
+                totals[endpoint][name] += count
+    return totals
+
+
+def _forget_shared_clients():
+    global _shared_clients_lock
+    _shared_clients.clear()
+    _shared_clients_lock = threading.Lock()
+
+# Keep-alive sockets must not be shared with a forked child either
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_shared_clients)
+
+
+def with_cache(client, cache: ResponseCache = None):
+    """
+    Returns client wrapped in cache, or client itself when cache is None.
+    """
+    return CachedGoogleMaps(client, cache) if cache is not None else client
+
+
 class GooglePlacesClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, client=None, cache: ResponseCache = None):
         """
         Initializes the GooglePlacesClient with a given API key.
 
         :param api_key: Google Places API key.
+        :param client: Optional googlemaps.Client (or compatible fake) to use instead of the process-wide one.
+        :param cache: Optional ResponseCache for places_nearby responses.
         """
-        self.client = googlemaps.Client(key=api_key)
+        self.client = with_cache(client or shared_google_client(api_key), cache)
 
     def find_nearby_charging_stations(self, location: Tuple[float, float],  radius: int = 10000) -> List[dict]:
         """
@@ -32,8 +519,8 @@ class GooglePlacesClient:
 
         return results['results']
 class GoogleMapsClient:
-    def __init__(self, api_key: str):
-        self.client = googlemaps.Client(key=api_key)
+    def __init__(self, api_key: str, client=None, cache: ResponseCache = None):
+        self.client = with_cache(client or shared_google_client(api_key), cache)
 
     def get_route(self, start: Tuple[float, float], end: Tuple[float, float]) -> dict:
         """
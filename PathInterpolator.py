@@ -1,32 +1,79 @@
-import googlemaps
+import logging
+
 import polyline
-from geopy.distance import geodesic
+import numpy as np
+
+from GoogleClients import shared_google_client, with_cache
+from PlannerMetrics import phase
+
+logger = logging.getLogger(__name__)
+
+# WGS84 ellipsoid, the same model geopy's geodesic uses
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+EARTH_RADIUS_M = 6371000
+
+
+def segment_lengths(points, method='ellipsoidal'):
+    """
+    Returns the length in meters of every segment between consecutive (lat, lng) points.
+
+    'ellipsoidal' uses the WGS84 meridional and prime-vertical radii at each segment's mid-latitude,
+    which agrees with geodesic to well under a meter for polyline-length segments.
+    'haversine' uses a spherical earth.
+
+    :param points: Array-like of shape (n, 2) with latitude and longitude in decimal degrees.
+    :param method: 'ellipsoidal' or 'haversine'.
+    :return: Array of n - 1 segment lengths.
+    """
+    points = np.radians(np.asarray(points, dtype=float))
+    lat1, lng1 = points[:-1, 0], points[:-1, 1]
+    lat2, lng2 = points[1:, 0], points[1:, 1]
+    dlat = lat2 - lat1
+    dlng = (lng2 - lng1 + np.pi) % (2 * np.pi) - np.pi
+
+    if method == 'haversine':
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+        return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    if method == 'ellipsoidal':
+        mid_lat = (lat1 + lat2) / 2
+        w = 1 - WGS84_E2 * np.sin(mid_lat) ** 2
+        meridional = WGS84_A * (1 - WGS84_E2) / w ** 1.5
+        prime_vertical = WGS84_A / np.sqrt(w)
+        return np.hypot(meridional * dlat, prime_vertical * np.cos(mid_lat) * dlng)
+    raise ValueError(f"Unknown distance method: {method}")
+
 
 class PathInterpolator:
-    def __init__(self, api_key, interval_meters=10000):
-        self.gmaps = googlemaps.Client(key=api_key)
+    def __init__(self, api_key, interval_meters=10000, vectorized=True, distance_method='ellipsoidal', client=None, cache=None):
+        self.gmaps = with_cache(client or shared_google_client(api_key), cache)
         self.interval_meters = interval_meters
+        self.vectorized = vectorized
+        self.distance_method = distance_method
 
     def get_points_at_intervals(self, origin, destination):
         # # Request directions
-        directions_result = self.gmaps.directions(origin, destination)
+        with phase('directions'):
+            directions_result = self.gmaps.directions(origin, destination)
 
         # Extract the encoded polyline
         # encoded_polyline = route['overview_polyline']['points']
         encoded_polyline = directions_result[0]['overview_polyline']['points']
 
-        # Decode the polyline to get a list of latitude and longitude points
-        path = polyline.decode(encoded_polyline)
-
-        print("HERE")
+        with phase('interpolation'):
+            # Decode the polyline to get a list of latitude and longitude points
+            path = polyline.decode(encoded_polyline)
+            logger.debug("Decoded %d polyline points from %s to %s", len(path), origin, destination)
 
-        
-        # print(path)
-
-        # Interpolate points along the path
-        return self._interpolate_points(path, self.interval_meters)
+            # Interpolate points along the path
+            if self.vectorized:
+                return self._interpolate_points_vectorized(path, self.interval_meters)
+            return self._interpolate_points(path, self.interval_meters)
 
     def _interpolate_points(self, path, interval_meters):
+        from geopy.distance import geodesic
+
         points = [path[0]]
         remaining_distance = interval_meters
         for i in range(1, len(path)):
@@ -45,3 +92,25 @@ class PathInterpolator:
                 remaining_distance = interval_meters
             remaining_distance -= distance
         return points
+
+    def _interpolate_points_vectorized(self, path, interval_meters):
+        """
+        Same spacing as _interpolate_points: the first vertex, then a point every interval_meters of
+        cumulative distance, placed linearly in lat/lng within its segment. Does not modify path.
+        """
+        vertices = np.asarray(path, dtype=float)
+        points = [tuple(path[0])]
+        if len(vertices) < 2:
+            return points
+
+        lengths = segment_lengths(vertices, self.distance_method)
+        cumulative = np.concatenate(([0.0], np.cumsum(lengths)))
+        targets = interval_meters * np.arange(1, int(cumulative[-1] // interval_meters) + 1)
+
+        # Segment k spans cumulative[k - 1] < target <= cumulative[k], matching the loop's >= test
+        ends = np.minimum(np.searchsorted(cumulative, targets, side='left'), len(vertices) - 1)
+        starts = ends - 1
+        ratios = (targets - cumulative[starts]) / lengths[starts]
+        new_points = vertices[starts] + ratios[:, None] * (vertices[ends] - vertices[starts])
+        points.extend(map(tuple, new_points.tolist()))
+        return points
@@ -0,0 +1,156 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Iterable, Tuple
+
+# Upper bounds in seconds of the latency histogram buckets, from a single node's decision to a whole route
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_text(label_names: Tuple[str, ...], label_values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f'{self.name}{_label_text(self.label_names, key)} {value}'
+
+
+class _Timer:
+    __slots__ = ('histogram', 'key', 'began')
+
+    def __init__(self, histogram, key):
+        self.histogram = histogram
+        self.key = key
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram._observe(self.key, time.perf_counter() - self.began)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Cumulative Prometheus histogram: per label set, a count per bucket upper bound plus the sum and count.
+        """
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        self._observe(tuple(labels.get(name, '') for name in self.label_names), value)
+
+    def time(self, **labels) -> _Timer:
+        """
+        Context manager observing the seconds its block takes.
+        """
+        return _Timer(self, tuple(labels.get(name, '') for name in self.label_names))
+
+    def _observe(self, key, value):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One slot per bucket, then +Inf, the sum and the count
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[bucket] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = _label_text(self.label_names, key, 'le="%s"' % bound)
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            yield f'{self.name}_sum{_label_text(self.label_names, key)} {counts[-2]}'
+            yield f'{self.name}_count{_label_text(self.label_names, key)} {counts[-1]}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        The process's counters and histograms, plus collectors that report values kept elsewhere,
+        rendered in the Prometheus text exposition format.
+        """
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """
+        Registers collect(), called on every render. It returns (name, type, help, samples) tuples, where
+        samples is a list of (labels dict, value) pairs.
+        """
+        self._collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, type, help, samples in collect():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {type}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_label_text(tuple(labels), tuple(labels.values()))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+PHASE_SECONDS = REGISTRY.histogram(
+    'ev_planner_phase_seconds',
+    'Seconds spent in each route planning phase: directions, interpolation, node_building, enrichment, '
+    'charge_decision, inference, emissions, graph_search and the whole route',
+    ('phase',))
+ROUTES_TOTAL = REGISTRY.counter('ev_planner_routes_total', 'Routes planned, by planner type', ('type',))
+
+
+def phase(name: str) -> _Timer:
+    """
+    Times a block as one observation of the named planning phase. Phases may nest; the charge decision
+    includes inference, and the route includes everything.
+    """
+    return PHASE_SECONDS.time(phase=name)
@@ -0,0 +1,163 @@
+import json
+import os
+import re
+import shutil
+import uuid
+import argparse
+import numpy as np
+
+DEFAULT_CSV_PATH = "global_power_plant_database.csv"
+DEFAULT_COLUMNAR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'power_plants')
+NUMERIC_COLUMNS = ('latitude', 'longitude', 'capacity_mw')
+
+
+class PowerPlantTable:
+    def __init__(self, latitude, longitude, capacity_mw, fuel_codes, fuel_names):
+        """
+        Column store of the power plant fields the emissions estimate uses.
+
+        :param latitude: Latitudes in decimal degrees.
+        :param longitude: Longitudes in decimal degrees.
+        :param capacity_mw: Plant capacity in MW.
+        :param fuel_codes: Index into fuel_names for each plant's primary_fuel.
+        :param fuel_names: Distinct primary_fuel values.
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.capacity_mw = capacity_mw
+        self.fuel_codes = fuel_codes
+        self.fuel_names = list(fuel_names)
+
+    def __len__(self):
+        return len(self.latitude)
+
+    def __getitem__(self, column):
+        if column == 'primary_fuel':
+            return np.asarray(self.fuel_names, dtype=object)[self.fuel_codes]
+        if column in NUMERIC_COLUMNS:
+            return getattr(self, column)
+        raise KeyError(column)
+
+    @classmethod
+    def from_csv(cls, csv_path: str = DEFAULT_CSV_PATH) -> 'PowerPlantTable':
+        """
+        Parses only the needed columns of the global power plant database CSV.
+        """
+        import pandas as pd
+
+        frame = pd.read_csv(csv_path, header=0, usecols=list(NUMERIC_COLUMNS) + ['primary_fuel'])
+        fuel_codes, fuel_names = pd.factorize(frame['primary_fuel'], use_na_sentinel=False)
+        return cls(
+            frame['latitude'].to_numpy(dtype=np.float64),
+            frame['longitude'].to_numpy(dtype=np.float64),
+            frame['capacity_mw'].to_numpy(dtype=np.float64),
+            fuel_codes.astype(np.int16),
+            [str(name) for name in fuel_names],
+        )
+
+    def save(self, directory: str = DEFAULT_COLUMNAR_DIR):
+        """
+        Writes one .npy file per column so each can be memory-mapped independently.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for column in NUMERIC_COLUMNS:
+            np.save(os.path.join(directory, f'{column}.npy'), np.ascontiguousarray(getattr(self, column)))
+        np.save(os.path.join(directory, 'primary_fuel.npy'), np.ascontiguousarray(self.fuel_codes))
+        with open(os.path.join(directory, 'primary_fuel.json'), 'w') as f:
+            json.dump(self.fuel_names, f)
+
+    @classmethod
+    def load(cls, directory: str = DEFAULT_COLUMNAR_DIR, mmap: bool = True) -> 'PowerPlantTable':
+        """
+        Opens a table written by save. With mmap the columns are read-only views of the page cache,
+        so pre-forked workers share them instead of each holding a private copy.
+        """
+        mmap_mode = 'r' if mmap else None
+        columns = [np.load(os.path.join(directory, f'{column}.npy'), mmap_mode=mmap_mode) for column in NUMERIC_COLUMNS]
+        fuel_codes = np.load(os.path.join(directory, 'primary_fuel.npy'), mmap_mode=mmap_mode)
+        with open(os.path.join(directory, 'primary_fuel.json')) as f:
+            fuel_names = json.load(f)
+        return cls(*columns, fuel_codes, fuel_names)
+
+
+# Store directory names written by convert_csv: the CSV's size and modification time in hex
+_VERSION_PATTERN = re.compile(r'^[0-9a-f]+-[0-9a-f]+$')
+
+
+def source_version(csv_path: str = DEFAULT_CSV_PATH) -> str:
+    """
+    Names the columnar store built from the CSV as it is now, from its size and modification time.
+    """
+    stat = os.stat(csv_path)
+    return f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+
+
+def convert_csv(csv_path: str = DEFAULT_CSV_PATH, directory: str = DEFAULT_COLUMNAR_DIR) -> PowerPlantTable:
+    """
+    Converts the power plant CSV to a columnar store in a subdirectory of directory named by source_version.
+    The store is written to a temporary directory and renamed into place, so processes converting at the
+    same time never rewrite files another one has mapped; stores of earlier CSV versions are removed.
+    """
+    version = source_version(csv_path)
+    table = PowerPlantTable.from_csv(csv_path)
+    tmp_dir = os.path.join(directory, f'.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}')
+    table.save(tmp_dir)
+    with open(os.path.join(tmp_dir, 'source.json'), 'w') as f:
+        json.dump({'csv': os.path.abspath(csv_path), 'version': version}, f)
+    try:
+        os.rename(tmp_dir, os.path.join(directory, version))
+    except OSError:
+        # Another process finished the same conversion first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Only stores this module wrote are removed, since directory may hold other data. Mappings of removed
+    # files stay valid in processes that still have them open
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name != version and _VERSION_PATTERN.match(name) and os.path.isfile(os.path.join(path, 'source.json')):
+            shutil.rmtree(path, ignore_errors=True)
+    return table
+
+
+def _latest_store(directory: str):
+    # The most recently converted store, for deployments that ship the store without the CSV
+    # including one written directly into directory before stores were versioned
+    stores = [os.path.join(directory, name) for name in os.listdir(directory) if not name.startswith('.tmp-')] + [directory]
+    stores = [store for store in stores if os.path.exists(os.path.join(store, 'primary_fuel.json'))]
+    return max(stores, key=lambda store: os.path.getmtime(os.path.join(store, 'primary_fuel.json'))) if stores else None
+
+
+_power_plants = None
+
+def get_power_plants() -> PowerPlantTable:
+    """
+    Returns the process-wide power plant table, loading it on first use.
+    The columnar store is created from the CSV when there is none for its current version.
+    """
+    global _power_plants
+    if _power_plants is None:
+        if not os.path.exists(DEFAULT_CSV_PATH) and os.path.isdir(DEFAULT_COLUMNAR_DIR):
+            store = _latest_store(DEFAULT_COLUMNAR_DIR)
+            if store is not None:
+                _power_plants = PowerPlantTable.load(store)
+                return _power_plants
+        store = os.path.join(DEFAULT_COLUMNAR_DIR, source_version(DEFAULT_CSV_PATH))
+        if not os.path.exists(os.path.join(store, 'primary_fuel.json')):
+            try:
+                convert_csv(DEFAULT_CSV_PATH, DEFAULT_COLUMNAR_DIR)
+            except OSError:
+                # Read-only deployments still work, just without the shared mapping
+                _power_plants = PowerPlantTable.from_csv(DEFAULT_CSV_PATH)
+                return _power_plants
+        _power_plants = PowerPlantTable.load(store)
+    return _power_plants
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert the power plant CSV to the memory-mapped columnar store.')
+    parser.add_argument('--csv', default=DEFAULT_CSV_PATH)
+    parser.add_argument('--output', default=DEFAULT_COLUMNAR_DIR)
+    args = parser.parse_args()
+
+    table = convert_csv(args.csv, args.output)
+    print(f"Wrote {len(table)} power plants to {os.path.join(args.output, source_version(args.csv))}")
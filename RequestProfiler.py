@@ -0,0 +1,151 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'profiles')
+
+# Captures kept on disk; the oldest are deleted first
+DEFAULT_MAX_PROFILES = 20
+
+# Functions and allocation sites summarized in each capture's metadata
+TOP_ENTRIES = 25
+
+# Frames kept per allocation traceback; deeper stacks cost more while tracing
+TRACEMALLOC_FRAMES = 5
+
+
+class ProfileStore:
+    def __init__(self, directory: str = DEFAULT_PROFILE_DIR, max_profiles: int = DEFAULT_MAX_PROFILES):
+        """
+        Runs calls under cProfile and tracemalloc and keeps the last max_profiles captures in directory:
+        <id>.prof, loadable with pstats or snakeviz, and <id>.json with the timings, peak memory, the
+        functions with the most cumulative time and the allocation sites holding the most memory when
+        the call returned.
+        """
+        self.directory = directory
+        self.max_profiles = max_profiles
+        # tracemalloc is process-wide, so captures run one at a time
+        self._lock = threading.Lock()
+
+    def capture(self, fn, *args, **metadata):
+        """
+        Calls fn(*args) while profiling it. Only the calling thread is profiled; allocations are traced
+        in every thread, so work fn hands to a thread pool shows up in memory but not in the profile.
+        Callers run such work on the calling thread while capturing, as /evroute does with enrichment.
+
+        :param metadata: Extra fields saved with the capture, e.g. the request that was profiled.
+        :return: fn's result and the capture's metadata.
+        """
+        with self._lock:
+            profile = cProfile.Profile()
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            began = time.perf_counter()
+            try:
+                profile.enable()
+                try:
+                    result = fn(*args)
+                finally:
+                    profile.disable()
+                seconds = time.perf_counter() - began
+                _, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                if not tracing:
+                    tracemalloc.stop()
+
+            # Ids sort by capture time, which is how the ring finds the oldest
+            now = time.time()
+            capture_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}{int(now % 1 * 1E6):06d}-{uuid.uuid4().hex[:8]}"
+            metadata = dict(
+                metadata,
+                id=capture_id,
+                created_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)),
+                seconds=round(seconds, 4),
+                peak_memory_mb=round(peak / 2 ** 20, 3),
+                top_functions=_top_functions(profile),
+                top_allocations=_top_allocations(snapshot),
+            )
+            self._save(capture_id, profile, metadata)
+            return result, metadata
+
+    def _save(self, capture_id, profile, metadata):
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(self.path(capture_id, 'prof'))
+        # Metadata is written last and swapped in, so a listed capture always has its profile
+        tmp_path = self.path(capture_id, 'json') + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_path, self.path(capture_id, 'json'))
+        for old in self.ids()[self.max_profiles:]:
+            for kind in ('json', 'prof'):
+                try:
+                    os.remove(self.path(old, kind))
+                except FileNotFoundError:
+                    pass
+
+    def path(self, capture_id: str, kind: str) -> str:
+        """
+        Path of a capture's 'prof' or 'json' file.
+        """
+        if os.path.basename(capture_id) != capture_id or kind not in ('prof', 'json'):
+            raise ValueError(f"Invalid profile {capture_id}.{kind}")
+        return os.path.join(self.directory, f'{capture_id}.{kind}')
+
+    def ids(self) -> list:
+        """
+        Capture ids, newest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted((name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json')), reverse=True)
+
+    def list(self) -> list:
+        """
+        Summary of every capture on disk, newest first.
+        """
+        captures = []
+        for capture_id in self.ids():
+            try:
+                with open(self.path(capture_id, 'json')) as f:
+                    metadata = json.load(f)
+            except (FileNotFoundError, ValueError):
+                continue  # Deleted by a concurrent capture
+            captures.append({name: value for name, value in metadata.items() if not name.startswith('top_')})
+        return captures
+
+    def get(self, capture_id: str):
+        """
+        Full metadata of one capture, or None if it is no longer on disk.
+        """
+        try:
+            with open(self.path(capture_id, 'json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+def _top_functions(profile: cProfile.Profile) -> list:
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (calls, _, own, cumulative, _) in stats.stats.items():
+        rows.append({'function': f'{os.path.basename(filename)}:{line}({name})', 'calls': calls,
+                     'own_seconds': round(own, 6), 'cumulative_seconds': round(cumulative, 6)})
+    rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+    return rows[:TOP_ENTRIES]
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot) -> list:
+    # Allocations made by the profilers themselves are not the request's
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                       tracemalloc.Filter(False, cProfile.__file__)])
+    return [{'site': f'{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}',
+             'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+            for stat in snapshot.statistics('lineno')[:TOP_ENTRIES]]
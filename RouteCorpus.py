@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import shutil
+from typing import List
+
+import numpy as np
+
+from RouteNodes import NodeStore, node_columns
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'route_corpus')
+CORPUS_FORMAT_VERSION = 1
+NODE_COLUMNS = ('lat', 'lng', 'dist', 'station_distance')
+
+
+class RouteCorpus:
+    def __init__(self, lat, lng, dist, station_distance, branched, route_starts, trips: List[dict] = None):
+        """
+        Many enriched route node lists stored back to back in columns, so environments can sample
+        routes without planning them.
+
+        :param lat: Node latitudes.
+        :param lng: Node longitudes.
+        :param dist: Distance in meters from each node to the next one in its route.
+        :param station_distance: Distance in meters to the node's nearest charging station, NaN when it has none.
+        :param branched: Whether each node starts a branch to a charging station.
+        :param route_starts: Offset of every route in the node columns, followed by the total node count.
+        :param trips: Optional per-route details such as start, end and vehicle range.
+        """
+        self.lat = lat
+        self.lng = lng
+        self.dist = dist
+        self.station_distance = station_distance
+        self.branched = branched
+        self.route_starts = route_starts
+        self.trips = list(trips) if trips is not None else [{} for _ in range(len(route_starts) - 1)]
+
+    def __len__(self):
+        return len(self.route_starts) - 1
+
+    @property
+    def node_count(self) -> int:
+        return int(self.route_starts[-1])
+
+    @classmethod
+    def from_routes(cls, routes: List[List[dict]], trips: List[dict] = None) -> 'RouteCorpus':
+        """
+        Packs node lists or NodeStores as returned by EVRoutePlanner.calculate_route. Station payloads are dropped.
+        """
+        columns = [node_columns(route) for route in routes]
+
+        def packed(column, dtype):
+            return np.concatenate([np.zeros(0, dtype=dtype)] + [route[column] for route in columns]).astype(dtype)
+
+        return cls(
+            *[packed(column, np.float32) for column in NODE_COLUMNS],
+            packed('branched', bool),
+            np.concatenate(([0], np.cumsum([len(route) for route in routes]))).astype(np.int64),
+            trips,
+        )
+
+    @classmethod
+    def concatenate(cls, corpora: List['RouteCorpus']) -> 'RouteCorpus':
+        offsets = np.cumsum([0] + [corpus.node_count for corpus in corpora[:-1]])
+        return cls(
+            *[np.concatenate([getattr(corpus, column) for corpus in corpora]) for column in NODE_COLUMNS + ('branched',)],
+            np.concatenate([[0]] + [np.asarray(corpus.route_starts[1:]) + offset for corpus, offset in zip(corpora, offsets)]),
+            [trip for corpus in corpora for trip in corpus.trips],
+        )
+
+    def route(self, i: int) -> NodeStore:
+        """
+        Returns route i as a NodeStore like EVRoutePlanner.route, reading only its slice of the columns.
+        """
+        start, end = int(self.route_starts[i]), int(self.route_starts[i + 1])
+        return NodeStore.from_columns(*[getattr(self, column)[start:end] for column in NODE_COLUMNS + ('branched',)])
+
+    def sample_route(self, rng) -> NodeStore:
+        """
+        Returns a uniformly chosen route; rng is a random.Random or numpy Generator.
+        """
+        if len(self) == 0:
+            raise ValueError("The route corpus is empty")
+        if isinstance(rng, np.random.Generator):
+            return self.route(int(rng.integers(len(self))))
+        return self.route(rng.randrange(len(self)))
+
+    def save(self, directory: str = DEFAULT_CORPUS_DIR):
+        """
+        Writes one .npy file per column, and the trips, into a fresh directory swapped in for directory.
+        """
+        tmp_dir = directory.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for column in NODE_COLUMNS + ('branched', 'route_starts'):
+            np.save(os.path.join(tmp_dir, f'{column}.npy'), np.ascontiguousarray(getattr(self, column)))
+        with open(os.path.join(tmp_dir, 'routes.json'), 'w') as f:
+            json.dump({'format_version': CORPUS_FORMAT_VERSION, 'trips': self.trips}, f)
+
+        old_dir = directory.rstrip(os.sep) + '.old'
+        if os.path.exists(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str = DEFAULT_CORPUS_DIR, mmap: bool = True) -> 'RouteCorpus':
+        """
+        Opens a corpus written by save. With mmap the columns are read on demand from the page cache.
+        """
+        with open(os.path.join(directory, 'routes.json')) as f:
+            routes = json.load(f)
+        if routes.get('format_version') != CORPUS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported route corpus format version {routes.get('format_version')} in {directory}")
+        mmap_mode = 'r' if mmap else None
+        columns = [np.load(os.path.join(directory, f'{column}.npy'), mmap_mode=mmap_mode)
+                   for column in NODE_COLUMNS + ('branched', 'route_starts')]
+        return cls(*columns, routes['trips'])
+
+
+class RouteCorpusRecorder:
+    def __init__(self, directory: str = DEFAULT_CORPUS_DIR):
+        """
+        Collects routes from planner runs and adds them to the corpus in directory on save.
+        """
+        self.directory = directory
+        self.routes = []
+        self.trips = []
+
+    def record(self, nodes: List[dict], **trip):
+        self.routes.append(nodes)
+        self.trips.append(trip)
+
+    def record_planner(self, ev_route_planner, type: str = 'regular') -> List[dict]:
+        """
+        Plans ev_route_planner's trip and records the resulting route.
+        """
+        route = ev_route_planner.calculate_route(type)
+        self.record(route, start=list(ev_route_planner.start), end=list(ev_route_planner.end),
+                    vehicle_range=ev_route_planner.vehicle_range, type=type)
+        return route
+
+    def save(self) -> RouteCorpus:
+        """
+        Appends the recorded routes to the corpus on disk, creating it if needed.
+        """
+        corpus = RouteCorpus.from_routes(self.routes, self.trips)
+        if os.path.exists(os.path.join(self.directory, 'routes.json')):
+            corpus = RouteCorpus.concatenate([RouteCorpus.load(self.directory, mmap=False), corpus])
+        corpus.save(self.directory)
+        self.routes, self.trips = [], []
+        return corpus
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the recorded route corpus used to train without API calls.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record = subparsers.add_parser('record', help='Plan the trips in a JSON file and add their routes to the corpus')
+    record.add_argument('trips', help='JSON list of {"start": [lat, lng], "end": [lat, lng], "range_km": ..., "efficiency": ...}')
+    record.add_argument('--output', default=DEFAULT_CORPUS_DIR)
+    info = subparsers.add_parser('info', help='Print the size of the corpus')
+    info.add_argument('--corpus', default=DEFAULT_CORPUS_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from EVRoutePlanner import EVRoutePlanner
+        from GoogleClients import default_response_cache
+        from StationIndex import load_station_index
+        from utils import getAPIKey
+
+        with open(args.trips) as f:
+            trips = json.load(f)
+        recorder = RouteCorpusRecorder(args.output)
+        api_key = getAPIKey('APIKey.txt')
+        for trip in trips:
+            planner = EVRoutePlanner(api_key, tuple(trip['start']), tuple(trip['end']), trip['range_km'], trip['efficiency'],
+                                     response_cache=default_response_cache(), station_index=load_station_index())
+            recorder.record_planner(planner)
+        corpus = recorder.save()
+        print(f"Corpus in {args.output} now holds {len(corpus)} routes")
+    else:
+        corpus = RouteCorpus.load(args.corpus)
+        print(f"{len(corpus)} routes, {corpus.node_count} nodes")
@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class RouteJob:
+    def __init__(self, job_id: str, key: str):
+        self.id = job_id
+        self.key = key
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.requests = 1  # Requests coalesced onto this job, including the first
+
+    def to_dict(self) -> dict:
+        job = {'job_id': self.id, 'status': self.status, 'requests': self.requests}
+        if self.status == 'done':
+            job['result'] = self.result
+        elif self.status == 'failed':
+            job['error'] = self.error
+        return job
+
+
+def _summary(samples) -> dict:
+    samples = np.asarray(samples, dtype=float)
+    if not len(samples):
+        return {'count': 0}
+    return {
+        'count': int(len(samples)),
+        'mean': float(samples.mean()),
+        'p50': float(np.percentile(samples, 50)),
+        'p95': float(np.percentile(samples, 95)),
+        'max': float(samples.max()),
+    }
+
+
+class RouteJobQueue:
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, max_finished: int = 1000, metric_window: int = 1000):
+        """
+        Runs route planning jobs on a bounded thread pool. A job submitted while another with the same key
+        is queued or running is coalesced onto it instead of planning the route again.
+
+        :param max_workers: Jobs planned at the same time.
+        :param max_pending: Queued and running jobs allowed before submit raises QueueFullError.
+        :param max_finished: Finished jobs kept for polling; the oldest are dropped first.
+        :param metric_window: Recent jobs the wait and run time summaries cover.
+        """
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='route-job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._counts = {'submitted': 0, 'coalesced': 0, 'rejected': 0, 'completed': 0, 'failed': 0}
+        self._wait_seconds = deque(maxlen=metric_window)
+        self._run_seconds = deque(maxlen=metric_window)
+
+    @staticmethod
+    def job_key(*fields) -> str:
+        return json.dumps(fields, sort_keys=True, default=str)
+
+    def submit(self, key: str, fn, *args):
+        """
+        Queues fn(*args) under key, or joins the in-flight job with the same key.
+
+        :return: The job and whether it was coalesced onto an existing one.
+        """
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                job.requests += 1
+                self._counts['coalesced'] += 1
+                return job, True
+            if len(self._in_flight) >= self.max_pending:
+                self._counts['rejected'] += 1
+                raise QueueFullError(f"{len(self._in_flight)} route jobs are already pending")
+
+            job = RouteJob(uuid.uuid4().hex, key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+            self._counts['submitted'] += 1
+            self._forget_finished()
+        self._pool.submit(self._run, job, fn, args)
+        return job, False
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: RouteJob, fn, args):
+        with self._lock:
+            job.status = 'running'
+            job.started_at = time.time()
+            self._wait_seconds.append(job.started_at - job.submitted_at)
+        try:
+            result, error, status = fn(*args), None, 'done'
+        except Exception as e:
+            result, error, status = None, str(e), 'failed'
+        with self._lock:
+            job.result, job.error, job.status = result, error, status
+            job.finished_at = time.time()
+            self._run_seconds.append(job.finished_at - job.started_at)
+            self._counts['completed' if status == 'done' else 'failed'] += 1
+            self._in_flight.pop(job.key, None)
+
+    def _forget_finished(self):
+        # Called with the lock held; in-flight jobs are never dropped
+        excess = len(self._jobs) - len(self._in_flight) - self.max_finished
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in ('done', 'failed')][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def metrics(self) -> dict:
+        """
+        Queue depth, job counters and wait (submit to start) and run time summaries in seconds.
+        """
+        with self._lock:
+            states = [job.status for job in self._in_flight.values()]
+            return dict(
+                self._counts,
+                queue_depth=states.count('queued'),
+                running=states.count('running'),
+                wait_seconds=_summary(self._wait_seconds),
+                run_seconds=_summary(self._run_seconds),
+            )
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
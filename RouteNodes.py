@@ -0,0 +1,200 @@
+import numpy as np
+from typing import Dict, List
+
+
+def node_columns(nodes) -> Dict[str, np.ndarray]:
+    """
+    The lat, lng, dist, station_distance (NaN where there is none) and branched columns of a node list or
+    NodeStore; a NodeStore's arrays are returned without copying.
+    """
+    if isinstance(nodes, NodeStore):
+        return {column: getattr(nodes, column) for column in ('lat', 'lng', 'dist', 'station_distance', 'branched')}
+    return {
+        'lat': np.array([node['lat'] for node in nodes], dtype=float),
+        'lng': np.array([node['lng'] for node in nodes], dtype=float),
+        'dist': np.array([node['dist'] for node in nodes], dtype=float),
+        'station_distance': np.array([node.get('nearest_ev_station_distance', np.nan) for node in nodes], dtype=float),
+        'branched': np.array(['branched' in node for node in nodes], dtype=bool),
+    }
+
+
+class NodeStore:
+    def __init__(self, capacity: int = 64):
+        """
+        Route nodes held as NumPy columns instead of one dict per node. Indexing returns the node as a dict
+        in the shape the planner builds, so code reading self.route or an environment's nodes is unchanged.
+
+        Each node's Places result goes into the stations side table, deduplicated by place id, and the node
+        keeps its index in station_id (-1 without a station). The per-node Directions leg to the station
+        (nearest_ev_route_segment) is only needed while the planner decides where to branch, and is not kept.
+
+        :param capacity: Nodes allocated up front; the columns double in size as they fill.
+        """
+        self._size = 0
+        self._lat = np.empty(capacity)
+        self._lng = np.empty(capacity)
+        self._dist = np.empty(capacity)
+        self._station_distance = np.empty(capacity)
+        self._station_id = np.empty(capacity, dtype=np.int32)
+        self._branched = np.empty(capacity, dtype=bool)
+        self.stations = []
+        self._station_index = {}
+
+    @classmethod
+    def from_nodes(cls, nodes) -> 'NodeStore':
+        store = cls(max(len(nodes), 1))
+        store.extend(nodes)
+        return store
+
+    @classmethod
+    def from_columns(cls, lat, lng, dist, station_distance=None, branched=None) -> 'NodeStore':
+        """
+        Builds a store without station payloads, e.g. from a slice of a RouteCorpus.
+        """
+        n = len(lat)
+        store = cls(max(n, 1))
+        store._append_columns(lat, lng, dist, np.full(n, np.nan) if station_distance is None else station_distance,
+                              np.full(n, -1, dtype=np.int32), np.zeros(n, dtype=bool) if branched is None else branched)
+        return store
+
+    def __len__(self):
+        return self._size
+
+    lat = property(lambda self: self._lat[:self._size])
+    lng = property(lambda self: self._lng[:self._size])
+    dist = property(lambda self: self._dist[:self._size])
+    station_distance = property(lambda self: self._station_distance[:self._size])
+    station_id = property(lambda self: self._station_id[:self._size])
+    branched = property(lambda self: self._branched[:self._size])
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= len(self._lat):
+            return
+        capacity = max(needed, 2 * len(self._lat))
+        for name in ('_lat', '_lng', '_dist', '_station_distance', '_station_id', '_branched'):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _append_columns(self, lat, lng, dist, station_distance, station_id, branched):
+        n = len(lat)
+        self._reserve(n)
+        end = self._size + n
+        self._lat[self._size:end] = lat
+        self._lng[self._size:end] = lng
+        self._dist[self._size:end] = dist
+        self._station_distance[self._size:end] = station_distance
+        self._station_id[self._size:end] = station_id
+        self._branched[self._size:end] = branched
+        self._size = end
+
+    def _intern_station(self, station: dict) -> int:
+        # Nodes near each other mostly find the same station, which is stored once
+        key = station.get('place_id') or (station['geometry']['location']['lat'], station['geometry']['location']['lng'])
+        station_id = self._station_index.get(key)
+        if station_id is None:
+            station_id = self._station_index[key] = len(self.stations)
+            self.stations.append(station)
+        return station_id
+
+    def append(self, node: dict):
+        self._reserve(1)
+        i = self._size
+        self._lat[i] = node['lat']
+        self._lng[i] = node['lng']
+        self._dist[i] = node['dist']
+        self._station_distance[i] = node.get('nearest_ev_station_distance', np.nan)
+        self._station_id[i] = self._intern_station(node['nearest_ev_station']) if 'nearest_ev_station' in node else -1
+        self._branched[i] = 'branched' in node
+        self._size = i + 1
+
+    def extend(self, nodes):
+        """
+        Appends node dicts or the nodes of another NodeStore.
+        """
+        if isinstance(nodes, NodeStore):
+            remap = np.array([self._intern_station(station) for station in nodes.stations] + [-1], dtype=np.int32)
+            self._append_columns(nodes.lat, nodes.lng, nodes.dist, nodes.station_distance,
+                                 remap[nodes.station_id], nodes.branched)
+            return
+        columns = node_columns(nodes)
+        station_id = [self._intern_station(node['nearest_ev_station']) if 'nearest_ev_station' in node else -1
+                      for node in nodes]
+        self._append_columns(columns['lat'], columns['lng'], columns['dist'], columns['station_distance'],
+                             station_id, columns['branched'])
+
+    def node(self, i: int) -> dict:
+        """
+        Node i as a dict with 'lat', 'lng' and 'dist', plus 'nearest_ev_station_distance',
+        'nearest_ev_station' and 'branched' where they apply.
+        """
+        node = {'lat': float(self._lat[i]), 'lng': float(self._lng[i]), 'dist': float(self._dist[i])}
+        station_distance = self._station_distance[i]
+        if station_distance == station_distance:  # Not NaN
+            node['nearest_ev_station_distance'] = float(station_distance)
+        station_id = self._station_id[i]
+        if station_id >= 0:
+            node['nearest_ev_station'] = self.stations[station_id]
+        if self._branched[i]:
+            node['branched'] = True
+        return node
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.node(k) for k in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError('node index out of range')
+        return self.node(i)
+
+    def __iter__(self):
+        return (self.node(i) for i in range(self._size))
+
+    def to_dicts(self) -> List[dict]:
+        return list(self)
+
+
+class RouteLookahead:
+    def __init__(self, nodes: List[dict]):
+        """
+        Per-node distance arrays for a node list, computed once with a backward sweep so charge decisions
+        are O(1) lookups instead of a forward walk from every node.
+
+        dist[i]: distance from node i to node i + 1.
+        station_distance[i]: distance from node i to its nearest charging station, NaN when it has none.
+        cumulative[i]: distance from the first node to node i (cumulative[n] is the full length).
+        next_station[i]: index of the first node at or after i with a station, n when there is none.
+        distance_to_next_station[i]: distance from node i through next_station[i] and on to its station,
+            including that node's own dist as the forward walk did; inf when there is no station ahead.
+        """
+        n = len(nodes)
+        if isinstance(nodes, NodeStore):
+            self.dist = np.array(nodes.dist, dtype=float)
+            self.station_distance = np.array(nodes.station_distance, dtype=float)
+        else:
+            self.dist = np.array([node['dist'] for node in nodes], dtype=float)
+            self.station_distance = np.array([node.get('nearest_ev_station_distance', np.nan) for node in nodes], dtype=float)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.dist)))
+
+        has_station = ~np.isnan(self.station_distance)
+        # Backward sweep: the nearest station-bearing index at or after each node
+        candidates = np.where(has_station, np.arange(n), n)
+        self.next_station = np.minimum.accumulate(candidates[::-1])[::-1] if n else candidates
+
+        self.distance_to_next_station = np.full(n, np.inf)
+        found = self.next_station < n
+        ahead = self.next_station[found]
+        self.distance_to_next_station[found] = (self.cumulative[ahead + 1] - self.cumulative[:n][found]
+                                                + self.station_distance[ahead])
+
+    def __len__(self):
+        return len(self.dist)
+
+    def distance_to_end(self, i: int) -> float:
+        """
+        Distance from node i to the last node, summing every node's dist from i on.
+        """
+        return self.cumulative[-1] - self.cumulative[i]
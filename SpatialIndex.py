@@ -0,0 +1,132 @@
+import numpy as np
+from math import asin, sin, cos, radians, degrees, floor
+from typing import Tuple
+
+EARTH_RADIUS_M = 6371000  # Same mean radius used by EmissionsCalculator.haversine
+
+
+class GeoGridIndex:
+    def __init__(self, latitudes, longitudes, cell_size_deg: float = 0.5):
+        """
+        Builds a bucket grid over latitude/longitude points so radius queries only
+        touch the rows in the cells that can intersect the search circle.
+
+        :param latitudes: Sequence of latitudes in decimal degrees.
+        :param longitudes: Sequence of longitudes in decimal degrees.
+        :param cell_size_deg: Size of a grid cell in degrees.
+        """
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.cell_size_deg = cell_size_deg
+        self.n_lng_cells = int(np.ceil(360 / cell_size_deg))
+
+        # Sort the row positions by cell so every cell is a contiguous slice
+        valid = np.flatnonzero(~(np.isnan(self.latitudes) | np.isnan(self.longitudes)))
+        keys = self._cell_keys(self.latitudes[valid], self.longitudes[valid])
+        order = np.argsort(keys, kind='stable')
+        self.rows = valid[order]
+        sorted_keys = keys[order]
+        self.cell_keys, self.cell_starts = np.unique(sorted_keys, return_index=True)
+        self.cell_ends = np.append(self.cell_starts[1:], len(sorted_keys))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _lat_cell(self, lat):
+        return np.floor((np.asarray(lat) + 90) / self.cell_size_deg).astype(np.int64)
+
+    def _lng_cell(self, lng):
+        return np.floor(((np.asarray(lng) + 180) % 360) / self.cell_size_deg).astype(np.int64) % self.n_lng_cells
+
+    def _cell_keys(self, lat, lng):
+        return self._lat_cell(lat) * self.n_lng_cells + self._lng_cell(lng)
+
+    def _rows_in_cells(self, keys) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.int64)
+        pos = np.searchsorted(self.cell_keys, keys)
+        found = pos < len(self.cell_keys)
+        found[found] = self.cell_keys[pos[found]] == keys[found]
+        pos = pos[found]
+        if len(pos) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.rows[self.cell_starts[p]:self.cell_ends[p]] for p in pos])
+
+    def query_radius(self, lat: float, lng: float, radius_m: float) -> np.ndarray:
+        """
+        Returns the row positions of every point that may lie within radius_m of (lat, lng).
+        The result is a superset of the exact answer; callers apply their own distance test.
+
+        :param lat: Latitude of the query point in decimal degrees.
+        :param lng: Longitude of the query point in decimal degrees.
+        :param radius_m: Search radius in meters.
+        :return: Sorted array of candidate row positions.
+        """
+        angular = radius_m / EARTH_RADIUS_M
+        dlat = degrees(angular)
+        lat_lo = max(lat - dlat, -90)
+        lat_hi = min(lat + dlat, 90)
+
+        # Widest longitude offset of the circle; past the poles every longitude is a candidate
+        if abs(lat) + dlat >= 90 or sin(angular) >= cos(radians(lat)):
+            lng_cells = np.arange(self.n_lng_cells)
+        else:
+            dlng = degrees(asin(sin(angular) / cos(radians(lat))))
+            first = floor((lng - dlng + 180) / self.cell_size_deg)
+            last = floor((lng + dlng + 180) / self.cell_size_deg)
+            lng_cells = np.unique(np.arange(first, last + 1) % self.n_lng_cells)
+
+        lat_cells = np.arange(self._lat_cell(lat_lo), self._lat_cell(lat_hi) + 1)
+        keys = np.sort((lat_cells[:, None] * self.n_lng_cells + lng_cells[None, :]).ravel())
+        return np.sort(self._rows_in_cells(keys))
+
+    def query_radius_many(self, lats, lngs, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        query_radius for many points at once. Each point's cells are gathered with array operations, so the
+        cost does not grow with a Python loop over the points; circles that reach a pole or wrap every
+        longitude take query_radius one by one. Points with a NaN coordinate have no candidates.
+
+        :param lats: Latitudes of the query points in decimal degrees.
+        :param lngs: Longitudes of the query points in decimal degrees.
+        :param radius_m: Search radius in meters.
+        :return: Parallel arrays of query point positions and candidate row positions.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        angular = radius_m / EARTH_RADIUS_M
+        dlat = degrees(angular)
+
+        valid = ~(np.isnan(lats) | np.isnan(lngs))
+        polar = valid & ((np.abs(lats) + dlat >= 90) | (sin(angular) >= np.cos(np.radians(lats))))
+        regular = np.flatnonzero(valid & ~polar)
+        lat, lng = lats[regular], lngs[regular]
+
+        # The same cell ranges query_radius covers, one row per point
+        lat_first = self._lat_cell(np.maximum(lat - dlat, -90))
+        lat_count = self._lat_cell(np.minimum(lat + dlat, 90)) - lat_first + 1
+        dlng = np.degrees(np.arcsin(sin(angular) / np.cos(np.radians(lat))))
+        lng_first = np.floor((lng - dlng + 180) / self.cell_size_deg).astype(np.int64)
+        lng_count = np.floor((lng + dlng + 180) / self.cell_size_deg).astype(np.int64) - lng_first + 1
+
+        lat_offsets = np.arange(lat_count.max(initial=0))
+        lng_offsets = np.arange(lng_count.max(initial=0))
+        in_range = (lat_offsets[None, :, None] < lat_count[:, None, None]) & (lng_offsets[None, None, :] < lng_count[:, None, None])
+        keys = ((lat_first[:, None, None] + lat_offsets[None, :, None]) * self.n_lng_cells
+                + (lng_first[:, None, None] + lng_offsets[None, None, :]) % self.n_lng_cells)
+        points = np.broadcast_to(regular[:, None, None], keys.shape)[in_range]
+        keys = keys[in_range]
+
+        # Expand every occupied cell into its rows
+        pos = np.searchsorted(self.cell_keys, keys)
+        found = pos < len(self.cell_keys)
+        found[found] = self.cell_keys[pos[found]] == keys[found]
+        points, pos = points[found], pos[found]
+        starts, counts = self.cell_starts[pos], self.cell_ends[pos] - self.cell_starts[pos]
+        within_cell = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        points = [np.repeat(points, counts)]
+        rows = [self.rows[np.repeat(starts, counts) + within_cell]]
+
+        for i in np.flatnonzero(polar):
+            found_rows = self.query_radius(lats[i], lngs[i], radius_m)
+            points.append(np.full(len(found_rows), i, dtype=np.int64))
+            rows.append(found_rows)
+        return np.concatenate(points).astype(np.int64), np.concatenate(rows).astype(np.int64)
@@ -0,0 +1,210 @@
+import argparse
+import csv
+import io
+import json
+import os
+import urllib.request
+from typing import List, Tuple
+
+import numpy as np
+
+from SpatialIndex import GeoGridIndex, EARTH_RADIUS_M
+
+DEFAULT_STATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ev_stations.csv')
+STATION_FIELDS = ('id', 'name', 'lat', 'lng')
+
+# Column names accepted when importing, including the NREL Alternative Fuels Data Center export
+_FIELD_ALIASES = {
+    'id': ('id', 'ID', 'place_id', 'station_id'),
+    'name': ('name', 'station_name', 'Station Name'),
+    'lat': ('lat', 'latitude', 'Latitude'),
+    'lng': ('lng', 'lon', 'longitude', 'Longitude'),
+}
+
+# Alt-fuel exports also list CNG, E85, LPG, propane and hydrogen stations, and planned or temporarily
+# unavailable ones; only open electric stations are kept when these columns are present
+_FUEL_TYPE_ALIASES = ('fuel_type_code', 'Fuel Type Code')
+_STATUS_ALIASES = ('status_code', 'Status Code')
+ELECTRIC_FUEL_TYPE = 'ELEC'
+OPEN_STATUS = 'E'
+
+
+def _code(record: dict, aliases):
+    # None when the column is missing; JSON nulls in the AFDC feed read as an empty code
+    for alias in aliases:
+        if alias in record:
+            return str(record[alias] or '').strip().upper()
+    return None
+
+
+def _normalize_record(record: dict, position: int):
+    fuel_type = _code(record, _FUEL_TYPE_ALIASES)
+    if fuel_type is not None and fuel_type != ELECTRIC_FUEL_TYPE:
+        return None
+    status = _code(record, _STATUS_ALIASES)
+    if status is not None and status != OPEN_STATUS:
+        return None
+    fields = {}
+    for field, aliases in _FIELD_ALIASES.items():
+        fields[field] = next((record[alias] for alias in aliases if record.get(alias) not in (None, '')), None)
+    if fields['lat'] is None or fields['lng'] is None:
+        return None
+    return {
+        'id': str(fields['id'] if fields['id'] is not None else position),
+        'name': str(fields['name'] or '').strip(),
+        'lat': float(fields['lat']),
+        'lng': float(fields['lng']),
+    }
+
+
+def parse_stations(text: str) -> List[dict]:
+    """
+    Parses a station dataset from CSV or JSON text into id/name/lat/lng records.
+    JSON may be a list of records or an object with a 'fuel_stations' list (AFDC API format).
+    Records with a fuel type other than ELEC or a status other than E (open) are dropped.
+    """
+    stripped = text.lstrip()
+    if stripped.startswith('{') or stripped.startswith('['):
+        data = json.loads(text)
+        records = data.get('fuel_stations', []) if isinstance(data, dict) else data
+    else:
+        records = list(csv.DictReader(io.StringIO(text)))
+    stations = (_normalize_record(record, i) for i, record in enumerate(records))
+    return [station for station in stations if station is not None]
+
+
+class StationIndex:
+    def __init__(self, stations: List[dict], cell_size_deg: float = 0.25):
+        """
+        In-memory index of EV charging stations answering nearest-k and within-radius queries.
+
+        :param stations: Records with 'id', 'name', 'lat' and 'lng' keys.
+        :param cell_size_deg: Grid cell size of the underlying spatial index.
+        """
+        self.ids = [station['id'] for station in stations]
+        self.names = [station['name'] for station in stations]
+        self.lats = np.array([station['lat'] for station in stations], dtype=float)
+        self.lngs = np.array([station['lng'] for station in stations], dtype=float)
+        self.index = GeoGridIndex(self.lats, self.lngs, cell_size_deg)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_STATIONS_PATH) -> 'StationIndex':
+        with open(path, newline='', encoding='utf-8') as f:
+            return cls(parse_stations(f.read()))
+
+    def _distances(self, rows: np.ndarray, lat: float, lng: float) -> np.ndarray:
+        lat1, lng1 = np.radians(lat), np.radians(lng)
+        lat2, lng2 = np.radians(self.lats[rows]), np.radians(self.lngs[rows])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    def _result(self, row: int, distance: float) -> dict:
+        # Shaped like a Places API result so callers can use either source
+        return {
+            'place_id': self.ids[row],
+            'name': self.names[row],
+            'geometry': {'location': {'lat': float(self.lats[row]), 'lng': float(self.lngs[row])}},
+            'distance_m': float(distance),
+        }
+
+    def within_radius(self, lat: float, lng: float, radius_m: float) -> List[dict]:
+        """
+        Returns every station within radius_m of (lat, lng), nearest first.
+        """
+        rows = self.index.query_radius(lat, lng, radius_m)
+        distances = self._distances(rows, lat, lng)
+        keep = distances <= radius_m
+        rows, distances = rows[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return [self._result(rows[i], distances[i]) for i in order]
+
+    def nearest(self, lat: float, lng: float, k: int = 1, max_radius_m: float = 500000) -> List[dict]:
+        """
+        Returns up to k stations nearest to (lat, lng) within max_radius_m, nearest first.
+        """
+        radius = min(5000, max_radius_m)
+        while True:
+            found = self.within_radius(lat, lng, radius)
+            if len(found) >= k or radius >= max_radius_m:
+                return found[:k]
+            radius = min(radius * 4, max_radius_m)
+
+
+class LocalStationClient:
+    def __init__(self, station_index: StationIndex, fallback=None):
+        """
+        Drop-in replacement for GooglePlacesClient that answers from a StationIndex.
+
+        :param station_index: Local station index.
+        :param fallback: Optional GooglePlacesClient queried when no local station is in range.
+        """
+        self.station_index = station_index
+        self.fallback = fallback
+
+    def find_nearby_charging_stations(self, location: Tuple[float, float], radius: int = 10000) -> List[dict]:
+        stations = self.station_index.within_radius(location[0], location[1], radius)
+        if not stations and self.fallback is not None:
+            return self.fallback.find_nearby_charging_stations(location, radius)
+        return stations
+
+
+_loaded_indexes = {}
+
+def load_station_index(path: str = DEFAULT_STATIONS_PATH):
+    """
+    Returns the process-wide StationIndex for path, or None when no dataset has been imported.
+    """
+    if path not in _loaded_indexes:
+        _loaded_indexes[path] = StationIndex.load(path) if os.path.exists(path) else None
+    return _loaded_indexes[path]
+
+
+def refresh_stations(source: str, path: str = DEFAULT_STATIONS_PATH) -> int:
+    """
+    Replaces the station dataset with the stations read from source, a file path or http(s) URL.
+
+    :return: Number of stations written.
+    """
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source) as response:
+            text = response.read().decode('utf-8')
+    else:
+        with open(source, newline='', encoding='utf-8') as f:
+            text = f.read()
+    stations = parse_stations(text)
+
+    # Write next to the target and swap it in so readers never see a partial file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=STATION_FIELDS)
+        writer.writeheader()
+        writer.writerows(stations)
+    os.replace(tmp_path, path)
+    _loaded_indexes.pop(path, None)
+    return len(stations)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the local EV charging station dataset.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    refresh = subparsers.add_parser('refresh', help='Bulk-replace the dataset from a CSV/JSON file or URL')
+    refresh.add_argument('source', help='File path or URL, e.g. an NREL AFDC alt-fuel-stations export')
+    refresh.add_argument('--output', default=DEFAULT_STATIONS_PATH)
+    query = subparsers.add_parser('query', help='Print the stations nearest to a location')
+    query.add_argument('lat', type=float)
+    query.add_argument('lng', type=float)
+    query.add_argument('-k', type=int, default=5)
+    query.add_argument('--stations', default=DEFAULT_STATIONS_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'refresh':
+        count = refresh_stations(args.source, args.output)
+        print(f"Wrote {count} stations to {args.output}")
+    else:
+        for station in StationIndex.load(args.stations).nearest(args.lat, args.lng, args.k):
+            location = station['geometry']['location']
+            print(f"{station['distance_m']:10.0f} m  {station['name']} ({location['lat']}, {location['lng']})")
@@ -0,0 +1,57 @@
+"""
+Measures BatchRoutes.run_batch throughput by worker count, planning trips across several EV models with
+the fake Google client. Run from the repository base directory:
+
+    python benchmarks/bench_batch_routes.py --trips 48 --latency 0.002 --workers 1 2 4
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BatchRoutes import expand_trips, load_ev_models, run_batch
+from EVRoutePlanner import EVRoutePlanner
+from EmissionsCalculator import EmissionsCalculator
+from fake_clients import FakeGoogleMaps, fake_planner_clients
+from bench_planner_modes import TRIPS
+
+def plan_fake_trip(latency, trip):
+    range_km = int(trip['ev_total_range']) * 1.60934
+    efficiency = int(trip['ev_battery_capacity']) * 1000 / range_km
+    planner = EVRoutePlanner(None, tuple(trip['starting_location']), tuple(trip['destination_location']), range_km, efficiency,
+                             incremental_replanning=True, **fake_planner_clients(FakeGoogleMaps(latency=latency)))
+    with redirect_stdout(io.StringIO()):
+        planner.calculate_route('regular')
+    return {'emissions': planner.emissions_kg_co2, 'ev_waypoints': planner.charging_stations}
+
+
+def warm_up():
+    EmissionsCalculator(150).emission_factors([40.0], [-75.0])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trips', type=int, default=48)
+    parser.add_argument('--latency', type=float, default=0.002, help='Seconds per fake API call')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    pairs = [{'starting_location': list(start), 'destination_location': list(end), 'method': 'default'}
+             for name, (start, end) in TRIPS.items() if name != 'short']
+    trips = expand_trips(pairs, load_ev_models())[:args.trips]
+
+    print(f"{os.cpu_count()} CPUs, {len(trips)} trips, {args.latency * 1000:.0f} ms per fake call")
+    print(f"{'workers':>7} {'seconds':>8} {'trips/s':>8} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        began = time.perf_counter()
+        results = list(run_batch(trips, workers, plan=partial(plan_fake_trip, args.latency), warm_up=warm_up))
+        elapsed = time.perf_counter() - began
+        assert all(result['status'] == 'success' for result in results), results
+        baseline = baseline or elapsed
+        print(f"{workers:>7} {elapsed:>8.2f} {len(trips) / elapsed:>8.2f} {baseline / elapsed:>8.2f}")
@@ -0,0 +1,63 @@
+"""
+Compares per-node EVDecisionNetwork calls in torch with one batched DecisionMLP forward pass over a leg,
+and checks that both give the same scores and decisions. Run from the repository base directory:
+
+    python benchmarks/bench_decision_inference.py --nodes 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DecisionInference import DecisionMLP, station_features
+
+
+def best_of(repeats, fn):
+    times = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - began)
+    return min(times), result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    began = time.perf_counter()
+    import torch
+    from DecisionModel import EVDecisionNetwork
+    torch_import = time.perf_counter() - began
+
+    torch.manual_seed(0)
+    model = EVDecisionNetwork().eval()
+    mlp = DecisionMLP.from_module(model)
+
+    rng = np.random.default_rng(0)
+    station_distance = rng.uniform(0, 20000, args.nodes)
+    station_distance[rng.random(args.nodes) < 0.3] = np.nan
+    features = station_features(400000, station_distance)
+
+    def torch_per_node():
+        with torch.no_grad():
+            return np.array([model(torch.tensor(row).float()).numpy() for row in features.tolist()])
+
+    torch_seconds, torch_scores = best_of(args.repeats, torch_per_node)
+    numpy_seconds, numpy_scores = best_of(args.repeats, lambda: mlp.scores(features))
+
+    scale = np.abs(torch_scores).max()
+    max_error = np.abs(torch_scores - numpy_scores).max()
+    assert np.allclose(torch_scores, numpy_scores, rtol=1e-5, atol=1e-5 * scale), max_error
+    assert (torch_scores.argmax(axis=1) == 1).tolist() == mlp.decide(features).tolist()
+
+    print(f"torch import:          {torch_import * 1000:9.1f} ms")
+    print(f"torch, per node:       {torch_seconds * 1000:9.2f} ms for {args.nodes} nodes")
+    print(f"NumPy, one batch:      {numpy_seconds * 1000:9.2f} ms for {args.nodes} nodes")
+    print(f"max abs score error:   {max_error:.3g} (largest score {scale:.3g})")
@@ -0,0 +1,74 @@
+"""
+Exact (no raster) emission factors for many points: the per-point loop emission_factors used for points the
+grid does not cover, copied below, against the batched grid_mix_intensities. Points are drawn near power
+plants and across the globe, and both must give the same factors. Run from the directory holding
+global_power_plant_database.csv:
+
+    python /path/to/benchmarks/bench_emission_factors.py --points 100 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from EmissionsCalculator import EmissionsCalculator, co2_emissions, get_power_plant_index
+from PowerPlants import get_power_plants
+
+
+def baseline_grid_mix_intensity(calculator, lat, lon, power_plants, co2_emissions):
+    # EmissionsCalculator.grid_mix_intensity before the batched path, called once per point
+    candidates = get_power_plant_index(power_plants).query_radius(lat, lon, 20000)
+    within = [calculator.is_within_distance(lat, lon, plant_lat, plant_lon, 20000)
+              for plant_lat, plant_lon in zip(power_plants.latitude[candidates], power_plants.longitude[candidates])]
+    near = candidates[np.array(within, dtype=bool)]
+    capacity = np.nan_to_num(power_plants.capacity_mw[near])
+    fuel_capacity = np.bincount(power_plants.fuel_codes[near], weights=capacity, minlength=len(power_plants.fuel_names))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        power_plant_type_fraction = fuel_capacity / capacity.sum()
+    fuel_emissions = np.array([co2_emissions.get(fuel, np.nan) for fuel in power_plants.fuel_names])
+    return np.nansum(power_plant_type_fraction * fuel_emissions)
+
+
+def sample_points(power_plants, n: int, seed: int = 0):
+    # Half near plants, where there is work to do, half anywhere including the polar caps
+    rng = np.random.default_rng(seed)
+    lats = np.asarray(power_plants['latitude'], dtype=float)
+    lngs = np.asarray(power_plants['longitude'], dtype=float)
+    plants = np.flatnonzero(~(np.isnan(lats) | np.isnan(lngs)))
+    picks = rng.choice(plants, size=n // 2)
+    near_lats = np.clip(lats[picks] + rng.uniform(-0.2, 0.2, len(picks)), -90, 90)
+    near_lngs = lngs[picks] + rng.uniform(-0.2, 0.2, len(picks))
+    anywhere = n - len(picks)
+    return (np.concatenate((near_lats, rng.uniform(-90, 90, anywhere))),
+            np.concatenate((near_lngs, rng.uniform(-180, 180, anywhere))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--points', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    power_plants = get_power_plants()
+    calculator = EmissionsCalculator(150, use_grid=False)
+    # Build the spatial index before timing either variant
+    calculator.emission_factors([40.0], [-75.0])
+
+    for n in args.points:
+        lats, lngs = sample_points(power_plants, n)
+        start = time.perf_counter()
+        before = np.array([baseline_grid_mix_intensity(calculator, lat, lng, power_plants, co2_emissions)
+                           for lat, lng in zip(lats, lngs)])
+        before_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        after = calculator.grid_mix_intensities(lats, lngs, power_plants, co2_emissions)
+        after_time = time.perf_counter() - start
+
+        agree = np.allclose(before, after, rtol=1e-9, atol=1e-9)
+        print(f"{n:>6} points: per point {before_time * 1000:9.1f} ms  batched {after_time * 1000:7.1f} ms  "
+              f"agree: {agree}")
+        assert agree, f"max difference {np.abs(before - after).max()} kg CO2 per MWh"
@@ -0,0 +1,43 @@
+"""
+Station enrichment of one route with sequential and concurrent lookups against a fake Google client
+that injects latency. Checks that every mode produces the same nodes in the same order. Run from the
+repository base directory:
+
+    python benchmarks/bench_enrichment.py --latency 0.05
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from fake_clients import FakeGoogleMaps, fake_planner_clients
+
+START = (40.71, -74.01)
+END = (41.88, -87.63)  # New York to Chicago, ~1,150 km
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per fake API call')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    fake = FakeGoogleMaps(latency=args.latency)
+    reference = None
+    for workers in args.workers:
+        planner = EVRoutePlanner(None, START, END, 400, 150, enrichment_workers=workers, **fake_planner_clients(fake))
+        with redirect_stdout(io.StringIO()):
+            nodes = planner.build_path_nodes(planner.paths_interpolator.get_points_at_intervals(START, END))
+        fake.calls.clear()
+        start = time.perf_counter()
+        planner.enrich_nodes(nodes)
+        elapsed = time.perf_counter() - start
+        reference = reference or nodes
+        same = nodes == reference
+        print(f"workers={workers:>3}: {elapsed:7.2f} s for {len(nodes)} nodes, {sum(fake.calls.values())} API calls, "
+              f"matches sequential order: {same}")
@@ -0,0 +1,168 @@
+"""
+Plans routes concurrently against a local HTTP stub of the Google Maps API, once with three
+googlemaps.Client instances per planner as before and once with the process-wide PooledGoogleClient.
+Reports the TCP connections the stub accepted, the requests it answered per endpoint, the
+OVER_QUERY_LIMIT answers it injected and the wall time, and checks the pooled client's accounting
+against the stub's counts. Run from the repository base directory:
+
+    python benchmarks/bench_google_pool.py --routes 8 --qps 200 --over-limit-every 50
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from GoogleClients import GoogleMapsClient, GooglePlacesClient, PooledGoogleClient, new_google_client
+from PathInterpolator import PathInterpolator
+from fake_clients import FakeGoogleMaps
+from bench_planner_modes import TRIPS
+
+# googlemaps.Client only checks the prefix
+STUB_API_KEY = 'AIza-local-stub-key'
+
+ENDPOINTS = {
+    '/maps/api/directions/json': 'directions',
+    '/maps/api/place/nearbysearch/json': 'places_nearby',
+}
+
+
+class GoogleStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, over_limit_every: int = 0):
+        """
+        Answers Directions and Places Nearby requests with FakeGoogleMaps data on a free local port.
+
+        :param latency: Seconds each request takes.
+        :param over_limit_every: Answer every n-th request with OVER_QUERY_LIMIT; 0 never does.
+        """
+        super().__init__(('127.0.0.1', 0), GoogleStubHandler)
+        self.fake = FakeGoogleMaps(latency=latency)
+        self.over_limit_every = over_limit_every
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts.clear()
+
+
+class GoogleStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keeps connections open between requests
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.counts['connections'] += 1
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = ENDPOINTS.get(url.path)
+        if endpoint is None:
+            self.send_error(404)
+            return
+        query = {name: values[0] for name, values in parse_qs(url.query).items()}
+        with self.server.lock:
+            self.server.counts[endpoint] += 1
+            total = sum(self.server.counts[name] for name in ENDPOINTS.values())
+            over_limit = self.server.over_limit_every and total % self.server.over_limit_every == 0
+            if over_limit:
+                self.server.counts['over_query_limit'] += 1
+
+        if over_limit:
+            body = {'status': 'OVER_QUERY_LIMIT', 'error_message': 'Stub quota exceeded'}
+        elif endpoint == 'directions':
+            body = {'status': 'OK', 'routes': self.server.fake.directions(query['origin'].split(','), query['destination'].split(','))}
+        else:
+            body = dict(self.server.fake.places_nearby(location=query['location'].split(',')), status='OK')
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def per_planner_clients(stub: GoogleStub) -> dict:
+    # What every EVRoutePlanner built before the shared pool: three clients, each with its own session
+    new_client = lambda: new_google_client(STUB_API_KEY, base_url=stub.base_url)
+    return {
+        'maps_client': GoogleMapsClient(None, client=new_client()),
+        'places_client': GooglePlacesClient(None, client=new_client()),
+        'paths_interpolator': PathInterpolator(None, 30000, client=new_client()),
+    }
+
+
+def pooled_clients(pool: PooledGoogleClient) -> dict:
+    return {
+        'maps_client': GoogleMapsClient(None, client=pool),
+        'places_client': GooglePlacesClient(None, client=pool),
+        'paths_interpolator': PathInterpolator(None, 30000, client=pool),
+    }
+
+
+def plan_routes(trips, clients, routes: int, workers: int, range_km: float) -> float:
+    def plan(k):
+        start, end = trips[k % len(trips)]
+        planner = EVRoutePlanner(None, start, end, range_km, 150, enrichment_workers=workers, **clients())
+        planner.calculate_route('regular')
+
+    began = time.perf_counter()
+    with redirect_stdout(io.StringIO()), ThreadPoolExecutor(routes) as pool:
+        list(pool.map(plan, range(routes)))
+    return time.perf_counter() - began
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--routes', type=int, default=8, help='Routes planned at the same time')
+    parser.add_argument('--workers', type=int, default=8, help='Enrichment workers per planner')
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds the stub takes per request')
+    parser.add_argument('--qps', type=int, default=200, help='Token bucket rate of the pooled client')
+    parser.add_argument('--over-limit-every', type=int, default=50, help='Stub answers every n-th request with OVER_QUERY_LIMIT')
+    parser.add_argument('--range-km', type=float, default=400)
+    args = parser.parse_args()
+
+    stub = GoogleStub(args.latency, args.over_limit_every)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    trips = [TRIPS['short'], TRIPS['medium']]
+
+    print(f"{'clients':>10} {'seconds':>8} {'connections':>11} {'directions':>10} {'places':>7} {'over limit':>10} {'req/s':>7}")
+    pool = PooledGoogleClient(STUB_API_KEY, queries_per_second=args.qps, base_url=stub.base_url)
+    for label, clients in (('per-route', lambda: per_planner_clients(stub)), ('pooled', lambda: pooled_clients(pool))):
+        stub.reset_counts()
+        seconds = plan_routes(trips, clients, args.routes, args.workers, args.range_km)
+        counts = stub.counts
+        requests = counts['directions'] + counts['places_nearby']
+        print(f"{label:>10} {seconds:8.2f} {counts['connections']:>11} {counts['directions']:>10} "
+              f"{counts['places_nearby']:>7} {counts['over_query_limit']:>10} {requests / seconds:7.0f}")
+
+    stats = pool.stats()
+    for endpoint in ENDPOINTS.values():
+        counted = stats.get(endpoint, {})
+        assert counted.get('requests', 0) == counts[endpoint], (endpoint, counted, counts[endpoint])
+    assert sum(counted.get('over_query_limit', 0) for counted in stats.values()) == counts['over_query_limit']
+    print("Pooled client accounting matches the stub:")
+    for endpoint, counted in stats.items():
+        print(f"  {endpoint:<14} " + ', '.join(f"{name} {value:.2f}" if isinstance(value, float) else f"{name} {value}"
+                                              for name, value in sorted(counted.items())))
+    stub.shutdown()
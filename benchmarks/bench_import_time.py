@@ -0,0 +1,57 @@
+"""
+Measures the cold import time of the Flask server module, and of the planner modules, in fresh
+interpreters with python -X importtime, listing the modules that cost the most. Run from the repository
+base directory:
+
+    python benchmarks/bench_import_time.py --runs 5 --top 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> dict:
+    """
+    Imports module in a fresh interpreter and returns the cumulative import time in seconds of the
+    module and of each module it imported directly.
+    """
+    env = dict(os.environ, PYTHONPATH=BASE_DIR)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nesting is shown by two spaces of indentation per level, and a module is listed after its imports
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative) / 1E6
+        elif depth == 0:
+            if name.strip() == module:
+                return dict(children, **{module: int(cumulative) / 1E6})
+            children = {}
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per module; the median is reported')
+    parser.add_argument('--top', type=int, default=10, help='Most expensive dependencies to list')
+    parser.add_argument('modules', nargs='*', default=['flaskServer', 'EVNav', 'EVRoutePlanner'])
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.runs)]
+        total = statistics.median(run[module] for run in runs)
+        print(f"{module}: {total * 1E3:.0f} ms (median of {args.runs})")
+        last = runs[-1]
+        top = sorted((name for name in last if name != module), key=last.get, reverse=True)
+        for name in top[:args.top]:
+            print(f"  {name:<24} {last[name] * 1E3:8.1f} ms")
@@ -0,0 +1,72 @@
+"""
+Compares the memory a planned route holds on to as a list of node dicts, as EVRoutePlanner.route used to
+be, and as a NodeStore, plus the time to build the lookahead arrays and a RouteCorpus from each. Uses the
+fake Google client, whose Directions legs are much smaller than real ones, so real routes save more.
+Run from the repository base directory:
+
+    python benchmarks/bench_node_store.py --range-km 400
+"""
+import argparse
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from EmissionsCalculator import EmissionsCalculator
+from RouteCorpus import RouteCorpus
+from RouteNodes import RouteLookahead
+from fake_clients import FakeGoogleMaps, fake_planner_clients
+from bench_planner_modes import TRIPS
+
+
+def planned_route(start, end, range_km: float, as_dicts: bool):
+    """
+    Plans the trip and returns the route with the bytes it keeps allocated once the planner is gone.
+    """
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    planner = EVRoutePlanner(None, start, end, range_km, 150, incremental_replanning=True,
+                             **fake_planner_clients(FakeGoogleMaps()))
+    if as_dicts:
+        planner.route = []
+    with redirect_stdout(io.StringIO()):
+        route = planner.calculate_route('regular')
+    del planner
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return route, retained - baseline
+
+
+def seconds(fn, repeats: int = 20) -> float:
+    began = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - began) / repeats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--range-km', type=float, default=400)
+    args = parser.parse_args()
+
+    # Load the emissions data up front so it is not counted against the first route
+    EmissionsCalculator(150).emission_factors([40.0], [-75.0])
+
+    print(f"{'trip':>7} {'route':>10} {'nodes':>6} {'stations':>8} {'retained KiB':>12} {'B/node':>7} "
+          f"{'lookahead ms':>12} {'corpus ms':>9}")
+    for trip, (start, end) in TRIPS.items():
+        for as_dicts in (True, False):
+            route, retained = planned_route(start, end, args.range_km, as_dicts)
+            label = 'dicts' if as_dicts else 'NodeStore'
+            stations = len({id(node['nearest_ev_station']) for node in route if 'nearest_ev_station' in node})
+            print(f"{trip:>7} {label:>10} {len(route):>6} {stations:>8} {retained / 1024:12.1f} {retained / len(route):7.0f} "
+                  f"{seconds(lambda: RouteLookahead(route)) * 1E3:12.3f} "
+                  f"{seconds(lambda: RouteCorpus.from_routes([route])) * 1E3:9.3f}")
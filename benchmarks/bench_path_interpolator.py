@@ -0,0 +1,59 @@
+"""
+Compares the geodesic loop in PathInterpolator._interpolate_points with the vectorized mode on a
+synthetic cross-country polyline. Run from the repository base directory:
+
+    python benchmarks/bench_path_interpolator.py --vertices 5000 --interval 30000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PathInterpolator import PathInterpolator, segment_lengths
+
+
+def synthetic_polyline(n_vertices: int, seed: int = 0):
+    """
+    A wandering New York to Los Angeles path with n_vertices vertices, rounded to polyline precision.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1, n_vertices)
+    lat = 40.71 + (34.05 - 40.71) * t + np.cumsum(rng.normal(0, 0.01, n_vertices))
+    lng = -74.01 + (-118.24 + 74.01) * t + np.cumsum(rng.normal(0, 0.01, n_vertices))
+    return [(round(a, 5), round(b, 5)) for a, b in zip(lat, lng)]
+
+
+def best_of(fn, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vertices', type=int, default=5000)
+    parser.add_argument('--interval', type=float, default=30000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    path = synthetic_polyline(args.vertices)
+    # The key only has to look like a Maps key; no request is made
+    interpolator = PathInterpolator('AIza-benchmark', args.interval)
+
+    loop_time, loop_points = best_of(lambda: interpolator._interpolate_points(list(path), args.interval), args.repeat)
+    print(f"{'loop (geodesic)':>24}: {loop_time * 1000:9.2f} ms  {len(loop_points)} points")
+
+    for method in ('ellipsoidal', 'haversine'):
+        interpolator.distance_method = method
+        vec_time, vec_points = best_of(lambda: interpolator._interpolate_points_vectorized(path, args.interval), args.repeat)
+        shared = min(len(loop_points), len(vec_points))
+        offsets = [segment_lengths([a, b])[0] for a, b in zip(loop_points[:shared], vec_points[:shared])]
+        print(f"{'vectorized (' + method + ')':>24}: {vec_time * 1000:9.2f} ms  {len(vec_points)} points  "
+              f"speedup {loop_time / vec_time:6.1f}x  max offset from loop {max(offsets):.2f} m")
@@ -0,0 +1,42 @@
+"""
+Times route geometry building on its own: the previous per-step geodesic with path.index lookups
+against EVRoutePlanner.build_path_nodes, without station enrichment. Run from the repository base directory:
+
+    python benchmarks/bench_path_nodes.py
+"""
+import os
+import sys
+import time
+
+from geopy.distance import geodesic
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from bench_path_interpolator import synthetic_polyline
+
+
+def previous_geometry(path):
+    nodes = []
+    for step in path:
+        dist = 0
+        if not (step == path[-1]):
+            dist = geodesic(step, path[path.index(step) + 1]).meters
+        nodes.append({'lat': step[0], 'lng': step[1], 'dist': dist})
+    return nodes
+
+
+if __name__ == '__main__':
+    # The key only has to look like a Maps key; no request is made
+    planner = EVRoutePlanner('AIza-benchmark', (40.71, -74.01), (34.05, -118.24), 400, 150)
+    for n in (10, 100, 1000, 5000):
+        path = synthetic_polyline(n)
+        start = time.perf_counter()
+        old = previous_geometry(path)
+        old_time = time.perf_counter() - start
+        start = time.perf_counter()
+        new = planner.build_path_nodes(path)
+        new_time = time.perf_counter() - start
+        max_diff = max(abs(a['dist'] - b['dist']) for a, b in zip(old, new))
+        print(f"{n:>6} points: previous {old_time * 1000:9.2f} ms  build_path_nodes {new_time * 1000:7.2f} ms  "
+              f"max dist difference {max_diff:.3f} m")
@@ -0,0 +1,58 @@
+"""
+Compares the greedy planner with the single-pass graph planner on API calls and latency, using the
+fake Google client with injected latency. 'kg CO2' prices each leg where it is recharged, as the planner
+reports it, and 'kg along' prices each segment where it is driven, as the emissions objective does.
+Checks that the emissions objective adds no stops to a trip the distance objective plans without any.
+Run from the repository base directory:
+
+    python benchmarks/bench_planner_modes.py --latency 0.02
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from EmissionsCalculator import EmissionsCalculator
+from fake_clients import FakeGoogleMaps, fake_planner_clients
+
+TRIPS = {
+    'short': ((40.71, -74.01), (39.95, -75.17)),     # New York - Philadelphia, ~130 km
+    'medium': ((40.71, -74.01), (41.88, -87.63)),    # New York - Chicago, ~1,150 km
+    'long': ((40.71, -74.01), (34.05, -118.24)),     # New York - Los Angeles, ~3,950 km
+}
+
+MODES = [('regular', None), ('graph', 'distance'), ('graph', 'stops'), ('graph', 'emissions')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per fake API call')
+    parser.add_argument('--range-km', type=float, default=400)
+    args = parser.parse_args()
+
+    # Load the emissions data up front so the first timed run does not pay for it
+    EmissionsCalculator(150).emission_factors([40.0], [-75.0])
+
+    print(f"{'trip':>7} {'mode':>17} {'stops':>5} {'directions':>10} {'places':>7} {'seconds':>8} {'km':>8} "
+          f"{'kg CO2':>8} {'kg along':>8}")
+    for trip, (start, end) in TRIPS.items():
+        stops = {}
+        for mode, objective in MODES:
+            fake = FakeGoogleMaps(latency=args.latency)
+            planner = EVRoutePlanner(None, start, end, args.range_km, 150, **fake_planner_clients(fake))
+            began = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                route = planner.calculate_route(mode, objective or 'distance')
+            elapsed = time.perf_counter() - began
+            label = mode if objective is None else f'{mode}/{objective}'
+            print(f"{trip:>7} {label:>17} {len(planner.charging_stations):>5} {fake.calls['directions']:>10} "
+                  f"{fake.calls['places_nearby']:>7} {elapsed:>8.2f} {sum(node['dist'] for node in route) / 1000:>8.0f} "
+                  f"{planner.emissions_kg_co2:>8.2f} {planner.segment_emissions()[1]:>8.2f}")
+            stops[label] = len(planner.charging_stations)
+        assert stops['graph/distance'] > 0 or stops['graph/emissions'] == 0, \
+            f"{trip}: the emissions objective added {stops['graph/emissions']} stops to a trip that needs none"
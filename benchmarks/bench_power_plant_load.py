@@ -0,0 +1,60 @@
+"""
+Startup time and resident memory of loading the power plant data, before and after the columnar store.
+
+Each variant runs in a fresh interpreter so import and page-cache effects are measured the way a
+newly forked Flask worker sees them. Run from the repository base directory:
+
+    python benchmarks/bench_power_plant_load.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = {
+    # What every worker did at import time before: parse the whole CSV into a DataFrame
+    'csv_dataframe': """
+import pandas as pd
+power_plants = pd.read_csv("global_power_plant_database.csv", header=0)
+rows = len(power_plants)
+""",
+    # Memory-mapped columns plus one lookup, which builds the spatial index
+    'columnar_mmap': """
+from PowerPlants import get_power_plants
+from EmissionsCalculator import EmissionsCalculator
+power_plants = get_power_plants()
+EmissionsCalculator(150, use_grid=False).get_power_plant_emission(40.7, -74.0, power_plants, {})
+rows = len(power_plants)
+""",
+}
+
+RUNNER = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+# VmHWM starts fresh at exec, unlike ru_maxrss which inherits the parent's peak on Linux
+with open('/proc/self/status') as f:
+    status = dict(line.split(':', 1) for line in f)
+print(json.dumps({{'seconds': elapsed, 'max_rss_mb': int(status['VmHWM'].split()[0]) / 1024, 'rows': rows}}))
+"""
+
+
+def run_variant(body: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', RUNNER.format(repo=REPO_DIR, body=body)],
+                            capture_output=True, text=True, check=True, cwd=os.getcwd())
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    # Make sure the one-time conversion is not counted in the columnar timing
+    sys.path.insert(0, REPO_DIR)
+    from PowerPlants import get_power_plants
+    get_power_plants()
+
+    results = {name: run_variant(body) for name, body in VARIANTS.items()}
+    for name, result in results.items():
+        print(f"{name:>15}: {result['seconds'] * 1000:8.1f} ms  {result['max_rss_mb']:7.1f} MB max RSS  ({result['rows']} rows)")
@@ -0,0 +1,46 @@
+"""
+Compares full re-planning after each charging stop with incremental re-planning, which splices a detour
+from the station back into the remaining route. Uses the fake Google client with injected latency.
+Run from the repository base directory:
+
+    python benchmarks/bench_replanning.py --latency 0.02
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from EmissionsCalculator import EmissionsCalculator
+from fake_clients import FakeGoogleMaps, fake_planner_clients
+from bench_planner_modes import TRIPS
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per fake API call')
+    parser.add_argument('--range-km', type=float, default=400)
+    parser.add_argument('--workers', type=int, default=1, help='Enrichment workers per planner')
+    args = parser.parse_args()
+
+    # Load the emissions data up front so the first timed run does not pay for it
+    EmissionsCalculator(150).emission_factors([40.0], [-75.0])
+
+    print(f"{'trip':>7} {'replanning':>11} {'stops':>5} {'directions':>10} {'places':>7} {'seconds':>8} {'km':>8} {'kg CO2':>8}")
+    for trip, (start, end) in TRIPS.items():
+        for incremental in (False, True):
+            fake = FakeGoogleMaps(latency=args.latency)
+            planner = EVRoutePlanner(None, start, end, args.range_km, 150, enrichment_workers=args.workers,
+                                     incremental_replanning=incremental, **fake_planner_clients(fake))
+            began = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                route = planner.calculate_route('regular')
+            elapsed = time.perf_counter() - began
+            label = 'incremental' if incremental else 'full'
+            print(f"{trip:>7} {label:>11} {len(planner.charging_stations):>5} {fake.calls['directions']:>10} "
+                  f"{fake.calls['places_nearby']:>7} {elapsed:>8.2f} {sum(node['dist'] for node in route) / 1000:>8.0f} "
+                  f"{planner.emissions_kg_co2:>8.2f}")
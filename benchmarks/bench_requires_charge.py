@@ -0,0 +1,78 @@
+"""
+Per-node charge-need evaluation on the same node lists: the _requires_charge that walked forward to the
+next station-bearing node, copied below with its print going to a discarded stream, against the planner's
+current one, evaluated for every node of routes with 10, 100 and 1,000 nodes. The walk only ran for nodes
+with a station and then stopped at that same node, so both are O(1) per node; the current check tests the
+node directly, without the loop or the print, and must give the same decisions. Run from the repository
+base directory:
+
+    python benchmarks/bench_requires_charge.py
+"""
+import io
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from fake_clients import FakeGoogleMaps, fake_planner_clients
+
+VEHICLE_RANGE = 400000
+
+
+def synthetic_nodes(n: int, station_every: int, seed: int = 0):
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(n):
+        node = {'lat': 40.0, 'lng': -75.0 + i * 0.3, 'dist': rng.uniform(25000, 35000)}
+        if i % station_every == station_every - 1:
+            node['nearest_ev_station_distance'] = rng.uniform(500, 8000)
+        nodes.append(node)
+    return nodes
+
+
+def baseline_requires_charge(total_distance, vehicle_range, current_node, nodes, current_node_i):
+    # EVRoutePlanner._requires_charge before RouteLookahead, with self.total_distance and self.vehicle_range as arguments
+    if not nodes:
+        return False
+    if 'nearest_ev_station_distance' in current_node:
+        currentDist = total_distance
+        while current_node_i < len(nodes):
+            currentDist += nodes[current_node_i]['dist']
+            if 'nearest_ev_station_distance' in nodes[current_node_i]:
+                currentDist += nodes[current_node_i]['nearest_ev_station_distance']
+                print(f"Current distance: {currentDist}")
+                return currentDist > vehicle_range
+            current_node_i += 1
+        return False
+
+
+if __name__ == '__main__':
+    planner = EVRoutePlanner(None, (40.0, -75.0), (40.0, -70.0), VEHICLE_RANGE / 1000, 150,
+                             **fake_planner_clients(FakeGoogleMaps()))
+    for station_every in (5, 1000000):
+        label = f'station every {station_every} nodes' if station_every < 1000000 else 'no station until the end'
+        print(label)
+        for n in (10, 100, 1000):
+            nodes = synthetic_nodes(n, min(station_every, n))
+            # The distance already driven since the last stop varies along the route as it does when planning
+            driven = [i % 15 * 30000.0 for i in range(n)]
+
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                before = [baseline_requires_charge(driven[i], VEHICLE_RANGE, nodes[i], nodes, i) for i in range(n)]
+            before_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            after = []
+            for i in range(n):
+                planner.total_distance = driven[i]
+                after.append(planner._requires_charge(nodes[i], nodes, i))
+            after_time = time.perf_counter() - start
+
+            agree = [bool(a) for a in before] == [bool(b) for b in after]
+            print(f"  {n:>5} nodes: previous {before_time * 1000:8.3f} ms  current {after_time * 1000:7.3f} ms  "
+                  f"agree: {agree}")
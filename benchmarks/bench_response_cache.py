@@ -0,0 +1,81 @@
+"""
+Throughput of the on-disk ResponseCache tier under concurrent writers. The file is prefilled with
+--rows responses, then --threads threads in each of --processes processes put new responses and read
+back older ones. Writing and evicting on every put, as the cache used to, is compared with the batched
+defaults, and SQLite errors (e.g. 'database is locked') are counted. Run from the repository base directory:
+
+    python benchmarks/bench_response_cache.py --rows 100000 --threads 8 --processes 2
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GoogleClients import ResponseCache
+
+RESPONSE = {'results': [{'name': 'Charger', 'geometry': {'location': {'lat': 40.0, 'lng': -75.0}}}] * 4}
+
+VARIANTS = {
+    # What every put and disk hit did before: commit, and scan for rows to evict
+    'per write': dict(flush_entries=1, evict_every=1),
+    'batched': {},
+}
+
+
+def prefill(path: str, rows: int, max_rows: int):
+    cache = ResponseCache(path, max_disk_entries=max_rows, max_memory_entries=1, evict_every=rows + 1)
+    for i in range(rows):
+        cache.put('places_nearby', f'prefill:{i}', RESPONSE)
+    cache.flush()
+
+
+def worker(path: str, options: dict, process: int, threads: int, operations: int, max_rows: int, results):
+    cache = ResponseCache(path, max_disk_entries=max_rows, max_memory_entries=64, **options)
+
+    def run(thread):
+        for i in range(operations):
+            cache.put('places_nearby', f'p{process}t{thread}:{i}', RESPONSE)
+            cache.get('places_nearby', f'prefill:{(process * 7919 + thread * 104729 + i * 31) % max_rows}')
+
+    pool = [threading.Thread(target=run, args=(thread,)) for thread in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    cache.flush()
+    results.put(cache.stats().get('disk', {}).get('errors', 0))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000, help='Responses in the file before the run')
+    parser.add_argument('--threads', type=int, default=8, help='Writer threads per process')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--operations', type=int, default=250, help='Puts (each with one get) per thread')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    total = args.processes * args.threads * args.operations
+    print(f"{args.rows} rows, {args.processes} processes x {args.threads} threads x {args.operations} puts and gets")
+    print(f"{'variant':>10} {'seconds':>8} {'puts/s':>8} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, options in VARIANTS.items():
+            path = os.path.join(directory, f"{name.replace(' ', '_')}.sqlite")
+            prefill(path, args.rows, args.rows)
+            results = context.Queue()
+            processes = [context.Process(target=worker, args=(path, options, process, args.threads, args.operations,
+                                                              args.rows, results))
+                         for process in range(args.processes)]
+            began = time.perf_counter()
+            for process in processes:
+                process.start()
+            errors = sum(results.get() for _ in processes)
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - began
+            print(f"{name:>10} {elapsed:8.2f} {total / elapsed:8.0f} {errors:>7}")
@@ -0,0 +1,62 @@
+"""
+Compares EVRouteGymEnv resets that plan the route through the fake Google client with resets that sample
+a recorded RouteCorpus, and reports the corpus size on disk. Run from the repository base directory:
+
+    python benchmarks/bench_route_corpus.py --latency 0.02
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from EVRouteGymEnv import EVRouteGymEnv
+from EmissionsCalculator import EmissionsCalculator
+from RouteCorpus import RouteCorpus, RouteCorpusRecorder
+from fake_clients import FakeGoogleMaps, fake_planner_clients
+from bench_planner_modes import TRIPS
+
+
+def resets_per_second(env, resets):
+    with redirect_stdout(io.StringIO()):
+        began = time.perf_counter()
+        for _ in range(resets):
+            env.reset()
+        return resets / (time.perf_counter() - began)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per fake API call')
+    parser.add_argument('--range-km', type=float, default=400)
+    parser.add_argument('--resets', type=int, default=3, help='Planner-backed resets to time')
+    args = parser.parse_args()
+
+    # Load the emissions data up front so the first timed run does not pay for it
+    EmissionsCalculator(150).emission_factors([40.0], [-75.0])
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus_dir = os.path.join(directory, 'route_corpus')
+        recorder = RouteCorpusRecorder(corpus_dir)
+        for start, end in TRIPS.values():
+            planner = EVRoutePlanner(None, start, end, args.range_km, 150, **fake_planner_clients(FakeGoogleMaps()))
+            with redirect_stdout(io.StringIO()):
+                recorder.record_planner(planner)
+        recorder.save()
+        corpus = RouteCorpus.load(corpus_dir)
+        size = sum(os.path.getsize(os.path.join(corpus_dir, name)) for name in os.listdir(corpus_dir))
+        print(f"corpus: {len(corpus)} routes, {corpus.node_count} nodes, {size / 1024:.1f} KiB on disk")
+
+        start, end = TRIPS['medium']
+        fake = FakeGoogleMaps(latency=args.latency)
+        planner = EVRoutePlanner(None, start, end, args.range_km, 150, **fake_planner_clients(fake))
+        planned = resets_per_second(EVRouteGymEnv(planner), args.resets)
+        print(f"planner resets: {planned:10.2f} /s  ({sum(fake.calls.values()) / args.resets:.0f} API calls each)")
+
+        sampled = resets_per_second(EVRouteGymEnv(corpus=corpus, vehicle_range=args.range_km * 1E3, seed=0), 2000)
+        print(f"corpus resets:  {sampled:10.2f} /s  (0 API calls)")
@@ -0,0 +1,71 @@
+"""
+Imports a synthetic NREL AFDC-style alt-fuel export mixing electric, CNG, E85, LPG, propane and hydrogen
+stations in open, planned and temporarily unavailable states, checks that only open electric stations
+are kept, then times nearest-station queries on the resulting StationIndex against a brute-force scan.
+Run from the repository base directory:
+
+    python benchmarks/bench_station_index.py --stations 50000 --queries 1000
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from StationIndex import StationIndex, parse_stations
+
+# Roughly the mix of a full US export, where most rows are open electric stations
+FUEL_TYPES = {'ELEC': 80, 'E85': 6, 'BD': 4, 'CNG': 4, 'LPG': 4, 'HY': 2}
+STATUSES = {'E': 90, 'P': 6, 'T': 4}
+
+
+def afdc_export(n: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['Fuel Type Code', 'Station Name', 'Status Code', 'Latitude', 'Longitude', 'ID'])
+    for i in range(n):
+        fuel_type = rng.choices(list(FUEL_TYPES), weights=list(FUEL_TYPES.values()))[0]
+        status = rng.choices(list(STATUSES), weights=list(STATUSES.values()))[0]
+        writer.writerow([fuel_type, f'Station {i}', status,
+                         rng.uniform(25, 49), rng.uniform(-124, -67), i])
+    return out.getvalue()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stations', type=int, default=50000, help='Rows in the synthetic export')
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    text = afdc_export(args.stations)
+    expected = {row['ID'] for row in csv.DictReader(io.StringIO(text))
+                if row['Fuel Type Code'] == 'ELEC' and row['Status Code'] == 'E'}
+    began = time.perf_counter()
+    stations = parse_stations(text)
+    parse_time = time.perf_counter() - began
+    kept = {station['id'] for station in stations}
+    assert kept == expected, f"kept {len(kept)} stations, expected the {len(expected)} open ELEC ones"
+    print(f"Parsed {args.stations} rows in {parse_time * 1000:.1f} ms, kept the {len(kept)} open ELEC stations")
+
+    index = StationIndex(stations)
+    rng = random.Random(1)
+    points = [(rng.uniform(25, 49), rng.uniform(-124, -67)) for _ in range(args.queries)]
+
+    began = time.perf_counter()
+    nearest = [index.nearest(lat, lng)[0]['place_id'] for lat, lng in points]
+    index_time = time.perf_counter() - began
+
+    rows = np.arange(len(index))
+    began = time.perf_counter()
+    scanned = [index.ids[int(np.argmin(index._distances(rows, lat, lng)))] for lat, lng in points]
+    scan_time = time.perf_counter() - began
+
+    print(f"{args.queries} nearest queries: index {index_time * 1000:.1f} ms  brute force {scan_time * 1000:.1f} ms  "
+          f"agree: {nearest == scanned}")
@@ -0,0 +1,56 @@
+"""
+Measures how soon EVRoutePlanner.iter_route yields its first charging stop compared with the full
+planning time, using the fake Google client with injected latency. Also checks that the streamed total
+matches calculate_route. Run from the repository base directory:
+
+    python benchmarks/bench_streaming.py --latency 0.02 --workers 8
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRoutePlanner import EVRoutePlanner
+from EmissionsCalculator import EmissionsCalculator
+from fake_clients import FakeGoogleMaps, fake_planner_clients
+from bench_planner_modes import TRIPS
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per fake API call')
+    parser.add_argument('--range-km', type=float, default=400)
+    parser.add_argument('--workers', type=int, default=8, help='Enrichment workers per planner')
+    args = parser.parse_args()
+
+    # Load the emissions data up front so the first timed run does not pay for it
+    EmissionsCalculator(150).emission_factors([40.0], [-75.0])
+
+    print(f"{'trip':>7} {'replanning':>11} {'stops':>5} {'first stop s':>12} {'total s':>8} {'kg CO2':>8} {'batch kg CO2':>12}")
+    for trip, (start, end) in TRIPS.items():
+        for incremental in (False, True):
+            def planner():
+                return EVRoutePlanner(None, start, end, args.range_km, 150, enrichment_workers=args.workers,
+                                      incremental_replanning=incremental,
+                                      **fake_planner_clients(FakeGoogleMaps(latency=args.latency)))
+
+            streaming = planner()
+            first_stop = None
+            with redirect_stdout(io.StringIO()):
+                began = time.perf_counter()
+                for event in streaming.iter_route('regular'):
+                    if event['event'] == 'stop' and first_stop is None:
+                        first_stop = time.perf_counter() - began
+                total = time.perf_counter() - began
+
+                batch = planner()
+                batch.calculate_route('regular')
+
+            label = 'incremental' if incremental else 'full'
+            first = f"{first_stop:12.2f}" if first_stop is not None else f"{'-':>12}"
+            print(f"{trip:>7} {label:>11} {len(event['ev_waypoints']):>5} {first} {total:>8.2f} "
+                  f"{event['emissions']:>8.2f} {batch.emissions_kg_co2:>12.2f}")
@@ -0,0 +1,252 @@
+"""
+Offline planner benchmark suite. Google responses for a short, a medium and a cross-country trip are
+recorded once into fixtures, then replayed so every run makes the same requests without network access.
+Reports end-to-end calculate_route latency, API calls per endpoint, time spent computing emissions and
+peak Python memory, and saves the results to JSON so runs can be compared over time. Run from the
+repository base directory:
+
+    python benchmarks/bench_suite.py record            # live Google calls, needs APIKey.txt
+    python benchmarks/bench_suite.py record --fake     # synthetic responses from FakeGoogleMaps
+    python benchmarks/bench_suite.py run --repeats 5
+    python benchmarks/bench_suite.py compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from EVRoutePlanner import EVRoutePlanner
+from EmissionsCalculator import EmissionsCalculator
+from fake_clients import ENDPOINTS, FakeGoogleMaps, RecordingGoogleMaps, ReplayGoogleMaps, fake_planner_clients
+from bench_planner_modes import TRIPS
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, 'fixtures')
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+RESULTS_FORMAT_VERSION = 1
+MIN_SECONDS_CHANGE = 0.005
+MIN_MEMORY_MB_CHANGE = 0.5
+
+SUITE_TRIPS = {
+    'short': TRIPS['short'],
+    'medium': TRIPS['medium'],
+    'cross_country': TRIPS['long'],
+}
+
+MODES = [('regular', None), ('graph', 'distance')]
+
+
+class TimedEmissions:
+    def __init__(self, calculator: EmissionsCalculator):
+        """
+        Wraps an EmissionsCalculator and adds up the seconds spent in its methods.
+        """
+        self.calculator = calculator
+        self.seconds = 0.0
+
+    def __getattr__(self, name):
+        attr = getattr(self.calculator, name)
+        if not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            began = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - began
+        return timed
+
+
+def fixture_path(fixtures_dir: str, trip: str) -> str:
+    return os.path.join(fixtures_dir, f'{trip}.json.gz')
+
+
+def build_planner(fixture: dict, client) -> EVRoutePlanner:
+    return EVRoutePlanner(None, tuple(fixture['start']), tuple(fixture['end']), fixture['range_km'], fixture['efficiency'],
+                          enrichment_workers=fixture['workers'], incremental_replanning=fixture['incremental_replanning'],
+                          **fake_planner_clients(client, fixture['interval_meters']))
+
+
+def plan(planner: EVRoutePlanner, mode: str, objective: str):
+    with redirect_stdout(io.StringIO()):
+        return planner.calculate_route(mode, objective or 'distance')
+
+
+def record(trips, fixtures_dir: str, fake: bool, range_km: float, efficiency: float, workers: int,
+           incremental_replanning: bool, interval_meters: int):
+    if fake:
+        source = FakeGoogleMaps()
+    else:
+        from GoogleClients import shared_google_client
+        from utils import getAPIKey
+        source = shared_google_client(getAPIKey('APIKey.txt'))
+
+    for trip in trips:
+        start, end = SUITE_TRIPS[trip]
+        fixture = {'trip': trip, 'start': list(start), 'end': list(end), 'range_km': range_km, 'efficiency': efficiency,
+                   'workers': workers, 'incremental_replanning': incremental_replanning, 'interval_meters': interval_meters,
+                   'source': 'fake' if fake else 'google', 'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+        recorder = RecordingGoogleMaps(source)
+        for mode, objective in MODES:
+            plan(build_planner(fixture, recorder), mode, objective)
+        path = fixture_path(fixtures_dir, trip)
+        recorder.save(path, **fixture)
+        print(f"{trip:>13}: recorded {dict(recorder.calls)} to {path}")
+
+
+def run_case(replay: ReplayGoogleMaps, mode: str, objective: str, repeats: int) -> dict:
+    fixture = replay.metadata
+    seconds, emissions_seconds = [], []
+    for _ in range(repeats):
+        planner = build_planner(fixture, replay)
+        planner.emissions_calculator = timed = TimedEmissions(planner.emissions_calculator)
+        calls_before = dict(replay.calls)
+        began = time.perf_counter()
+        route = plan(planner, mode, objective)
+        seconds.append(time.perf_counter() - began)
+        emissions_seconds.append(timed.seconds)
+    calls = {endpoint: replay.calls[endpoint] - calls_before.get(endpoint, 0) for endpoint in ENDPOINTS}
+
+    # Memory is measured in a separate run since tracemalloc slows the planner down
+    planner = build_planner(fixture, replay)
+    tracemalloc.start()
+    plan(planner, mode, objective)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'trip': fixture['trip'],
+        'mode': mode if objective is None else f'{mode}:{objective}',
+        'seconds_median': statistics.median(seconds),
+        'seconds_min': min(seconds),
+        'emissions_seconds_median': statistics.median(emissions_seconds),
+        'calls': calls,
+        'peak_memory_mb': peak / 2 ** 20,
+        'nodes': len(route),
+        'stops': len(planner.charging_stations),
+        'emissions_kg_co2': round(float(planner.emissions_kg_co2), 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(trips, fixtures_dir: str, repeats: int, latency: float, output: str):
+    # Load the emissions data up front so the first timed run does not pay for it
+    EmissionsCalculator(150).emission_factors([40.0], [-75.0])
+
+    results = []
+    print(f"{'trip':>13} {'mode':>14} {'median s':>9} {'min s':>7} {'emissions s':>11} {'directions':>10} "
+          f"{'places':>7} {'peak MB':>8} {'stops':>5}")
+    for trip in trips:
+        path = fixture_path(fixtures_dir, trip)
+        if not os.path.exists(path):
+            raise ValueError(f"No fixture for {trip} in {fixtures_dir}, run the record command first")
+        replay = ReplayGoogleMaps(path, latency)
+        for mode, objective in MODES:
+            result = run_case(replay, mode, objective, repeats)
+            result['fixture_source'] = replay.metadata['source']
+            results.append(result)
+            print(f"{trip:>13} {result['mode']:>14} {result['seconds_median']:9.3f} {result['seconds_min']:7.3f} "
+                  f"{result['emissions_seconds_median']:11.4f} {result['calls']['directions']:>10} "
+                  f"{result['calls']['places_nearby']:>7} {result['peak_memory_mb']:8.1f} {result['stops']:>5}")
+
+    report = {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'repeats': repeats,
+        'latency': latency,
+        'results': results,
+    }
+    if output is None:
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"suite-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+
+def compare(baseline_path: str, current_path: str, threshold: float) -> bool:
+    """
+    Prints the change of every case in current against baseline.
+
+    :return: Whether any case got slower or used more memory by more than threshold, or made more API calls.
+    """
+    reports = []
+    for path in (baseline_path, current_path):
+        with open(path) as f:
+            report = json.load(f)
+        if report.get('format_version') != RESULTS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported results format version {report.get('format_version')} in {path}")
+        reports.append({(result['trip'], result['mode']): result for result in report['results']})
+    baseline, current = reports
+
+    regressed = False
+    print(f"{'trip':>13} {'mode':>14} {'median s':>17} {'API calls':>13} {'peak MB':>15}")
+    for case in [case for case in current if case in baseline]:
+        old, new = baseline[case], current[case]
+        old_calls, new_calls = sum(old['calls'].values()), sum(new['calls'].values())
+        # Small absolute changes are timer and allocator noise, not regressions
+        flags = [name for name, worse in (
+            ('time', new['seconds_median'] > old['seconds_median'] * (1 + threshold) + MIN_SECONDS_CHANGE),
+            ('calls', new_calls > old_calls),
+            ('memory', new['peak_memory_mb'] > old['peak_memory_mb'] * (1 + threshold) + MIN_MEMORY_MB_CHANGE),
+        ) if worse]
+        regressed |= bool(flags)
+        print(f"{case[0]:>13} {case[1]:>14} {old['seconds_median']:7.3f} -> {new['seconds_median']:<7.3f} "
+              f"{old_calls:>5} -> {new_calls:<5} {old['peak_memory_mb']:6.1f} -> {new['peak_memory_mb']:<6.1f}"
+              + (f"  regressed: {', '.join(flags)}" if flags else ''))
+    return regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline planner benchmarks on recorded Google API responses.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    recording = subparsers.add_parser('record', help='Plan the suite trips and save the Google responses as fixtures')
+    recording.add_argument('--fake', action='store_true', help='Record synthetic FakeGoogleMaps responses instead of live ones')
+    recording.add_argument('--range-km', type=float, default=400)
+    recording.add_argument('--efficiency', type=float, default=150, help='Wh per km')
+    recording.add_argument('--workers', type=int, default=8, help='Enrichment workers per planner')
+    recording.add_argument('--full-replanning', action='store_true', help='Re-route to the end after each stop')
+    recording.add_argument('--interval-meters', type=int, default=30000)
+    running = subparsers.add_parser('run', help='Replay the fixtures and write the results to JSON')
+    running.add_argument('--repeats', type=int, default=3)
+    running.add_argument('--latency', type=float, default=0.0, help='Seconds each replayed call sleeps')
+    running.add_argument('--output', help='Results file, defaults to benchmarks/results/suite-<time>.json')
+    for command in (recording, running):
+        command.add_argument('--fixtures', default=DEFAULT_FIXTURES_DIR)
+        command.add_argument('--trips', nargs='+', choices=list(SUITE_TRIPS), default=list(SUITE_TRIPS))
+    comparing = subparsers.add_parser('compare', help='Compare two results files')
+    comparing.add_argument('baseline')
+    comparing.add_argument('current')
+    comparing.add_argument('--threshold', type=float, default=0.1, help='Relative increase reported as a regression')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.trips, args.fixtures, args.fake, args.range_km, args.efficiency, args.workers,
+               not args.full_replanning, args.interval_meters)
+    elif args.command == 'run':
+        run(args.trips, args.fixtures, args.repeats, args.latency, args.output)
+    else:
+        sys.exit(1 if compare(args.baseline, args.current, args.threshold) else 0)
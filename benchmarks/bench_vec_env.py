@@ -0,0 +1,73 @@
+"""
+Compares environment steps per second of EVRouteGymEnv with EVRouteVecEnv at several batch sizes, on a
+synthetic route so no API calls are made. Run from the repository base directory:
+
+    python benchmarks/bench_vec_env.py --nodes 130 --steps 2000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from EVRouteGymEnv import EVRouteGymEnv
+from EVRouteVecEnv import EVRouteVecEnv
+
+
+def synthetic_route(n, seed=0):
+    rng = np.random.default_rng(seed)
+    nodes = []
+    for i in range(n):
+        node = {'lat': 0.0, 'lng': 0.0, 'dist': float(rng.uniform(25000, 35000)) if i < n - 1 else 0.0}
+        if rng.random() < 0.7:
+            node['nearest_ev_station_distance'] = float(rng.uniform(500, 8000))
+        nodes.append(node)
+    return nodes
+
+
+class FixedRoutePlanner:
+    # Stands in for EVRoutePlanner so EVRouteGymEnv.reset does not plan a route
+    def __init__(self, nodes, vehicle_range):
+        self.nodes = nodes
+        self.vehicle_range = vehicle_range
+
+    def calculate_route(self, type='regular'):
+        return self.nodes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=130, help='Nodes per route, ~4,000 km at 30 km spacing')
+    parser.add_argument('--steps', type=int, default=2000, help='Batched steps per run')
+    parser.add_argument('--range-m', type=float, default=400000)
+    args = parser.parse_args()
+
+    nodes = synthetic_route(args.nodes)
+    rng = np.random.default_rng(0)
+
+    env = EVRouteGymEnv(FixedRoutePlanner(nodes, args.range_m))
+    actions = rng.integers(2, size=args.steps).tolist()
+    with redirect_stdout(io.StringIO()):
+        began = time.perf_counter()
+        env.reset()
+        for action in actions:
+            _, _, done, _ = env.step(action)
+            if done:
+                env.reset()
+        elapsed = time.perf_counter() - began
+    print(f"{'EVRouteGymEnv':>16} {'':>6} {args.steps / elapsed:>14,.0f} steps/s")
+
+    for num_envs in (1, 64, 1024, 16384):
+        vec_env = EVRouteVecEnv.from_routes([nodes], args.range_m, num_envs, seed=0)
+        actions = rng.integers(2, size=(args.steps, num_envs))
+        began = time.perf_counter()
+        vec_env.reset()
+        for action in actions:
+            vec_env.step(action)
+        elapsed = time.perf_counter() - began
+        print(f"{'EVRouteVecEnv':>16} {num_envs:>6} {args.steps * num_envs / elapsed:>14,.0f} steps/s")
@@ -0,0 +1,170 @@
+"""
+Local stand-ins for googlemaps.Client used by the benchmarks. FakeGoogleMaps answers directions and
+places_nearby with deterministic synthetic data, sleeps for a configurable latency to mimic a network
+round trip and counts every call per endpoint. RecordingGoogleMaps saves the responses of another client
+to a fixture file, and ReplayGoogleMaps answers from that file without network access.
+"""
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from math import asin, cos, radians, sin, sqrt
+
+import polyline
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from GoogleClients import GoogleMapsClient, GooglePlacesClient
+from PathInterpolator import PathInterpolator
+
+
+def _distance(a, b):
+    lat1, lng1, lat2, lng2 = map(radians, (a[0], a[1], b[0], b[1]))
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371000 * asin(sqrt(h))
+
+
+def _as_point(location):
+    if isinstance(location, dict):
+        return (location['lat'], location['lng'])
+    return (float(location[0]), float(location[1]))
+
+
+class FakeGoogleMaps:
+    def __init__(self, latency: float = 0.0, step_meters: float = 2000, station_offset_deg: float = 0.02):
+        """
+        :param latency: Seconds each call sleeps before answering.
+        :param step_meters: Spacing of the straight-line route vertices and steps.
+        :param station_offset_deg: How far north-east of the query point the nearest station sits.
+        """
+        self.latency = latency
+        self.step_meters = step_meters
+        self.station_offset_deg = station_offset_deg
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _record(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def directions(self, origin, destination, mode="driving", units="metric", **kwargs):
+        self._record('directions')
+        origin, destination = _as_point(origin), _as_point(destination)
+        n = max(1, int(_distance(origin, destination) // self.step_meters))
+        points = [(origin[0] + (destination[0] - origin[0]) * k / n, origin[1] + (destination[1] - origin[1]) * k / n)
+                  for k in range(n + 1)]
+        steps = [{
+            'start_location': {'lat': a[0], 'lng': a[1]},
+            'end_location': {'lat': b[0], 'lng': b[1]},
+            'distance': {'value': int(_distance(a, b))},
+        } for a, b in zip(points, points[1:])]
+        leg = {
+            'start_location': steps[0]['start_location'],
+            'end_location': steps[-1]['end_location'],
+            'distance': {'value': sum(step['distance']['value'] for step in steps)},
+            'steps': steps,
+        }
+        return [{'overview_polyline': {'points': polyline.encode(points)}, 'legs': [leg]}]
+
+    def places_nearby(self, location=None, radius=None, type=None, **kwargs):
+        self._record('places_nearby')
+        lat, lng = _as_point(location)
+        # Snap to a ~1 km lattice so nearby queries find the same station
+        station_lat = round(lat, 2) + self.station_offset_deg
+        station_lng = round(lng, 2) + self.station_offset_deg
+        return {'results': [{
+            'name': f'Station {station_lat:.2f},{station_lng:.2f}',
+            'place_id': f'fake-{station_lat:.2f}-{station_lng:.2f}',
+            'geometry': {'location': {'lat': station_lat, 'lng': station_lng}},
+        }]}
+
+
+FIXTURE_FORMAT_VERSION = 1
+ENDPOINTS = ('directions', 'places_nearby')
+
+
+def request_key(endpoint: str, args: tuple, kwargs: dict) -> str:
+    # Exact arguments; tuples and lists of coordinates serialize the same way
+    return endpoint + ':' + json.dumps({'args': list(args), 'kwargs': kwargs}, sort_keys=True, default=float)
+
+
+class RecordingGoogleMaps:
+    def __init__(self, client):
+        """
+        Passes directions and places_nearby calls on to client and keeps every response for save.
+        """
+        self.client = client
+        self.responses = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, endpoint, *args, **kwargs):
+        response = getattr(self.client, endpoint)(*args, **kwargs)
+        with self._lock:
+            self.calls[endpoint] += 1
+            self.responses[request_key(endpoint, args, kwargs)] = response
+        return response
+
+    def directions(self, *args, **kwargs):
+        return self._call('directions', *args, **kwargs)
+
+    def places_nearby(self, *args, **kwargs):
+        return self._call('places_nearby', *args, **kwargs)
+
+    def save(self, path: str, **metadata):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with gzip.open(path, 'wt') as f:
+            json.dump(dict(metadata, format_version=FIXTURE_FORMAT_VERSION, responses=self.responses), f)
+
+
+class ReplayGoogleMaps:
+    def __init__(self, path: str, latency: float = 0.0):
+        """
+        Answers directions and places_nearby from a fixture written by RecordingGoogleMaps.save.
+
+        :param latency: Seconds each call sleeps before answering, to mimic the recorded round trips.
+        """
+        with gzip.open(path, 'rt') as f:
+            fixture = json.load(f)
+        if fixture.get('format_version') != FIXTURE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported fixture format version {fixture.get('format_version')} in {path}")
+        self.path = path
+        self.metadata = {name: value for name, value in fixture.items() if name != 'responses'}
+        # Kept as text so every call decodes its own copy, which callers may modify as they would an API response
+        self.responses = {key: json.dumps(response) for key, response in fixture['responses'].items()}
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _call(self, endpoint, *args, **kwargs):
+        key = request_key(endpoint, args, kwargs)
+        if key not in self.responses:
+            raise ValueError(f"{endpoint} request not recorded in {self.path}, record the fixture again: {key}")
+        with self._lock:
+            self.calls[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return json.loads(self.responses[key])
+
+    def directions(self, *args, **kwargs):
+        return self._call('directions', *args, **kwargs)
+
+    def places_nearby(self, *args, **kwargs):
+        return self._call('places_nearby', *args, **kwargs)
+
+
+def fake_planner_clients(fake: FakeGoogleMaps, interval_meters: int = 30000, cache=None):
+    """
+    Returns maps_client, places_client and paths_interpolator keyword arguments for EVRoutePlanner,
+    all backed by the same fake (or recording or replaying client) and, optionally, a ResponseCache.
+    """
+    return {
+        'maps_client': GoogleMapsClient(None, client=fake, cache=cache),
+        'places_client': GooglePlacesClient(None, client=fake, cache=cache),
+        'paths_interpolator': PathInterpolator(None, interval_meters, client=fake, cache=cache),
+    }
@@ -1,55 +1,222 @@
-from flask import Flask, request, render_template, jsonify, send_file
+from flask import Flask, request, render_template, jsonify, send_file, Response, stream_with_context
 from flask_restful import Resource, Api
 from flask_cors import CORS
 import json
+import logging
+import os
+import threading
+import time
 
 from EVNav import *
 from utils import *
+from RouteJobs import RouteJobQueue, QueueFullError
+from BatchRoutes import BatchPool
+from GoogleClients import google_client_stats
+from PlannerMetrics import REGISTRY
+from RequestProfiler import ProfileStore
+
+# Planner progress is logged at DEBUG; set EV_ROUTE_LOG_LEVEL=DEBUG to follow it
+logging.basicConfig(level=os.environ.get('EV_ROUTE_LOG_LEVEL', 'WARNING'))
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_url_path='/static', static_folder='static')
 api = Api(app)
 
-client = get_client()
+# Route planning builds its own cached Google clients, so none is created at import
+client = None
 
 CORS(app) #Enable Cross-Origin Resource Sharing
 
+# Set EV_ROUTE_WARM_UP=1 to load the planner and its datasets at startup instead of on the first request
+if os.environ.get('EV_ROUTE_WARM_UP') == '1':
+    warmUp()
+
+# Background planning for /evroute/jobs; identical in-flight requests share one planning run
+ROUTE_JOB_WORKERS = 4
+route_jobs = RouteJobQueue(max_workers=ROUTE_JOB_WORKERS)
+
+# Planner processes shared by every /evroute/batch request, started on the first batch. Together they
+# send at most DEFAULT_QUERIES_PER_SECOND Google requests per second, on top of this process's own client
+BATCH_WORKERS = os.cpu_count() or 1
+batch_pool = BatchPool(BATCH_WORKERS)
+
+# Batches streamed at the same time; further requests are turned away with 503
+MAX_CONCURRENT_BATCHES = 2
+batch_slots = threading.BoundedSemaphore(MAX_CONCURRENT_BATCHES)
+
+# With EV_ROUTE_PROFILING=1, an /evroute request with ?profile=1 or an X-Profile: 1 header runs under
+# cProfile and tracemalloc; the captures are listed at /admin/profiles, which has no authentication
+PROFILING_ENABLED = os.environ.get('EV_ROUTE_PROFILING') == '1'
+PROFILED_ENRICHMENT_WORKERS = 1
+profiles = ProfileStore()
+
 @app.route('/get-ev-models')
 def get_ev_models():
     ev_models = r.hgetall('ev_models')  # Assuming data is stored in a hash
     ev_models_dict = {key.decode('utf-8'): value.decode('utf-8') for key, value in ev_models.items()}
     return jsonify(ev_models_dict)
 
+def route_request_fields(data):
+    # Extract fields from the input JSON
+    return (data.get('starting_location'), data.get('destination_location'), data.get('ev_battery_capacity'),
+            data.get('ev_total_range'), data.get('method'))
+
+def plan_route(starting_location, destination_location, ev_battery_capacity, ev_total_range, method, enrichment_workers=ENRICHMENT_WORKERS):
+    #calculate EV optimal route
+    ev_waypoints,ev_emissions = calculateOptimalEVRoute(client, starting_location, destination_location, ev_battery_capacity, ev_total_range, method, enrichment_workers)
+    logger.info("Waypoints: %s", ev_waypoints)
+
+    # Calculate emissions
+    # ev_emissions = EVEmissions(client, starting_location, destination_location, ev_battery_capacity)
+
+    # Prepare response data
+    return {
+        'emissions':        ev_emissions,
+        'ev_waypoints':     ev_waypoints,
+        'start_location':   starting_location,
+        'end_location':     destination_location,
+    }
+
 class EVRoute(Resource):
     def post(self):
         # Parse the JSON input
         data = request.get_json()
 
-        # Extract fields from the input JSON
-        method                  = data.get('method')
-        ev_battery_capacity     = data.get('ev_battery_capacity')
-        ev_total_range          = data.get('ev_total_range')
-        starting_location       = data.get('starting_location')
-        destination_location    = data.get('destination_location')
-
-        #calculate EV optimal route
-        ev_waypoints,ev_emissions = calculateOptimalEVRoute(client, starting_location, destination_location, ev_battery_capacity, ev_total_range, method)
-        print(f"Waypoints: {ev_waypoints}")
-        
-        # Calculate emissions
-        # ev_emissions = EVEmissions(client, starting_location, destination_location, ev_battery_capacity)
-        
-        # Prepare response data
-        response_data = {
-            'emissions':        ev_emissions,
-            'ev_waypoints':     ev_waypoints,
-            'start_location':   starting_location,
-            'end_location':     destination_location,
-        }
+        fields = route_request_fields(data)
+        if PROFILING_ENABLED and (request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'):
+            # cProfile only sees the request thread, so station lookups run on it instead of the enrichment pool
+            response_data, capture = profiles.capture(plan_route, *fields, PROFILED_ENRICHMENT_WORKERS, request=data,
+                                                      enrichment_workers=PROFILED_ENRICHMENT_WORKERS)
+            return {'status': 'success', 'data': response_data, 'profile_id': capture['id']}, 200
+
+        response_data = plan_route(*fields)
 
         return {'status': 'success', 'data': response_data}, 200
 
-# Add the EVRoute resource to the API
+class EVRouteStream(Resource):
+    def post(self):
+        # One JSON object per line: a 'stop' event for each charging stop as it is decided, then 'done'
+        starting_location, destination_location, ev_battery_capacity, ev_total_range, method = route_request_fields(request.get_json())
+
+        def events():
+            try:
+                for event in streamOptimalEVRoute(client, starting_location, destination_location, ev_battery_capacity, ev_total_range, method):
+                    if event['event'] == 'done':
+                        event.update(start_location=starting_location, end_location=destination_location)
+                    yield json.dumps(event) + '\n'
+            except Exception as e:
+                yield json.dumps({'event': 'error', 'message': str(e)}) + '\n'
+
+        return Response(stream_with_context(events()), mimetype='application/x-ndjson')
+
+class EVRouteBatch(Resource):
+    def post(self):
+        # Plan a list of trips across worker processes; one JSON result per line as each trip finishes
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return {'status': 'error', 'message': 'Expected a JSON object body'}, 400
+        trips = data.get('trips') or []
+        if not isinstance(trips, list) or not all(isinstance(trip, dict) for trip in trips):
+            return {'status': 'error', 'message': "'trips' must be a list of trip objects"}, 400
+        workers = data.get('workers') or BATCH_WORKERS
+        if isinstance(workers, bool) or not isinstance(workers, int) or workers < 1:
+            return {'status': 'error', 'message': "'workers' must be a positive integer"}, 400
+        workers = min(workers, BATCH_WORKERS, max(len(trips), 1))
+        if not batch_slots.acquire(blocking=False):
+            return {'status': 'error', 'message': f'{MAX_CONCURRENT_BATCHES} batches are already running'}, 503
+
+        def results():
+            began = time.perf_counter()
+            for result in batch_pool.imap(trips, max_in_flight=workers):
+                yield json.dumps(result) + '\n'
+            yield json.dumps({'event': 'done', 'trips': len(trips), 'workers': workers,
+                              'seconds': round(time.perf_counter() - began, 3)}) + '\n'
+
+        response = Response(stream_with_context(results()), mimetype='application/x-ndjson')
+        # Released once the response is closed, whether the batch finished or the client went away
+        response.call_on_close(batch_slots.release)
+        return response
+
+class EVRouteJobs(Resource):
+    def post(self):
+        # Queue the route and answer right away; poll /evroute/jobs/<job_id> for the result
+        fields = route_request_fields(request.get_json())
+        try:
+            job, coalesced = route_jobs.submit(RouteJobQueue.job_key(*fields), plan_route, *fields)
+        except QueueFullError as e:
+            return {'status': 'error', 'message': str(e)}, 503
+
+        return {'status': 'accepted', 'job_id': job.id, 'coalesced': coalesced}, 202
+
+class EVRouteJob(Resource):
+    def get(self, job_id):
+        job = route_jobs.get(job_id)
+        if job is None:
+            return {'status': 'error', 'message': f'Unknown job {job_id}'}, 404
+
+        return {'status': 'success', 'data': job.to_dict()}, 200
+
+class ProfileList(Resource):
+    def get(self):
+        if not PROFILING_ENABLED:
+            return {'status': 'error', 'message': 'Profiling is disabled'}, 404
+        return {'status': 'success', 'data': profiles.list()}, 200
+
+class Profile(Resource):
+    def get(self, profile_id):
+        # The summary as JSON, or the raw cProfile dump with ?format=prof
+        if not PROFILING_ENABLED:
+            return {'status': 'error', 'message': 'Profiling is disabled'}, 404
+        capture = profiles.get(profile_id)
+        if capture is None:
+            return {'status': 'error', 'message': f'Unknown profile {profile_id}'}, 404
+        if request.args.get('format') == 'prof':
+            return send_file(profiles.path(profile_id, 'prof'), as_attachment=True, download_name=f'{profile_id}.prof')
+        return {'status': 'success', 'data': capture}, 200
+
+class EVRouteJobMetrics(Resource):
+    def get(self):
+        return {'status': 'success', 'data': route_jobs.metrics()}, 200
+
+@REGISTRY.collector
+def service_metrics():
+    # Values the job queue, the Google clients and the response cache already count, read at scrape time
+    jobs = route_jobs.metrics()
+    metrics = [
+        ('ev_route_jobs_total', 'counter', 'Route jobs by outcome',
+         [({'outcome': outcome}, jobs[outcome]) for outcome in ('submitted', 'coalesced', 'rejected', 'completed', 'failed')]),
+        ('ev_route_jobs_queued', 'gauge', 'Route jobs waiting for a worker', [({}, jobs['queue_depth'])]),
+        ('ev_route_jobs_running', 'gauge', 'Route jobs being planned', [({}, jobs['running'])]),
+    ]
+    google = google_client_stats()
+    for name, help in (('requests', 'Google API requests sent'),
+                       ('over_query_limit', 'Google API OVER_QUERY_LIMIT answers'),
+                       ('errors', 'Google API requests that failed otherwise'),
+                       ('throttled_seconds', 'Seconds Google API requests waited for the rate limit'),
+                       ('request_seconds', 'Seconds Google API requests were in flight')):
+        metrics.append((f'google_api_{name}_total', 'counter', help,
+                        [({'endpoint': endpoint}, counts.get(name, 0)) for endpoint, counts in sorted(google.items())]))
+    cache = default_response_cache().stats()
+    metrics.append(('google_response_cache_events_total', 'counter', 'Response cache hits, misses and evictions',
+                    [({'endpoint': endpoint, 'event': event}, count)
+                     for endpoint, counts in sorted(cache.items()) if isinstance(counts, dict)
+                     for event, count in sorted(counts.items())]))
+    return metrics
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text exposition format
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# Add the EVRoute resources to the API
 api.add_resource(EVRoute, '/evroute')
+api.add_resource(EVRouteStream, '/evroute/stream')
+api.add_resource(EVRouteBatch, '/evroute/batch')
+api.add_resource(EVRouteJobs, '/evroute/jobs')
+api.add_resource(EVRouteJobMetrics, '/evroute/jobs/metrics')
+api.add_resource(EVRouteJob, '/evroute/jobs/<string:job_id>')
+api.add_resource(ProfileList, '/admin/profiles')
+api.add_resource(Profile, '/admin/profiles/<string:profile_id>')
 
 @app.route('/')
 def index():
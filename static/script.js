@@ -4,6 +4,7 @@ let directionsRenderer;
 let directionsService;
 let evList; // Declare evList outside of functions to make it accessible to other functions
 let optimizationAlgo = "default"
+let stopMarkers = []; // Charging stops shown while the route is still being planned
 
 function initMap() {
     directionsService = new google.maps.DirectionsService();
@@ -66,23 +67,69 @@ function sendData() {
         destination_location:   destinationLocation
     };
 
-    // Send a POST request to the backend
-    fetch('http://127.0.0.1:5000/evroute', {
+    clearStopMarkers();
+    document.getElementById('emissions').textContent = 'Emissions: planning...';
+
+    // Send a POST request to the backend; it streams each charging stop as soon as it is decided
+    fetch('http://127.0.0.1:5000/evroute/stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
         body: JSON.stringify(data)
     })
-    .then(response => response.json())
-    .then(result => {
-        // Display the result in the frontend
-        document.getElementById('emissions').textContent = `Emissions: ${result.data.emissions} kg CO2`;
-        displayEVRoute(result.data);
-    })
+    .then(response => readRouteEvents(response, handleRouteEvent))
     .catch(error => console.error('Error:', error));
 }
 
+function readRouteEvents(response, onEvent) {
+    // The body is newline-delimited JSON; hand over every complete line as it arrives
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    function pump() {
+        return reader.read().then(({ done, value }) => {
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+            if (done) {
+                if (buffer.trim())
+                    onEvent(JSON.parse(buffer));
+                return;
+            }
+            return pump();
+        });
+    }
+    return pump();
+}
+
+function handleRouteEvent(event) {
+    if (event.event === 'stop') {
+        stopMarkers.push(new google.maps.Marker({
+            position: { lat: event.location.lat, lng: event.location.lng },
+            map: map,
+            label: String(event.stop),
+            title: `Charging stop ${event.stop}: ${event.leg_km} km since the last charge`
+        }));
+        document.getElementById('emissions').textContent = `Emissions: ${event.emissions} kg CO2 so far (${event.stop} stops)`;
+    }
+    else if (event.event === 'done') {
+        // The rendered directions show the stops as waypoints from here on
+        clearStopMarkers();
+        document.getElementById('emissions').textContent = `Emissions: ${event.emissions} kg CO2`;
+        displayEVRoute(event);
+    }
+    else if (event.event === 'error')
+        console.error('Error:', event.message);
+}
+
+function clearStopMarkers() {
+    stopMarkers.forEach(marker => marker.setMap(null));
+    stopMarkers = [];
+}
+
 function displayEVRoute(data) {
 
     const formattedWaypoints = data.ev_waypoints.map(waypoint => ({
@@ -1,5 +1,3 @@
-import googlemaps
-
 def getAPIKey(file_path: str):
     try:
         with open(file_path, 'r') as file:
@@ -10,4 +8,5 @@ def getAPIKey(file_path: str):
         return None
     
 def get_client():
-    return googlemaps.Client(key=getAPIKey('APIKey.txt'))
\ No newline at end of file
+    from GoogleClients import shared_google_client
+    return shared_google_client(getAPIKey('APIKey.txt'))
\ No newline at end of file